@@ -14,6 +14,12 @@ export default function AIExplanationPanel({ threatData }) {
   const aiDecisionPath = threat.aiDecisionPath || [];
   const similarPastThreats = threat.similarPastThreats || [];
   const technicalDetails = threat.technicalDetails || {};
+  // Per-alert feature contributions from the detector ("path_contributions")
+  const explanation = threat.explanation || {};
+  const contributions = explanation.method === 'path_contributions'
+    ? (explanation.top_features || []).map((feature, index) => ({ feature, value: explanation.contributions[index] }))
+    : [];
+  const maxContribution = Math.max(...contributions.map((item) => Math.abs(item.value)), 0) || 1;
   
   // Generate a linear gradient based on confidence percentage
   const getConfidenceGradient = (confidence) => {
@@ -162,6 +168,32 @@ export default function AIExplanationPanel({ threatData }) {
                   ))}
                 </div>
                 
+                {contributions.length > 0 && (
+                  <div className="p-4 rounded-lg border">
+                    <h4 className="font-medium text-gray-900 mb-1">Why {explanation.target_class}?</h4>
+                    <p className="text-xs text-gray-500 mb-3">
+                      Features that moved this alert's {explanation.target_class} probability
+                      away from the {(explanation.baseline * 100).toFixed(1)}% baseline
+                    </p>
+                    <div className="space-y-2">
+                      {contributions.map((item) => (
+                        <div key={item.feature} className="flex items-center text-sm">
+                          <span className="w-48 font-mono text-gray-700 truncate">{item.feature}</span>
+                          <div className="flex-1 h-2 bg-gray-100 rounded-full overflow-hidden mx-2">
+                            <div
+                              className={`h-full ${item.value >= 0 ? 'bg-red-500' : 'bg-green-500'}`}
+                              style={{ width: `${(Math.abs(item.value) / maxContribution) * 100}%` }}
+                            ></div>
+                          </div>
+                          <span className="w-16 text-right text-xs font-medium text-gray-700">
+                            {item.value >= 0 ? '+' : ''}{(item.value * 100).toFixed(1)}%
+                          </span>
+                        </div>
+                      ))}
+                    </div>
+                  </div>
+                )}
+                
                 <div className="p-4 bg-yellow-50 border-l-4 border-yellow-400 rounded-r-lg">
                   <p className="text-sm text-yellow-800">
                     This represents a simplified view of the AI detection process. The actual model analyzes hundreds of features and patterns simultaneously.
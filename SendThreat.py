@@ -1,5 +1,4 @@
 # send_threat.py
-import requests
 import random
 
 # Replace with your backend URL if not running locally
@@ -103,18 +102,31 @@ threats = [
     }
 ]
 
-# Merge dictionaries properly
-selected_threat = random.choice(threats)
-newData = {**fixed_data, **selected_threat}
 
+def send_threat(api_url=API_URL):
+    """
+    Send one randomly chosen threat to the backend and print the response
 
-# Send the data to the backend
-try:
-    response = requests.post(API_URL, json=newData)
-    response.raise_for_status()  # Raises HTTPError for bad responses (4xx or 5xx)
-    print("Status:", response.status_code)
-    print("Response:", response.json())
-except requests.exceptions.RequestException as e:
-    print("Request failed:", e)
-except ValueError:
-    print("Failed to parse JSON response:", response.text)
+    The templates above are also used by load_test.py, so sending only
+    happens when this file is run as a script.
+    """
+    import requests
+
+    # Merge dictionaries properly
+    selected_threat = random.choice(threats)
+    newData = {**fixed_data, **selected_threat}
+
+    # Send the data to the backend
+    try:
+        response = requests.post(api_url, json=newData)
+        response.raise_for_status()  # Raises HTTPError for bad responses (4xx or 5xx)
+        print("Status:", response.status_code)
+        print("Response:", response.json())
+    except requests.exceptions.RequestException as e:
+        print("Request failed:", e)
+    except ValueError:
+        print("Failed to parse JSON response:", response.text)
+
+
+if __name__ == "__main__":
+    send_threat()
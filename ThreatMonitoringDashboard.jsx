@@ -67,53 +67,69 @@ export default function ThreatMonitoringDashboard() {
   const [viewMode, setViewMode] = useState('list');
 
   const [threats, setThreats] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [summary, setSummary] = useState(null);
   const [loading, setLoading] = useState(true);
 
-  useEffect(() => {
-    async function fetchThreats() {
-      setLoading(true);
-      try {
-        // No authentication needed
-        const res = await fetch('http://localhost:8000/alerts');
-        if (!res.ok) throw new Error('Failed to fetch threats');
-        const data = await res.json();
-        setThreats(data);
-        console.log("Fetched threats:", data);
-      } catch (err) {
-        console.error(err);
-        setThreats([]);
-      }
-      setLoading(false);
+  // Alerts are fetched one page at a time; the list view only needs the
+  // projected fields the backend returns by default
+  async function fetchThreats(cursor = null) {
+    setLoading(true);
+    try {
+      // No authentication needed
+      const params = new URLSearchParams({ limit: '50' });
+      if (cursor) params.set('cursor', cursor);
+      const res = await fetch(`http://localhost:8000/alerts?${params}`);
+      if (!res.ok) throw new Error('Failed to fetch threats');
+      const data = await res.json();
+      setThreats(previous => cursor ? [...previous, ...data.items] : data.items);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      console.error(err);
+      if (!cursor) setThreats([]);
+    }
+    setLoading(false);
+  }
+
+  // Summary cards and the distribution chart use counts precomputed by the backend
+  async function fetchSummary() {
+    try {
+      const res = await fetch('http://localhost:8000/alerts/summary?days=30');
+      if (!res.ok) throw new Error('Failed to fetch alert summary');
+      setSummary(await res.json());
+    } catch (err) {
+      console.error(err);
     }
+  }
+
+  useEffect(() => {
     fetchThreats();
+    fetchSummary();
   }, []);
 
-  const activeThreats = threats.filter(
-  t =>
-    (t.status === 'Active' || t.status === 'Investigating') &&
-    (t.severity === 'Critical' || t.severity === 'High')
-);
+  const bySeverity = summary?.by_severity || {};
+  const isUrgent = (severity) => severity === 'Critical' || severity === 'High';
+  const isOpen = (status) => status === 'Active' || status === 'Investigating';
+  const byStatus = summary?.by_status || {};
+  const today = new Date().toISOString().slice(0, 10);
 
   const threatMetrics = {
-    total: threats.length,
-    critical: threats.filter(t => t.severity === 'Critical').length,
-    high: threats.filter(t => t.severity === 'High').length,
-    medium: threats.filter(t => t.severity === 'Medium').length,
-    low: threats.filter(t => t.severity === 'Low').length,
-    newToday: threats.filter(t => new Date(t.timestamp).toDateString() === new Date().toDateString()).length,
-    investigationPending: threats.filter(t => t.status === 'Investigating').length,
-    resolved: threats.filter(t => t.status === 'Resolved').length,
-    active: activeThreats.length,
+    total: summary?.total || 0,
+    critical: bySeverity.Critical || 0,
+    high: bySeverity.High || 0,
+    medium: bySeverity.Medium || 0,
+    low: bySeverity.Low || 0,
+    newToday: summary?.by_day?.[today] || 0,
+    investigationPending: byStatus.Investigating || 0,
+    resolved: byStatus.Resolved || 0,
+    // Critical and High alerts that are still open, counted by the summary
+    active: summary?.active || 0,
   };
 
   // Group by type for chart
-  const threatsByType = Object.entries(
-    threats.reduce((acc, t) => {
-      const threatType = t.type || t.prediction || 'Unknown';
-      acc[threatType] = (acc[threatType] || 0) + 1;
-      return acc;
-    }, {})
-  ).map(([name, value]) => ({ name, value }));
+  const threatsByType = Object.entries(summary?.by_type || {})
+    .filter(([, value]) => value > 0)
+    .map(([name, value]) => ({ name, value }));
 
   // Timeline events (example: use latest threats)
   const timelineEvents = threats
@@ -159,25 +175,64 @@ export default function ThreatMonitoringDashboard() {
     }
   };
 
-  // Simulated threat detection (would be replaced with real-time data)
+  // Live updates: the backend pushes small deltas for new predictions and
+  // status changes, so the list and counts stay current without refetching
   useEffect(() => {
-    const timer = setTimeout(() => {
-      const newThreat = {
-        id: 6,
-        type: 'Zero-Day Exploit',
-        severity: 'Critical',
-        source: '91.204.55.78',
-        target: 'Web Application Server',
-        timestamp: '2025-05-18T10:42:37',
-        details: 'Unknown attack pattern detected. Possible zero-day exploit targeting application vulnerabilities.',
-        status: 'Active'
-      };
-
-      // This would be an update from the backend in a real application
-      console.log('New threat detected:', newThreat);
-    }, 30000);
-
-    return () => clearTimeout(timer);
+    const source = new EventSource('http://localhost:8000/alerts/stream');
+
+    const bump = (counts, key, amount) => ({ ...counts, [key]: (counts?.[key] || 0) + amount });
+
+    source.addEventListener('prediction', (event) => {
+      const threat = JSON.parse(event.data);
+      setThreats(previous => [threat, ...previous.filter(t => t.id !== threat.id)]);
+      setSummary(previous => {
+        if (!previous) return previous;
+        const severity = threat.severity ||
+          (threat.threat_level ? threat.threat_level.charAt(0).toUpperCase() + threat.threat_level.slice(1) : 'Unknown');
+        const day = (threat.timestamp || new Date().toISOString()).slice(0, 10);
+        const status = threat.status || 'Active';
+        return {
+          ...previous,
+          total: previous.total + 1,
+          by_severity: bump(previous.by_severity, severity, 1),
+          by_type: bump(previous.by_type, threat.type || threat.prediction || 'Unknown', 1),
+          by_status: bump(previous.by_status, status, 1),
+          by_day: bump(previous.by_day, day, 1),
+          active: (previous.active || 0) + (isUrgent(severity) && isOpen(status) ? 1 : 0),
+        };
+      });
+    });
+
+    source.addEventListener('status', (event) => {
+      const { id, status, previous_status: previousStatus, severity } = JSON.parse(event.data);
+      setThreats(previous => previous.map(t => t.id === id ? { ...t, status } : t));
+      setActiveThreat(current => current && current.id === id ? { ...current, status } : current);
+      setSummary(previous => {
+        if (!previous || !previousStatus || previousStatus === status) return previous;
+        const activeChange = isUrgent(severity) ? (isOpen(status) ? 1 : 0) - (isOpen(previousStatus) ? 1 : 0) : 0;
+        return {
+          ...previous,
+          by_status: bump(bump(previous.by_status, previousStatus, -1), status, 1),
+          active: (previous.active || 0) + activeChange,
+        };
+      });
+    });
+
+    // Aggregated alerts grow while a burst lasts; they were counted when first
+    // published, so only the row itself changes
+    source.addEventListener('alert_update', (event) => {
+      const { id, ...fields } = JSON.parse(event.data);
+      setThreats(previous => previous.map(t => t.id === id ? { ...t, ...fields } : t));
+      setActiveThreat(current => current && current.id === id ? { ...current, ...fields } : current);
+    });
+
+    // Sent when the server can no longer replay what this client missed
+    source.addEventListener('reset', () => {
+      fetchThreats();
+      fetchSummary();
+    });
+
+    return () => source.close();
   }, []);
 
   return (
@@ -362,7 +417,10 @@ export default function ThreatMonitoringDashboard() {
                     { threats.filter(threat => (threat.status || '').toLowerCase() === 'active' ||
                       (threat.status || '').toLowerCase() === 'investigating').map((threat) => (
                         <tr key={ threat.id } className="border-b hover:bg-gray-50">
-                          <td className="px-4 py-3 text-sm">{ threat.type || threat.prediction || 'Unknown' }</td>
+                          <td className="px-4 py-3 text-sm">
+                            { threat.type || threat.prediction || 'Unknown' }
+                            { threat.count > 1 && <span className="ml-2 text-xs text-gray-500">×{ threat.count }</span> }
+                          </td>
                           <td className="px-4 py-3">
                             <span className={ `text-xs px-2 py-1 rounded-full font-medium ${getSeverityClass(threat.severity || (threat.threat_level && threat.threat_level.charAt(0).toUpperCase() + threat.threat_level.slice(1)))}` }>
                               { threat.severity || (threat.threat_level && threat.threat_level.charAt(0).toUpperCase() + threat.threat_level.slice(1)) || 'Unknown' }
@@ -473,6 +531,18 @@ export default function ThreatMonitoringDashboard() {
                   </tbody>
                 </table>
               </div>
+
+              { nextCursor && (
+                <div className="flex justify-center mt-4">
+                  <button
+                    className="px-4 py-2 bg-white border border-gray-300 rounded text-sm font-medium"
+                    onClick={ () => fetchThreats(nextCursor) }
+                    disabled={ loading }
+                  >
+                    { loading ? 'Loading...' : 'Load more' }
+                  </button>
+                </div>
+              ) }
             </div>
           </div>
         ) }
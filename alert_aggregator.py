@@ -0,0 +1,395 @@
+import atexit
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from live_feed import prediction_delta
+from metrics import REGISTRY, MetricsRegistry
+
+# Predictions with equal values for these fields are folded into one alert
+DEFAULT_KEY_FIELDS = ('source', 'target', 'prediction', 'threat_level')
+
+# Fields an aggregated alert changes after it is first written; updates carry
+# only these, so an analyst's status change is never overwritten
+AGGREGATE_FIELDS = ('count', 'last_seen', 'anomaly_score', 'is_anomaly', 'revision')
+
+
+class _Group:
+    __slots__ = ('key', 'document_id', 'document', 'opened_at', 'updated_at', 'dirty', 'emitted', 'delivered')
+
+    def __init__(self, key: Tuple, document_id: str, document: Dict, now: float):
+        self.key = key
+        self.document_id = document_id
+        self.document = document
+        self.opened_at = now
+        self.updated_at = now
+        self.dirty = False
+        # Sequence numbers of the group's emissions: assigned, and handed to on_emit
+        self.emitted = 0
+        self.delivered = 0
+
+
+def _iso_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _more_anomalous(score, current) -> bool:
+    """
+    IsolationForest decision values fall as records get more anomalous
+    """
+    if score is None:
+        return False
+    return current is None or score < current
+
+
+class AlertAggregator:
+    """
+    Fold bursts of near-identical predictions into one aggregated alert per group
+
+    Predictions are grouped by key_fields (source, target, predicted class and
+    threat level by default). A group stays open while matching predictions
+    keep arriving less than `window` seconds apart, up to max_duration, and
+    tracks the count, first and last seen timestamps and the most anomalous
+    score. The first prediction of a group is emitted at once as a complete
+    alert document; later ones only mark the group dirty, and flush() emits
+    one update with the aggregate fields per dirty group. A burst of thousands
+    of records therefore costs one document and a write per flush interval.
+
+    State is bounded: groups close after `window` seconds of inactivity and,
+    when max_groups are open, the least recently updated group is evicted.
+    Closing or evicting a group emits its final update, and the next matching
+    prediction starts a new group with a new document id.
+
+    Emissions go to on_emit(document_id, fields, created). created is True for
+    the full document of a new group and False for an update that should be
+    merged into it; writer_sink() adapts a WriteBehindWriter and AlertHub.
+    on_emit runs after the aggregator's lock is released, so a slow sink only
+    delays the calls that emit; a group's emissions still arrive in order.
+
+    Example (FastAPI backend):
+        aggregator = AlertAggregator(writer_sink(writer, hub), window=60)
+
+        @app.on_event("shutdown")
+        def close_aggregator():
+            aggregator.close()
+            writer.close()
+
+        @app.post("/predict")
+        async def predict_threat(data: dict):
+            result = threat_detector.predict(data)
+            alert_id = aggregator.add({**data, **result, "source_data": data})
+            return {"id": alert_id, **result}
+    """
+
+    def __init__(self, on_emit: Callable[[str, Dict, bool], None], window: float = 60.0,
+                 max_duration: Optional[float] = 3600.0, flush_interval: float = 1.0, max_groups: int = 10000,
+                 key_fields: Sequence[str] = DEFAULT_KEY_FIELDS, metrics: Optional[MetricsRegistry] = None,
+                 start: bool = True):
+        """
+        Args:
+            on_emit: Called with (document id, fields, created) for every new group and update
+            window: Seconds without a matching prediction after which a group closes
+            max_duration: Seconds after which an active group is closed and a new one
+                started, so a never-ending burst still produces periodic alerts; None
+                keeps groups open for as long as predictions arrive
+            flush_interval: Seconds between flushes of the background thread
+            max_groups: Open groups kept before the least recently updated is evicted
+            key_fields: Alert fields identifying a group
+            metrics: Registry for aggregation counters (defaults to metrics.REGISTRY)
+            start: Start the background flush thread immediately
+        """
+        if window <= 0:
+            raise ValueError("window must be positive")
+        if max_groups < 1:
+            raise ValueError("max_groups must be at least 1")
+
+        self.on_emit = on_emit
+        self.window = window
+        self.max_duration = max_duration
+        self.flush_interval = flush_interval
+        self.max_groups = max_groups
+        self.key_fields = tuple(key_fields)
+
+        # Groups in least recently updated order, so expiry and eviction pop from the front
+        self._groups: 'OrderedDict[Tuple, _Group]' = OrderedDict()
+        self._lock = threading.Lock()
+        # Emissions are queued under the lock and delivered after it is released;
+        # a per-group sequence keeps an update from overtaking its creation
+        self._outbox: List[Tuple[_Group, int, Dict, bool]] = []
+        self._delivery = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        self.received = 0
+        self.opened = 0
+        self.updates = 0
+        self.expired = 0
+        self.evicted = 0
+        self.emit_errors = 0
+
+        registry = metrics or REGISTRY
+        self._groups_total = None
+        if registry.enabled:
+            self._groups_total = registry.counter(
+                'threat_alert_groups_total', "Aggregated alert group events", ('event',))
+
+        if start:
+            self.start()
+
+    def start(self) -> None:
+        """
+        Start the background flush thread and flush remaining groups at interpreter exit
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='alert-aggregator', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing aggregated alerts: {str(e)}")
+
+    def key(self, alert: Dict) -> Tuple:
+        """
+        Group key of an alert
+        """
+        return tuple(str(alert.get(field)) for field in self.key_fields)
+
+    def _count(self, event: str, amount: int = 1) -> None:
+        if self._groups_total is not None and amount:
+            self._groups_total.inc(amount, event=event)
+
+    def _emit(self, group: _Group, created: bool) -> None:
+        """
+        Queue an emission of the group (called under the lock)
+        """
+        if created:
+            fields = dict(group.document)
+        else:
+            group.document["revision"] += 1
+            fields = {field: group.document[field] for field in AGGREGATE_FIELDS}
+            self.updates += 1
+            self._count('updated')
+        group.dirty = False
+        self._outbox.append((group, group.emitted, fields, created))
+        group.emitted += 1
+
+    def _take_outbox(self) -> List[Tuple[_Group, int, Dict, bool]]:
+        emissions, self._outbox = self._outbox, []
+        return emissions
+
+    def _deliver(self, emissions: List[Tuple[_Group, int, Dict, bool]]) -> None:
+        """
+        Hand queued emissions to on_emit, outside the lock
+
+        Sequences are assigned in lock order, so an emission only ever waits
+        for earlier emissions of its own group still being delivered by
+        another thread.
+        """
+        for group, sequence, fields, created in emissions:
+            with self._delivery:
+                self._delivery.wait_for(lambda: group.delivered == sequence)
+            try:
+                self.on_emit(group.document_id, fields, created)
+            except Exception as e:
+                with self._delivery:
+                    self.emit_errors += 1
+                print(f"Error emitting aggregated alert {group.document_id}: {str(e)}")
+            finally:
+                with self._delivery:
+                    group.delivered += 1
+                    self._delivery.notify_all()
+
+    def _close(self, group: _Group, event: str) -> None:
+        del self._groups[group.key]
+        if group.dirty:
+            self._emit(group, created=False)
+        self._count(event)
+
+    def _open(self, key: Tuple, alert: Dict, now: float) -> _Group:
+        while len(self._groups) >= self.max_groups:
+            self._close(next(iter(self._groups.values())), 'evicted')
+            self.evicted += 1
+
+        seen = alert.get('timestamp') or _iso_now()
+        # Deterministic ids make a re-emitted group overwrite its own document
+        digest = hashlib.sha1('\x1f'.join(key).encode('utf-8')).hexdigest()[:12]
+        document_id = f"agg-{digest}-{int(now * 1000)}"
+
+        document = dict(alert)
+        document.update({
+            "aggregated": True,
+            "count": 1,
+            "first_seen": seen,
+            "last_seen": seen,
+            "timestamp": seen,
+            "anomaly_score": alert.get('anomaly_score'),
+            "is_anomaly": bool(alert.get('is_anomaly', False)),
+            "revision": 0
+        })
+
+        group = _Group(key, document_id, document, now)
+        self._groups[key] = group
+        self.opened += 1
+        self._count('opened')
+        self._emit(group, created=True)
+        return group
+
+    def _merge(self, group: _Group, alert: Dict, now: float) -> None:
+        document = group.document
+        document["count"] += 1
+        document["last_seen"] = alert.get('timestamp') or _iso_now()
+        score = alert.get('anomaly_score')
+        if _more_anomalous(score, document["anomaly_score"]):
+            document["anomaly_score"] = score
+        document["is_anomaly"] = document["is_anomaly"] or bool(alert.get('is_anomaly', False))
+        group.updated_at = now
+        group.dirty = True
+        self._groups.move_to_end(group.key)
+        self._count('merged')
+
+    def add(self, alert: Dict, now: Optional[float] = None) -> str:
+        """
+        Fold a scored prediction into its group
+
+        Args:
+            alert: Alert document, i.e. the request fields merged with the prediction
+            now: Arrival time in seconds since the epoch (defaults to time.time())
+
+        Returns:
+            Document id of the aggregated alert the prediction was counted in
+        """
+        if self._closed:
+            raise RuntimeError("AlertAggregator is closed")
+        now = time.time() if now is None else now
+        key = self.key(alert)
+
+        with self._lock:
+            self.received += 1
+            group = self._groups.get(key)
+            if group is not None:
+                if now - group.updated_at > self.window:
+                    self._close(group, 'expired')
+                    self.expired += 1
+                    group = None
+                elif self.max_duration is not None and now - group.opened_at > self.max_duration:
+                    self._close(group, 'rolled_over')
+                    group = None
+
+            if group is None:
+                group = self._open(key, alert, now)
+            else:
+                self._merge(group, alert, now)
+            emissions = self._take_outbox()
+        self._deliver(emissions)
+        return group.document_id
+
+    def add_many(self, alerts: Sequence[Dict], now: Optional[float] = None) -> List[str]:
+        """
+        Fold a batch of predictions, e.g. the records of one /bulk-predict call
+
+        Returns:
+            Aggregated alert document id for each alert
+        """
+        now = time.time() if now is None else now
+        return [self.add(alert, now) for alert in alerts]
+
+    def flush(self, now: Optional[float] = None) -> int:
+        """
+        Close idle groups and emit one update for every group changed since the last flush
+
+        Args:
+            now: Current time in seconds since the epoch (defaults to time.time())
+
+        Returns:
+            Number of updates emitted
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            updates = self.updates
+            while self._groups:
+                group = next(iter(self._groups.values()))
+                if now - group.updated_at <= self.window:
+                    break
+                self._close(group, 'expired')
+                self.expired += 1
+
+            for group in self._groups.values():
+                if group.dirty:
+                    self._emit(group, created=False)
+            emitted = self.updates - updates
+            emissions = self._take_outbox()
+        self._deliver(emissions)
+        return emitted
+
+    def close(self) -> None:
+        """
+        Stop the flush thread and emit the final state of every open group
+        """
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+        with self._lock:
+            for group in list(self._groups.values()):
+                self._close(group, 'closed')
+            emissions = self._take_outbox()
+        self._deliver(emissions)
+
+    def stats(self) -> Dict:
+        """
+        Snapshot of the aggregator's counters
+
+        Returns:
+            Dictionary with open groups, received predictions, and opened, update,
+            expired, evicted and emit error counts
+        """
+        return {
+            "open_groups": len(self._groups),
+            "received": self.received,
+            "opened": self.opened,
+            "updates": self.updates,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "emit_errors": self.emit_errors
+        }
+
+
+def writer_sink(writer, hub=None) -> Callable[[str, Dict, bool], None]:
+    """
+    Build an on_emit callback persisting aggregated alerts and publishing them live
+
+    New groups are written as complete documents and published as 'prediction'
+    events; updates are merge writes of the aggregate fields and published as
+    'alert_update' events, which the dashboard applies in place. Updates carry
+    no timestamp, so AlertSummary.add_to_batch counts each group once.
+
+    Args:
+        writer: WriteBehindWriter for the alerts collection
+        hub: AlertHub to publish to, or None
+
+    Returns:
+        Callable for AlertAggregator's on_emit
+    """
+    def emit(document_id: str, fields: Dict, created: bool) -> None:
+        writer.submit(fields, document_id=document_id, merge=not created)
+        if hub is None:
+            return
+        if created:
+            hub.publish('prediction', prediction_delta(document_id, fields))
+        else:
+            hub.publish('alert_update', {"id": document_id, **fields})
+
+    return emit
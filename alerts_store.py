@@ -0,0 +1,369 @@
+import base64
+import json
+import random
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from memory_firestore import DESCENDING, Increment as MemoryIncrement, MemoryFirestore
+from persistence import LazyFirestore
+
+# Fields returned by list views; source_data, explanation and the probability
+# map are only needed by the detail view and make up most of each document
+LIST_FIELDS = [
+    'type', 'prediction', 'severity', 'threat_level', 'source', 'target', 'details',
+    'timestamp', 'status', 'anomaly_score', 'is_anomaly', 'count', 'last_seen'
+]
+
+MAX_PAGE_SIZE = 500
+
+# The dashboard's active threats: Critical and High alerts still open
+URGENT_SEVERITIES = ('Critical', 'High')
+OPEN_STATUSES = ('Active', 'Investigating')
+
+
+def encode_cursor(timestamp: Any, document_id: str) -> str:
+    """
+    Encode the sort key of the last alert on a page as an opaque cursor
+
+    Args:
+        timestamp: Alert timestamp (ISO string or datetime)
+        document_id: Alert document id, the tie-breaker for equal timestamps
+
+    Returns:
+        URL-safe cursor string
+    """
+    if isinstance(timestamp, datetime):
+        timestamp = {"datetime": timestamp.isoformat()}
+    payload = json.dumps([timestamp, document_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string
+
+    Returns:
+        Tuple of timestamp and document id
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, document_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+    if isinstance(timestamp, dict):
+        timestamp = datetime.fromisoformat(timestamp["datetime"])
+    return timestamp, str(document_id)
+
+
+def query_alerts(db, collection: str = 'threats', threat_level: Optional[str] = None,
+                 start: Optional[Any] = None, end: Optional[Any] = None, limit: int = 50,
+                 cursor: Optional[str] = None, fields: Optional[List[str]] = LIST_FIELDS) -> Dict:
+    """
+    Fetch one page of alerts, newest first
+
+    Filtering on threat_level together with a timestamp range is served by
+    the composite index in firestore.indexes.json. Documents are ordered by
+    timestamp and then document id, so the cursor is stable even when
+    several alerts share a timestamp.
+
+    Args:
+        db: firestore.Client or MemoryFirestore
+        collection: Alerts collection
+        threat_level: Only return alerts with this threat level
+        start: Inclusive lower bound on the timestamp
+        end: Exclusive upper bound on the timestamp
+        limit: Page size (at most MAX_PAGE_SIZE)
+        cursor: next_cursor from the previous page
+        fields: Fields to return, or None for the full documents
+
+    Returns:
+        Dictionary with the page's items (each including its id) and next_cursor,
+        which is None on the last page
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    query = db.collection(collection)
+    if threat_level is not None:
+        query = query.where('threat_level', '==', threat_level)
+    if start is not None:
+        query = query.where('timestamp', '>=', start)
+    if end is not None:
+        query = query.where('timestamp', '<', end)
+    query = query.order_by('timestamp', direction=DESCENDING).order_by('__name__', direction=DESCENDING)
+
+    if fields is not None:
+        query = query.select(sorted(set(fields) | {'timestamp'}))
+    if cursor is not None:
+        query = query.start_after(list(decode_cursor(cursor)))
+
+    # One extra document tells whether another page exists
+    snapshots = list(query.limit(limit + 1).stream())
+    page = snapshots[:limit]
+
+    items = [{"id": snapshot.id, **snapshot.to_dict()} for snapshot in page]
+    next_cursor = None
+    if len(snapshots) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor(last.get('timestamp'), last.id)
+
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def _parse_timestamp(timestamp: Any) -> Optional[datetime]:
+    """
+    Parse an alert timestamp as a UTC datetime
+
+    Summary days and hours are UTC, like the window read() sums over;
+    timestamps without an offset are taken as the host's local time.
+    """
+    if isinstance(timestamp, str):
+        try:
+            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if isinstance(timestamp, datetime):
+        return timestamp.astimezone(timezone.utc)
+    return None
+
+
+def alert_severity(alert: Dict) -> str:
+    """
+    Severity as displayed by the dashboard: the reported severity, else the capitalised threat level
+    """
+    if alert.get('severity'):
+        return str(alert['severity'])
+    level = alert.get('threat_level')
+    return str(level).capitalize() if level else 'Unknown'
+
+
+class AlertSummary:
+    """
+    Precomputed alert counts per day, threat level, severity, class, type, status and hour
+
+    Counts live in sharded per-day documents updated with Increment
+    transforms, so recording an alert never reads the summary and the write
+    load on any single document stays below Firestore's sustained
+    per-document limit. Reading a summary sums the shards of the requested
+    days, which touches at most n_shards documents per day instead of
+    every alert.
+    """
+
+    def __init__(self, db, collection: str = 'alert_summary', n_shards: int = 10):
+        """
+        Args:
+            db: firestore.Client or MemoryFirestore
+            collection: Collection holding the shard documents
+            n_shards: Shard documents per day
+        """
+        self.db = db
+        self.collection = collection
+        self.n_shards = n_shards
+        self._increment_type = None
+
+    def _increment(self, value: int):
+        # google.cloud.firestore is imported on the first count, not at startup
+        if self._increment_type is None:
+            db = self.db.connect() if isinstance(self.db, LazyFirestore) else self.db
+            if isinstance(db, MemoryFirestore):
+                self._increment_type = MemoryIncrement
+            else:
+                from google.cloud.firestore import Increment
+                self._increment_type = Increment
+        return self._increment_type(value)
+
+    def _updates(self, alerts: Iterable[Dict]) -> Dict[str, Dict]:
+        """
+        Combine the counter updates of several alerts, one payload per day
+        """
+        counts: Dict[str, Dict[str, Dict[str, int]]] = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+        for alert in alerts:
+            timestamp = _parse_timestamp(alert.get('timestamp'))
+            if timestamp is None:
+                continue
+            day = counts[timestamp.date().isoformat()]
+            day['total'][''] += 1
+            day['by_threat_level'][str(alert.get('threat_level', 'unknown'))] += 1
+            severity = alert_severity(alert)
+            day['by_severity'][severity] += 1
+            day['by_class'][str(alert.get('prediction', 'unknown'))] += 1
+            day['by_type'][str(alert.get('type') or alert.get('prediction') or 'Unknown')] += 1
+            day['by_status'][str(alert.get('status') or 'Active')] += 1
+            if severity in URGENT_SEVERITIES:
+                day['urgent_by_status'][str(alert.get('status') or 'Active')] += 1
+            day['by_hour'][f"{timestamp.hour:02d}"] += 1
+
+        updates = {}
+        for day, groups in counts.items():
+            payload = {"day": day, "total": self._increment(groups.pop('total')[''])}
+            for group, values in groups.items():
+                payload[group] = {key: self._increment(value) for key, value in values.items() if value}
+            updates[day] = payload
+        return updates
+
+    def _shard(self, day: str):
+        return self.db.collection(self.collection).document(f"{day}_{random.randrange(self.n_shards)}")
+
+    def add_to_batch(self, write_batch, alerts: Iterable[Dict]) -> int:
+        """
+        Add the counter updates for alerts to a write batch
+
+        Suitable as WriteBehindWriter's before_commit hook, so the alerts
+        and their summary counts are committed atomically.
+
+        Args:
+            write_batch: Firestore WriteBatch
+            alerts: Alert documents
+
+        Returns:
+            Number of writes added (one per distinct day)
+        """
+        updates = self._updates(alerts)
+        for day, payload in updates.items():
+            write_batch.set(self._shard(day), payload, merge=True)
+        return len(updates)
+
+    def record(self, alerts: Iterable[Dict]) -> None:
+        """
+        Count alerts in their own batch
+        """
+        write_batch = self.db.batch()
+        if self.add_to_batch(write_batch, alerts):
+            write_batch.commit()
+
+    def status_change(self, write_batch, alert: Dict, new_status: str) -> None:
+        """
+        Move an alert's status count from its current status to new_status
+
+        Args:
+            write_batch: Batch that also carries the status update itself
+            alert: Alert document before the change
+            new_status: Status being set
+        """
+        timestamp = _parse_timestamp(alert.get('timestamp'))
+        old_status = str(alert.get('status') or 'Active')
+        if timestamp is None or old_status == new_status:
+            return
+        day = timestamp.date().isoformat()
+        moved = {old_status: self._increment(-1), new_status: self._increment(1)}
+        payload = {"day": day, "by_status": moved}
+        if alert_severity(alert) in URGENT_SEVERITIES:
+            payload["urgent_by_status"] = dict(moved)
+        write_batch.set(self._shard(day), payload, merge=True)
+
+    def read(self, days: int = 7, today: Optional[date] = None) -> Dict:
+        """
+        Sum the counters of the last `days` days (UTC)
+
+        Args:
+            days: Number of days including today
+            today: Day the window ends on (defaults to the current UTC date)
+
+        Returns:
+            Dictionary with total, by_threat_level, by_severity, by_class,
+            by_type, by_status, urgent_by_status (by_status of Critical and High
+            alerts), by_hour (summed across days), by_day totals and active, the
+            Critical and High alerts that are Active or Investigating
+        """
+        today = today or datetime.now(timezone.utc).date()
+        first_day = (today - timedelta(days=days - 1)).isoformat()
+
+        summary = {
+            "total": 0, "by_threat_level": {}, "by_severity": {}, "by_class": {},
+            "by_type": {}, "by_status": {}, "urgent_by_status": {}, "by_hour": {}, "by_day": {}
+        }
+        query = self.db.collection(self.collection).where('day', '>=', first_day)
+        for snapshot in query.stream():
+            shard = snapshot.to_dict()
+            day = shard.get('day')
+            if day is None or day > today.isoformat():
+                continue
+            total = shard.get('total', 0)
+            summary["total"] += total
+            summary["by_day"][day] = summary["by_day"].get(day, 0) + total
+            for group in ("by_threat_level", "by_severity", "by_class", "by_type", "by_status", "urgent_by_status",
+                          "by_hour"):
+                for key, value in (shard.get(group) or {}).items():
+                    summary[group][key] = summary[group].get(key, 0) + value
+
+        summary["active"] = sum(summary["urgent_by_status"].get(status, 0) for status in OPEN_STATUSES)
+        summary["window"] = {"days": days, "start": first_day, "end": today.isoformat()}
+        return summary
+
+
+def update_alert_status(db, alert_id: str, status: str, collection: str = 'threats',
+                        summary: Optional[AlertSummary] = None) -> Optional[Dict]:
+    """
+    Set an alert's status and keep the summary's status counts in step
+
+    Args:
+        db: firestore.Client or MemoryFirestore
+        alert_id: Alert document id
+        status: New status
+        collection: Alerts collection
+        summary: Summary to adjust, if any
+
+    Returns:
+        The alert as it was before the change, or None if it does not exist
+    """
+    reference = db.collection(collection).document(alert_id)
+    snapshot = reference.get()
+    if not snapshot.exists:
+        return None
+
+    previous = snapshot.to_dict()
+    write_batch = db.batch()
+    write_batch.update(reference, {"status": status})
+    if summary is not None:
+        summary.status_change(write_batch, previous, status)
+    write_batch.commit()
+    return previous
+
+
+def create_alerts_router(db, collection: str = 'threats', summary: Optional[AlertSummary] = None):
+    """
+    Build FastAPI routes for paginated alerts and the precomputed summary
+
+    Include the router before any /alerts/{alert_id} route so /alerts/summary
+    is not captured by it.
+
+    Example:
+        summary = AlertSummary(db)
+        # The writer caps batch_size so the summary writes fit in each commit
+        writer = WriteBehindWriter(db, before_commit=summary.add_to_batch, before_commit_writes=20)
+        app.include_router(create_alerts_router(db, summary=summary))
+
+    Args:
+        db: firestore.Client or MemoryFirestore
+        collection: Alerts collection
+        summary: Summary served by /alerts/summary (created when None)
+
+    Returns:
+        fastapi.APIRouter
+    """
+    from fastapi import APIRouter, HTTPException, Query
+
+    router = APIRouter()
+    summary = summary or AlertSummary(db)
+
+    @router.get("/alerts")
+    def list_alerts(threat_level: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+                    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                    full: bool = False):
+        try:
+            return query_alerts(db, collection, threat_level=threat_level, start=start, end=end,
+                                limit=limit, cursor=cursor, fields=None if full else LIST_FIELDS)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @router.get("/alerts/summary")
+    def alerts_summary(days: int = Query(7, ge=1, le=90)):
+        return summary.read(days)
+
+    return router
@@ -0,0 +1,290 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from kdd_data import generate_synthetic_data
+from memory_firestore import MemoryFirestore
+from predict import CybersecurityThreatDetector
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+
+
+def synthetic_records(n_samples: int, seed: int = 42) -> List[Dict]:
+    """
+    Generate benchmark inputs with the same synthetic data used by train.py
+
+    Args:
+        n_samples: Number of records
+        seed: Seed for NumPy's global random state
+
+    Returns:
+        List of feature dictionaries without the class and difficulty columns
+    """
+    np.random.seed(seed)
+    df = generate_synthetic_data(n_samples).drop(columns=['class', 'difficulty'])
+    return df.to_dict('records')
+
+
+def measure(fn: Callable[[], object], repeat: int = 50, min_time: float = 0.2, rows: int = 1) -> Dict:
+    """
+    Time repeated calls of fn after one warm-up call
+
+    Runs at least repeat calls, and keeps going until min_time seconds have passed
+    (capped at 20 * repeat calls) so fast operations get stable percentiles.
+
+    Args:
+        fn: Operation to time
+        repeat: Minimum number of timed calls
+        min_time: Minimum total timed seconds
+        rows: Records processed per call, used for the rows_per_second figure
+
+    Returns:
+        Dictionary of per-call timings in milliseconds
+    """
+    fn()
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < repeat or (time.perf_counter() - started < min_time and len(timings) < 20 * repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+
+    timings = np.array(timings) * 1000.0
+    median = float(np.median(timings))
+    return {
+        "calls": len(timings),
+        "rows": rows,
+        "mean_ms": float(timings.mean()),
+        "median_ms": median,
+        "p95_ms": float(np.percentile(timings, 95)),
+        "min_ms": float(timings.min()),
+        "rows_per_second": rows / (median / 1000.0) if median > 0 else 0.0
+    }
+
+
+def bench_cold_start(models_dir: str, use_bundle: bool, runs: int = 3) -> Dict:
+    """
+    Time importing predict.py and loading the detector in fresh interpreters
+
+    Args:
+        models_dir: Directory containing the saved models
+        use_bundle: Load the model bundle instead of the pickles
+        runs: Number of fresh processes to average over
+
+    Returns:
+        Median import and load times in milliseconds
+    """
+    script = (
+        "import json, time\n"
+        "t0 = time.perf_counter()\n"
+        "from predict import CybersecurityThreatDetector\n"
+        "t1 = time.perf_counter()\n"
+        f"CybersecurityThreatDetector({models_dir!r}, use_bundle={use_bundle})\n"
+        "t2 = time.perf_counter()\n"
+        "print(json.dumps({'import_ms': (t1 - t0) * 1000, 'load_ms': (t2 - t1) * 1000}))\n"
+    )
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', script], cwd=here, capture_output=True,
+                                text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {
+        "runs": runs,
+        "import_ms": float(np.median([s['import_ms'] for s in samples])),
+        "load_ms": float(np.median([s['load_ms'] for s in samples])),
+        "total_ms": float(np.median([s['import_ms'] + s['load_ms'] for s in samples]))
+    }
+
+
+def bench_detector(detector: CybersecurityThreatDetector, records: List[Dict], sizes: List[int],
+                   repeat: int, prefix: str = '') -> Dict[str, Dict]:
+    """
+    Time preprocessing, model calls, full predict and batch scoring
+
+    Args:
+        detector: Loaded threat detector
+        records: Synthetic input records (at least max(sizes) of them)
+        sizes: Batch sizes to time
+        repeat: Minimum number of timed calls per measurement
+        prefix: Prefix for the result names
+
+    Returns:
+        Dictionary of measurement name to timings
+    """
+    results = {}
+    record = records[0]
+    X = detector.preprocess_data(record)
+
+    results[f"{prefix}preprocess_data"] = measure(lambda: detector.preprocess_data(record), repeat)
+    results[f"{prefix}preprocess_batch_1000"] = measure(
+        lambda: detector.preprocess_batch(records[:1000]), max(3, repeat // 10), rows=1000)
+
+    if detector.engine is not None:
+        results[f"{prefix}engine_evaluate"] = measure(lambda: detector.engine.evaluate(X), repeat)
+    if detector.classification_model is not None:
+        results[f"{prefix}classifier_predict_proba"] = measure(
+            lambda: detector.classification_model.predict_proba(X), repeat)
+        results[f"{prefix}anomaly_decision_function"] = measure(
+            lambda: detector.anomaly_detector.decision_function(X), repeat)
+
+    results[f"{prefix}predict"] = measure(lambda: detector.predict(record), repeat)
+
+    for size in sizes:
+        batch = records[:size]
+        calls = max(3, repeat // max(1, size // 10))
+        results[f"{prefix}predict_batch_{size}"] = measure(lambda: detector.predict_batch(batch), calls, rows=size)
+        results[f"{prefix}score_batch_{size}"] = measure(lambda: detector.score_batch(batch), calls, rows=size)
+
+    return results
+
+
+def bench_http(app_path: str, detector: CybersecurityThreatDetector, records: List[Dict],
+               repeat: int) -> Dict[str, Dict]:
+    """
+    Time the /predict and /bulk-predict routes through an in-process ASGI client
+
+    The backend module's Firestore client is replaced with MemoryFirestore and
+    its detector with the one being benchmarked; auth is bypassed for /bulk-predict.
+
+    Args:
+        app_path: Backend application as 'module:attribute', e.g. 'main:app'
+        detector: Loaded threat detector
+        records: Synthetic input records
+        repeat: Minimum number of timed calls per measurement
+
+    Returns:
+        Dictionary of measurement name to timings, or a 'skipped' entry with the reason
+    """
+    try:
+        from fastapi.testclient import TestClient
+        module_name, attribute = app_path.split(':')
+        module = importlib.import_module(module_name)
+        app = getattr(module, attribute)
+    except Exception as e:
+        return {"http": {"skipped": f"{type(e).__name__}: {str(e)}"}}
+
+    module.db = MemoryFirestore()
+    module.threat_detector = detector
+    if hasattr(module, 'verify_token'):
+        app.dependency_overrides[module.verify_token] = lambda: {"uid": "benchmark", "email": "benchmark@localhost"}
+
+    bulk = records[:100]
+    results = {}
+    with TestClient(app) as client:
+        results["http_predict"] = measure(lambda: client.post('/predict', json=records[0]).raise_for_status(), repeat)
+        results["http_bulk_predict_100"] = measure(
+            lambda: client.post('/bulk-predict', json=bulk).raise_for_status(), max(3, repeat // 10), rows=100)
+    return results
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    List measurements whose median got slower than the baseline by more than threshold
+
+    Args:
+        current: Results of this run
+        baseline: Results loaded from a previous run
+        threshold: Allowed relative slowdown, e.g. 0.1 for 10%
+
+    Returns:
+        Human-readable regression descriptions
+    """
+    regressions = []
+    for name, stats in current["results"].items():
+        before = baseline.get("results", {}).get(name, {})
+        for metric in ("median_ms", "total_ms"):
+            if metric in stats and metric in before and before[metric] > 0:
+                change = stats[metric] / before[metric] - 1.0
+                if change > threshold:
+                    regressions.append(f"{name}: {metric} {before[metric]:.3f} -> {stats[metric]:.3f} (+{change:.0%})")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark preprocessing, inference and the HTTP path")
+    parser.add_argument('--models-dir', default='models', help="Directory containing the saved models")
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the JSON results")
+    parser.add_argument('--compare', default=None, help="Baseline JSON to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.15, help="Allowed relative slowdown vs the baseline")
+    parser.add_argument('--app', default=None, help="Backend app to benchmark over HTTP, e.g. main:app")
+    parser.add_argument('--sizes', type=int, nargs='+', default=BATCH_SIZES, help="Batch sizes to time")
+    parser.add_argument('--repeat', type=int, default=50, help="Minimum timed calls per measurement")
+    parser.add_argument('--seed', type=int, default=42, help="Seed for the synthetic inputs")
+    args = parser.parse_args()
+
+    records = synthetic_records(max(max(args.sizes), 1000), seed=args.seed)
+    results = {}
+
+    print("Measuring cold start...")
+    has_bundle = os.path.exists(os.path.join(args.models_dir, 'bundle', 'manifest.json'))
+    has_pickles = os.path.exists(os.path.join(args.models_dir, 'classification_model.pkl'))
+    if has_bundle:
+        results["cold_start_bundle"] = bench_cold_start(args.models_dir, use_bundle=True)
+    if has_pickles:
+        results["cold_start_pickle"] = bench_cold_start(args.models_dir, use_bundle=False)
+
+    print("Measuring detector...")
+    detector = CybersecurityThreatDetector(args.models_dir)
+    results.update(bench_detector(detector, records, args.sizes, args.repeat))
+    if has_bundle and has_pickles:
+        # The pickle detector also times the sklearn model calls for comparison
+        pickle_detector = CybersecurityThreatDetector(args.models_dir, use_bundle=False)
+        results.update(bench_detector(pickle_detector, records, args.sizes, args.repeat, prefix='pickle_'))
+
+    if args.app:
+        print("Measuring HTTP routes...")
+        results.update(bench_http(args.app, detector, records, args.repeat))
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model_version": detector.model_version
+        },
+        "results": results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'measurement':<40}{'median ms':>12}{'p95 ms':>12}{'rows/sec':>14}")
+    for name, stats in results.items():
+        if "median_ms" in stats:
+            print(f"{name:<40}{stats['median_ms']:>12.3f}{stats['p95_ms']:>12.3f}{stats['rows_per_second']:>14,.0f}")
+        elif "total_ms" in stats:
+            print(f"{name:<40}{stats['total_ms']:>12.3f}{'':>12}{'':>14}")
+        else:
+            print(f"{name:<40}  {stats}")
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare}")
@@ -0,0 +1,161 @@
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Modules a serving replica imports to answer its first request
+HOT_PATH_MODULES = [
+    'predict', 'model_registry', 'columnar', 'inference_pool', 'micro_batcher', 'result_cache',
+    'persistence', 'alerts_store', 'live_feed', 'alert_aggregator', 'metrics'
+]
+
+# Modules that cost hundreds of milliseconds or more to import and that
+# serving must not need: training and data tooling, plotting and the
+# Firebase client, which is created lazily (see persistence.LazyFirestore)
+HEAVY_MODULES = [
+    'pandas', 'sklearn', 'scipy', 'matplotlib', 'seaborn', 'firebase_admin', 'google.cloud.firestore', 'grpc'
+]
+
+# Startup budget of a replica on the reference machine: importing the hot
+# path, and everything up to its first answered prediction
+DEFAULT_MAX_IMPORT_MS = 500.0
+DEFAULT_MAX_READY_MS = 1000.0
+
+
+def _probe(modules: Sequence[str], models_dir: Optional[str]) -> None:
+    """
+    Measure one cold start in this fresh interpreter and print it as JSON
+
+    Runs as the child process of measure_cold_start(). Every heavy module
+    that shows up is attributed to the step that first imported it.
+    """
+    culprits: Dict[str, str] = {}
+
+    def step(name: str, fn) -> Tuple[float, object]:
+        before = set(sys.modules)
+        started = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        for heavy in HEAVY_MODULES:
+            if heavy in sys.modules and heavy not in before:
+                culprits.setdefault(heavy, name)
+        return elapsed, result
+
+    imports = {}
+    for module in modules:
+        imports[module], _ = step(f"import {module}", lambda: importlib.import_module(module))
+    result = {"imports_ms": imports, "import_ms": sum(imports.values())}
+
+    if models_dir:
+        from model_registry import synthetic_canary
+        from predict import CybersecurityThreatDetector
+
+        result["load_ms"], detector = step(
+            "model load", lambda: CybersecurityThreatDetector(models_dir, use_bundle=True))
+        result["engine"] = detector.engine is not None
+        result["first_prediction_ms"], _ = step(
+            "first prediction", lambda: detector.predict(synthetic_canary(detector)[0]))
+        result["ready_ms"] = result["import_ms"] + result["load_ms"] + result["first_prediction_ms"]
+
+    result["heavy_modules"] = culprits
+    print(json.dumps(result))
+
+
+def measure_cold_start(models_dir: Optional[str] = None, modules: Sequence[str] = HOT_PATH_MODULES,
+                       runs: int = 3) -> Dict:
+    """
+    Time the serving path's cold start in fresh interpreters
+
+    Args:
+        models_dir: Directory with the model bundle, or None to time imports only
+        modules: Modules imported, in order, before the model is loaded
+        runs: Fresh processes to take the median of
+
+    Returns:
+        Dictionary with median import_ms (and load_ms, first_prediction_ms and
+        ready_ms when models_dir is given), per-module import times and the
+        heavy modules that were imported, mapped to the step that imported them
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    script = f"import cold_start; cold_start._probe({list(modules)!r}, {models_dir!r})"
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', script], cwd=here, capture_output=True,
+                                text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    result = {
+        "runs": runs,
+        "imports_ms": {module: statistics.median(s["imports_ms"][module] for s in samples) for module in modules},
+        "heavy_modules": samples[-1]["heavy_modules"]
+    }
+    for metric in ("import_ms", "load_ms", "first_prediction_ms", "ready_ms"):
+        if metric in samples[0]:
+            result[metric] = statistics.median(s[metric] for s in samples)
+    if "engine" in samples[0]:
+        result["engine"] = samples[0]["engine"]
+    return result
+
+
+def check_cold_start(result: Dict, max_import_ms: float = DEFAULT_MAX_IMPORT_MS,
+                     max_ready_ms: float = DEFAULT_MAX_READY_MS) -> List[str]:
+    """
+    List the ways a measured cold start misses its targets
+
+    Args:
+        result: Output of measure_cold_start()
+        max_import_ms: Budget for importing the hot path
+        max_ready_ms: Budget for importing, loading the model and the first prediction
+
+    Returns:
+        Human-readable failures; empty when every target is met
+    """
+    failures = [f"{module} imported by {step}" for module, step in sorted(result["heavy_modules"].items())]
+    if result.get("engine") is False:
+        failures.append("model loaded without the compiled engine, so sklearn serves predictions")
+    if result["import_ms"] > max_import_ms:
+        failures.append(f"import took {result['import_ms']:.0f} ms (target {max_import_ms:.0f} ms)")
+    if "ready_ms" in result and result["ready_ms"] > max_ready_ms:
+        failures.append(f"first prediction after {result['ready_ms']:.0f} ms (target {max_ready_ms:.0f} ms)")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check that the serving path starts fast and never imports training or plotting libraries")
+    parser.add_argument('--models-dir', default='models', help="Directory containing the model bundle")
+    parser.add_argument('--imports-only', action='store_true', help="Skip loading the model")
+    parser.add_argument('--max-import-ms', type=float, default=DEFAULT_MAX_IMPORT_MS, help="Import time target")
+    parser.add_argument('--max-ready-ms', type=float, default=DEFAULT_MAX_READY_MS,
+                        help="Target for importing, loading the model and the first prediction")
+    parser.add_argument('--runs', type=int, default=3, help="Fresh processes to take the median of")
+    args = parser.parse_args()
+
+    models_dir = None
+    if not args.imports_only:
+        if not os.path.exists(os.path.join(args.models_dir, 'bundle', 'manifest.json')):
+            sys.exit(f"No model bundle in {args.models_dir}; run train.py or pass --imports-only")
+        models_dir = args.models_dir
+
+    result = measure_cold_start(models_dir, runs=args.runs)
+
+    print(f"{'module':<24}{'import ms':>12}")
+    for module, elapsed in result["imports_ms"].items():
+        print(f"{module:<24}{elapsed:>12.1f}")
+    print(f"{'total':<24}{result['import_ms']:>12.1f}")
+    if models_dir:
+        print(f"\nModel load {result['load_ms']:.1f} ms, first prediction {result['first_prediction_ms']:.1f} ms, "
+              f"ready after {result['ready_ms']:.1f} ms")
+
+    failures = check_cold_start(result, args.max_import_ms, args.max_ready_ms)
+    if failures:
+        print("\nCold start check failed:")
+        for line in failures:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nCold start check passed")
@@ -0,0 +1,410 @@
+import json
+import math
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from kdd_data import categorical_columns, feature_names, numeric_columns
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_CONTENT_TYPE = 'application/json'
+ARROW_CONTENT_TYPE = 'application/vnd.apache.arrow.stream'
+MSGPACK_CONTENT_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+# Alert metadata carried next to the features and handed to on_scored untouched
+METADATA_COLUMNS = ['type', 'severity', 'source', 'target', 'details', 'status']
+
+DEFAULT_MAX_ROWS = 100000
+DEFAULT_MAX_BODY_BYTES = 64 * 2**20
+
+# Offending rows listed per column in a validation error
+_MAX_REPORTED_ROWS = 5
+
+
+class ColumnarValidationError(ValueError):
+    """
+    Raised when a columnar batch does not match the model's input schema
+
+    errors follows FastAPI's validation error layout (loc, msg, type), so the
+    response body looks like the one a Pydantic model would produce.
+    """
+
+    def __init__(self, errors: List[Dict]):
+        self.errors = errors
+        super().__init__("; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                                   for error in errors))
+
+
+def loads(body: bytes) -> Any:
+    """
+    Parse JSON with orjson when installed
+    """
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload: Any) -> bytes:
+    """
+    Serialize a response, writing numeric NumPy arrays without per-element Python objects
+
+    orjson serializes float, int and bool arrays natively; without it the
+    standard library encoder is used.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def _records_to_columns(records: List[Mapping]) -> Dict[str, List]:
+    names = list(feature_names) + [name for name in METADATA_COLUMNS if any(name in record for record in records)]
+    return {name: [record.get(name) for record in records] for name in names}
+
+
+def decode_columns(body: bytes, content_type: Optional[str] = JSON_CONTENT_TYPE) -> Dict[str, Any]:
+    """
+    Decode a request body into a mapping of column name to values
+
+    Supported bodies:
+
+    - JSON (application/json): {"columns": {"duration": [...], ...}}, the bare
+      column mapping, or a list of records as sent to /bulk-predict
+    - Arrow IPC stream (application/vnd.apache.arrow.stream), requires pyarrow
+    - MessagePack (application/msgpack), the same layouts as JSON, requires msgpack
+
+    Args:
+        body: Raw request body
+        content_type: Content-Type header of the request
+
+    Returns:
+        Dictionary of column name to a list or NumPy array of values
+
+    Raises:
+        ValueError: If the body cannot be decoded
+        ImportError: If the body format needs a library that is not installed
+    """
+    media_type = (content_type or JSON_CONTENT_TYPE).split(';')[0].strip().lower()
+
+    if media_type == ARROW_CONTENT_TYPE:
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("Arrow request bodies require pyarrow (pip install pyarrow)")
+        try:
+            table = pa.ipc.open_stream(body).read_all()
+        except pa.ArrowInvalid as e:
+            raise ValueError(f"Invalid Arrow stream: {str(e)}")
+        return {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+
+    if media_type in MSGPACK_CONTENT_TYPES:
+        try:
+            import msgpack
+        except ImportError:
+            raise ImportError("MessagePack request bodies require msgpack (pip install msgpack)")
+        try:
+            payload = msgpack.unpackb(body, raw=False)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as e:
+            raise ValueError(f"Invalid MessagePack body: {str(e) or type(e).__name__}")
+    elif media_type == JSON_CONTENT_TYPE or media_type.endswith('+json'):
+        try:
+            payload = loads(body)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON body: {str(e)}")
+    else:
+        raise ValueError(f"Unsupported content type: {media_type}")
+
+    if isinstance(payload, list):
+        return _records_to_columns(payload)
+    if isinstance(payload, dict):
+        columns = payload.get("columns", payload)
+        if isinstance(columns, dict):
+            return columns
+    raise ValueError("Expected a column mapping, {\"columns\": {...}} or a list of records")
+
+
+def validate_columns(columns: Mapping[str, Any], max_rows: int = DEFAULT_MAX_ROWS) -> Tuple[Dict[str, np.ndarray], int]:
+    """
+    Check a columnar batch against the model's input schema in one pass per column
+
+    Numeric columns are converted to float64 arrays that the feature encoder
+    uses without copying; categorical and metadata columns become object
+    arrays. Unknown columns are dropped.
+
+    Args:
+        columns: Column name to values, e.g. from decode_columns()
+        max_rows: Largest accepted batch
+
+    Returns:
+        Tuple of the validated columns and the number of rows
+
+    Raises:
+        ColumnarValidationError: Listing every missing, misshapen or invalid column
+    """
+    errors = []
+    missing = [name for name in feature_names if name not in columns]
+    for name in missing:
+        errors.append({"loc": ["body", name], "msg": "field required", "type": "missing"})
+
+    lengths = {}
+    for name, values in columns.items():
+        if name in feature_names or name in METADATA_COLUMNS:
+            if isinstance(values, (str, bytes, dict)) or not hasattr(values, '__len__'):
+                errors.append({"loc": ["body", name], "msg": "expected a list of values", "type": "list_type"})
+            else:
+                lengths[name] = len(values)
+    n_rows = max(lengths.values(), default=0)
+    for name, length in lengths.items():
+        if length != n_rows:
+            errors.append({"loc": ["body", name], "msg": f"expected {n_rows} values, got {length}",
+                           "type": "length_mismatch"})
+    if n_rows > max_rows:
+        errors.append({"loc": ["body"], "msg": f"at most {max_rows} rows are accepted, got {n_rows}",
+                       "type": "too_many_rows"})
+    if errors:
+        raise ColumnarValidationError(errors)
+
+    validated = {}
+    for name in numeric_columns:
+        try:
+            values = np.asarray(columns[name], dtype=np.float64)
+        except (TypeError, ValueError):
+            errors.append({"loc": ["body", name], "msg": "value is not a valid number", "type": "float_parsing"})
+            continue
+        if values.ndim != 1:
+            errors.append({"loc": ["body", name], "msg": "expected a flat list of numbers", "type": "float_parsing"})
+            continue
+        invalid = np.flatnonzero(~np.isfinite(values))
+        if invalid.size:
+            rows = ', '.join(str(row) for row in invalid[:_MAX_REPORTED_ROWS])
+            errors.append({"loc": ["body", name], "msg": f"null, NaN or infinite value at rows {rows}",
+                           "type": "finite_number"})
+            continue
+        validated[name] = values
+
+    for name in categorical_columns + [name for name in METADATA_COLUMNS if name in columns]:
+        values = np.asarray(columns[name], dtype=object)
+        required = name in categorical_columns
+        is_text = np.fromiter((isinstance(value, str) or (value is None and not required) for value in values),
+                              dtype=bool, count=len(values))
+        if not is_text.all():
+            rows = ', '.join(str(row) for row in np.flatnonzero(~is_text)[:_MAX_REPORTED_ROWS])
+            errors.append({"loc": ["body", name], "msg": f"str type expected at rows {rows}", "type": "string_type"})
+            continue
+        validated[name] = values
+
+    if errors:
+        raise ColumnarValidationError(errors)
+    return validated, n_rows
+
+
+def validate_record(record: Any) -> Dict:
+    """
+    Check a single record against the model's input schema
+
+    The scalar counterpart of validate_columns() for /predict, avoiding the
+    cost of building a Pydantic model per request.
+
+    Args:
+        record: Parsed JSON object
+
+    Returns:
+        The record with numeric features converted to float
+
+    Raises:
+        ColumnarValidationError: Listing every missing or invalid field
+    """
+    if not isinstance(record, dict):
+        raise ColumnarValidationError([{"loc": ["body"], "msg": "expected a JSON object", "type": "dict_type"}])
+
+    errors = []
+    validated = dict(record)
+    for name in numeric_columns:
+        if name not in record:
+            errors.append({"loc": ["body", name], "msg": "field required", "type": "missing"})
+            continue
+        try:
+            value = float(record[name])
+        except (TypeError, ValueError):
+            value = math.nan
+        if not math.isfinite(value):
+            errors.append({"loc": ["body", name], "msg": "value is not a valid number", "type": "float_parsing"})
+            continue
+        validated[name] = value
+
+    for name in categorical_columns:
+        if not isinstance(record.get(name), str):
+            message, kind = ("field required", "missing") if name not in record else ("str type expected", "string_type")
+            errors.append({"loc": ["body", name], "msg": message, "type": kind})
+
+    if errors:
+        raise ColumnarValidationError(errors)
+    return validated
+
+
+def columnar_response(scores: Dict[str, np.ndarray], label_classes: np.ndarray, model_version: str,
+                      timestamp: str) -> Dict:
+    """
+    Arrange CybersecurityThreatDetector.score_batch() output as a columnar response
+
+    Numeric columns stay NumPy arrays for dumps(); only the string columns are
+    converted to lists.
+
+    Args:
+        scores: Output of score_batch()
+        label_classes: Class names, in the column order of class_probabilities
+        model_version: Version of the model that produced the scores
+        timestamp: Scoring time, shared by every row
+
+    Returns:
+        Dictionary with one list per output field
+    """
+    probabilities = scores["class_probabilities"]
+    response = {
+        "model_version": model_version,
+        "timestamp": timestamp,
+        "count": int(len(scores["prediction"])),
+        "prediction": scores["prediction"].tolist(),
+        "threat_level": scores["threat_level"].tolist(),
+        "anomaly_score": scores["anomaly_score"],
+        "is_anomaly": scores["is_anomaly"],
+        "class_probabilities": {str(name): np.ascontiguousarray(probabilities[:, i])
+                                for i, name in enumerate(label_classes)}
+    }
+    if "explanation_features" in scores:
+        response["explanation"] = {
+            "top_features": scores["explanation_features"].tolist(),
+            "contributions": scores["explanation_contributions"],
+            "baseline": scores["explanation_baseline"]
+        }
+    return response
+
+
+def create_columnar_router(detector, path: str = '/bulk-predict/columnar', max_rows: int = DEFAULT_MAX_ROWS,
+                           max_body_bytes: int = DEFAULT_MAX_BODY_BYTES,
+                           on_scored: Optional[Callable[[Dict[str, np.ndarray], Dict[str, np.ndarray]], None]] = None,
+                           predict_path: Optional[str] = None,
+                           on_predicted: Optional[Callable[[Dict, Dict], Optional[Dict]]] = None,
+                           batcher=None):
+    """
+    Build FastAPI routes scoring requests without per-record Pydantic models
+
+    The bulk body is read as bytes, decoded and validated column by column,
+    encoded straight into the model input matrix and scored with
+    score_batch(); the response is columnar JSON serialized by dumps().
+    Validation failures return 422 in FastAPI's error layout, unsupported or
+    undecodable bodies 415/400.
+
+    With predict_path set, a single-record route checked by validate_record()
+    and answered through dumps() is added as well, as a drop-in replacement
+    for the Pydantic-based /predict. Like the bulk route, it scores and calls
+    on_predicted off the event loop: through the batcher when one is given,
+    otherwise in the thread pool.
+
+    Example:
+        batcher = MicroBatcher(threat_detector.predict_batch)  # started on startup
+
+        def store(record, result):
+            return {"id": writer.submit({**record, **result, "source_data": record})}
+
+        app.include_router(create_columnar_router(
+            threat_detector,
+            on_scored=lambda columns, scores: persist_bulk(columns, scores),
+            predict_path='/predict', on_predicted=store, batcher=batcher))
+
+        curl -X POST localhost:8000/bulk-predict/columnar \\
+             -H 'Content-Type: application/json' \\
+             -d '{"columns": {"duration": [0, 2], "protocol_type": ["tcp", "udp"], ...}}'
+
+    Args:
+        detector: Loaded CybersecurityThreatDetector
+        path: Route path
+        max_rows: Largest accepted batch
+        max_body_bytes: Largest accepted request body
+        on_scored: Called with the validated columns (features and metadata) and
+            the score arrays after every successful batch, e.g. to persist alerts
+        predict_path: Path of the single-record route, or None to leave /predict to the backend
+        on_predicted: Called with the validated record and its prediction; a returned
+            dictionary is merged into the response (e.g. the stored alert id)
+        batcher: Started MicroBatcher over detector.predict_batch that coalesces
+            single-record requests, or None to score each one in the thread pool
+
+    Returns:
+        fastapi.APIRouter
+    """
+    from fastapi import APIRouter, HTTPException, Request
+    from fastapi.responses import Response
+    from starlette.concurrency import run_in_threadpool
+
+    router = APIRouter()
+
+    def score(columns: Dict[str, np.ndarray]) -> bytes:
+        scores = detector.score_batch(columns)
+        if on_scored is not None:
+            on_scored(columns, scores)
+        timestamp = datetime.now(timezone.utc).isoformat()
+        return dumps(columnar_response(scores, detector.label_classes, detector.model_version, timestamp))
+
+    @router.post(path)
+    async def bulk_predict_columnar(request: Request):
+        if int(request.headers.get('content-length') or 0) > max_body_bytes:
+            raise HTTPException(status_code=413, detail=f"Request body exceeds {max_body_bytes} bytes")
+        body = await request.body()
+        if len(body) > max_body_bytes:
+            raise HTTPException(status_code=413, detail=f"Request body exceeds {max_body_bytes} bytes")
+
+        try:
+            columns = decode_columns(body, request.headers.get('content-type'))
+            validated, n_rows = validate_columns(columns, max_rows)
+        except ImportError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        except ColumnarValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors)
+        except ValueError as e:
+            status_code = 415 if str(e).startswith("Unsupported content type") else 400
+            raise HTTPException(status_code=status_code, detail=str(e))
+
+        if n_rows == 0:
+            return Response(dumps({"model_version": detector.model_version, "count": 0}),
+                            media_type=JSON_CONTENT_TYPE)
+
+        # Scoring a large batch takes long enough to stall other requests on the event loop
+        content = await run_in_threadpool(score, validated)
+        return Response(content, media_type=JSON_CONTENT_TYPE)
+
+    if predict_path is not None:
+        @router.post(predict_path)
+        async def predict_fast(request: Request):
+            try:
+                record = validate_record(loads(await request.body()))
+            except ColumnarValidationError as e:
+                raise HTTPException(status_code=422, detail=e.errors)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid JSON body: {str(e)}")
+
+            # Scoring and persistence would otherwise block the event loop for every request
+            if batcher is not None:
+                result = await batcher.predict(record)
+            else:
+                result = await run_in_threadpool(detector.predict, record)
+            if "error" in result:
+                raise HTTPException(status_code=500, detail=result["error"])
+            if on_predicted is not None:
+                extra = await run_in_threadpool(on_predicted, record, result)
+                if isinstance(extra, dict):
+                    result = {**result, **extra}
+            return Response(dumps(result), media_type=JSON_CONTENT_TYPE)
+
+    return router
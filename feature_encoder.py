@@ -0,0 +1,182 @@
+import numpy as np
+from typing import Dict, List, Mapping, Sequence
+
+
+class FeatureEncoder:
+    """
+    One-hot encoder and standard scaler compiled into flat lookup tables
+
+    The layout is derived once from the training feature columns, so encoding a
+    record only writes numeric values and indicator slots into a preallocated
+    float64 buffer that already holds the standardized value of zero.
+
+    Missing numeric values (absent, None or NaN) encode as zero in every
+    path, so a record scores the same alone, in a list or in columns.
+    """
+
+    def __init__(self, feature_columns: Sequence[str], mean: np.ndarray, scale: np.ndarray,
+                 categorical_columns: Sequence[str]):
+        """
+        Compile the encoding tables
+
+        Args:
+            feature_columns: Ordered model input columns saved by train.py
+            mean: Per-column mean subtracted by the scaler
+            scale: Per-column scale the centered values are divided by
+            categorical_columns: Raw categorical fields expanded into indicator columns
+        """
+        self.feature_columns = [str(col) for col in feature_columns]
+        self.categorical_columns = list(categorical_columns)
+        self.n_features = len(self.feature_columns)
+
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+
+        # Standardized value of an all-zero row; every slot starts from here
+        self.base = (0.0 - self.mean) / self.scale
+
+        # (column, value) -> slot for every indicator column the model knows about.
+        # The baseline category dropped during training has no slot and stays zero.
+        self.indicator_slots: Dict[tuple, int] = {}
+        for idx, name in enumerate(self.feature_columns):
+            for col in self.categorical_columns:
+                prefix = f"{col}_"
+                if name.startswith(prefix):
+                    self.indicator_slots[(col, name[len(prefix):])] = idx
+                    break
+
+        indicator_indices = set(self.indicator_slots.values())
+        self.numeric_indices = np.array(
+            [idx for idx in range(self.n_features) if idx not in indicator_indices], dtype=np.intp
+        )
+        self.numeric_columns = [self.feature_columns[idx] for idx in self.numeric_indices]
+
+        # Standardized value written into an indicator slot when it is set
+        self.one = (1.0 - self.mean) / self.scale
+
+        # Plain Python tuples keep the single-record loop free of NumPy scalar overhead
+        self._numeric_terms = [
+            (int(idx), self.feature_columns[idx], float(self.mean[idx]), float(self.scale[idx]))
+            for idx in self.numeric_indices
+        ]
+        self._numeric_mean = self.mean[self.numeric_indices]
+        self._numeric_scale = self.scale[self.numeric_indices]
+
+    @classmethod
+    def from_scaler(cls, feature_columns: Sequence[str], scaler,
+                    categorical_columns: Sequence[str]) -> 'FeatureEncoder':
+        """
+        Build an encoder from a fitted StandardScaler
+
+        Args:
+            feature_columns: Ordered model input columns saved by train.py
+            scaler: Fitted sklearn StandardScaler
+            categorical_columns: Raw categorical fields expanded into indicator columns
+
+        Returns:
+            Compiled FeatureEncoder
+        """
+        n_features = len(feature_columns)
+        mean = scaler.mean_ if getattr(scaler, 'with_mean', True) and scaler.mean_ is not None else np.zeros(n_features)
+        scale = scaler.scale_ if getattr(scaler, 'with_std', True) and scaler.scale_ is not None else np.ones(n_features)
+        return cls(feature_columns, mean, scale, categorical_columns)
+
+    def encode(self, record: Mapping) -> np.ndarray:
+        """
+        Encode and standardize a single record
+
+        Args:
+            record: Dictionary containing feature values
+
+        Returns:
+            Array of shape (1, n_features)
+        """
+        X = np.empty((1, self.n_features), dtype=np.float64)
+        row = X[0]
+        row[:] = self.base
+
+        for idx, name, mean, scale in self._numeric_terms:
+            value = record.get(name)
+            if value:
+                value = float(value)
+                # NaN != NaN; it is missing, like None
+                if value == value:
+                    row[idx] = (value - mean) / scale
+
+        for col in self.categorical_columns:
+            idx = self.indicator_slots.get((col, record.get(col)))
+            if idx is not None:
+                row[idx] = self.one[idx]
+
+        return X
+
+    def encode_records(self, records: List[Mapping]) -> np.ndarray:
+        """
+        Encode and standardize a list of records
+
+        Args:
+            records: List of dictionaries containing feature values
+
+        Returns:
+            Array of shape (n_records, n_features)
+        """
+        n_records = len(records)
+        X = np.empty((n_records, self.n_features), dtype=np.float64)
+        X[:] = self.base
+        if n_records == 0:
+            return X
+
+        numeric = np.array(
+            [[record.get(name) or 0 for name in self.numeric_columns] for record in records],
+            dtype=np.float64
+        )
+        numeric[np.isnan(numeric)] = 0.0
+        X[:, self.numeric_indices] = (numeric - self._numeric_mean) / self._numeric_scale
+
+        for col in self.categorical_columns:
+            self._set_indicators(X, col, [record.get(col) for record in records])
+
+        return X
+
+    def encode_columns(self, columns: Mapping) -> np.ndarray:
+        """
+        Encode and standardize columnar input
+
+        Args:
+            columns: Mapping of column name to per-record values (a DataFrame works too)
+
+        Returns:
+            Array of shape (n_records, n_features)
+        """
+        n_records = 0
+        for col in columns:
+            n_records = len(columns[col])
+            break
+
+        X = np.empty((n_records, self.n_features), dtype=np.float64)
+        X[:] = self.base
+        if n_records == 0:
+            return X
+
+        for idx, name, mean, scale in self._numeric_terms:
+            if name in columns:
+                # None becomes NaN here
+                values = np.array(columns[name], dtype=np.float64)
+                values[np.isnan(values)] = 0.0
+                X[:, idx] = (values - mean) / scale
+
+        for col in self.categorical_columns:
+            if col in columns:
+                self._set_indicators(X, col, columns[col])
+
+        return X
+
+    def _set_indicators(self, X: np.ndarray, col: str, values: Sequence) -> None:
+        """
+        Write the indicator slots of one categorical column into X
+        """
+        slots = self.indicator_slots
+        indices = np.fromiter((slots.get((col, value), -1) for value in values), dtype=np.intp, count=len(values))
+        rows = np.flatnonzero(indices >= 0)
+        slot_indices = indices[rows]
+        X[rows, slot_indices] = self.one[slot_indices]
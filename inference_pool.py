@@ -0,0 +1,686 @@
+import asyncio
+import atexit
+import itertools
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+from multiprocessing.connection import wait as wait_connections
+from typing import Any, Dict, List, Optional
+
+from metrics import REGISTRY, MetricsRegistry
+
+DEFAULT_WORKERS = int(os.environ.get('INFERENCE_WORKERS', '0')) or os.cpu_count() or 1
+DEFAULT_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', '5'))
+
+# Methods of CybersecurityThreatDetector callable through the pool
+POOL_METHODS = ('predict', 'predict_batch', 'score_batch')
+
+# Worker-side ModelRegistry method used by InferencePool.reload
+_RELOAD = 'reload'
+
+# Message telling a worker to exit
+_STOP = None
+
+
+class PoolSaturated(RuntimeError):
+    """
+    Raised when the pool already holds its maximum number of outstanding requests
+    """
+
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(f"Inference pool is saturated; retry after {retry_after}s")
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when a request is not answered before its deadline
+    """
+
+
+class WorkerError(RuntimeError):
+    """
+    Raised when the detector failed inside a worker
+    """
+
+
+def _worker_main(models_dir: str, detector_kwargs: Dict, connection, heartbeat_interval: float) -> None:
+    """
+    Worker process: load the detector once, then serve requests until told to stop
+
+    With a model bundle the detector memory-maps its arrays, so every worker
+    shares one physical copy of the model through the page cache. The
+    detector sits in a ModelRegistry so it can be reloaded in place. Requests
+    and results travel over a pipe private to this worker, so a worker that
+    is killed mid-read cannot leave a shared queue lock held.
+    """
+    # One process per core already; nested BLAS/OpenMP threads would oversubscribe it
+    for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(variable, '1')
+
+    from model_registry import ModelRegistry
+
+    disabled = MetricsRegistry(enabled=False)
+    try:
+        models = ModelRegistry(models_dir, detector_kwargs={'metrics': disabled, **detector_kwargs}, metrics=disabled)
+    except Exception as e:
+        connection.send(('failed', os.getpid(), str(e)))
+        return
+    connection.send(('ready', os.getpid(), models.model_version))
+
+    while True:
+        try:
+            if not connection.poll(heartbeat_interval):
+                connection.send(('heartbeat', os.getpid(), None))
+                continue
+            item = connection.recv()
+        except (EOFError, OSError):
+            # The pool went away
+            return
+        if item is _STOP:
+            return
+
+        request_id, deadline, method, payload = item
+        # The caller has already given up; skip the work instead of adding to the backlog
+        if time.time() > deadline:
+            connection.send(('expired', request_id, None))
+            continue
+        try:
+            connection.send(('ok', request_id, getattr(models, method)(payload)))
+        except Exception as e:
+            connection.send(('error', request_id, f"{type(e).__name__}: {str(e)}"))
+
+
+def _settle(future: Future, result: Any = None, exception: Optional[BaseException] = None) -> None:
+    """
+    Resolve a future unless its caller already cancelled it
+    """
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class _WorkerState:
+    __slots__ = ('index', 'process', 'connection', 'outbox', 'sender', 'inflight', 'pid', 'ready', 'failed',
+                 'dead', 'model_version', 'spawned_at', 'last_seen', 'served', 'errors', 'expired', 'restarts')
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.connection = None
+        self.outbox = queue.Queue()
+        self.sender = None
+        self.inflight = set()
+        self.pid = None
+        self.ready = False
+        self.failed = False
+        self.dead = False
+        self.model_version = None
+        self.spawned_at = 0.0
+        self.last_seen = 0.0
+        self.served = 0
+        self.errors = 0
+        self.expired = 0
+        self.restarts = 0
+
+
+class InferencePool:
+    """
+    Pool of detector processes behind one bounded set of outstanding requests
+
+    CPU-bound forest evaluation runs in worker processes, so it neither
+    blocks the event loop nor is serialised by the GIL, and throughput
+    scales with the number of cores. Each worker loads the detector once;
+    with a model bundle (train.py writes one) the arrays are memory-mapped
+    read-only and shared by all workers.
+
+    Admission control: at most max_pending requests may be outstanding.
+    Beyond that, submissions fail immediately with PoolSaturated, carrying a
+    Retry-After estimate, instead of queueing without bound. Every request
+    has a deadline; workers drop requests whose deadline has passed, and
+    callers get DeadlineExceeded. Requests go to the ready worker with the
+    fewest in flight. When a worker dies its in-flight requests fail with
+    WorkerError and it is restarted.
+
+    Typical FastAPI wiring:
+
+        pool = InferencePool('models')
+        install_pool_handlers(app, pool)
+
+        @app.post("/predict")
+        async def predict_threat(data: ThreatData):
+            result = await pool.predict(data.dict())
+
+        @app.get("/health")
+        def health():
+            return {"status": "ok", "inference": pool.health()}
+    """
+
+    def __init__(self, models_dir: str = 'models', n_workers: int = DEFAULT_WORKERS,
+                 max_pending: Optional[int] = None, timeout: float = DEFAULT_TIMEOUT,
+                 heartbeat_interval: float = 1.0, detector_kwargs: Optional[Dict] = None,
+                 metrics: Optional[MetricsRegistry] = None, start_method: str = 'spawn'):
+        """
+        Args:
+            models_dir: Directory containing the saved models (ideally with a bundle)
+            n_workers: Worker processes (defaults to INFERENCE_WORKERS or the CPU count)
+            max_pending: Outstanding requests accepted before shedding load
+                (defaults to 32 per worker)
+            timeout: Default seconds a request may take before DeadlineExceeded
+            heartbeat_interval: Seconds between heartbeats from idle workers
+            detector_kwargs: Extra CybersecurityThreatDetector arguments, e.g. cache_size
+            metrics: Registry for request counters (defaults to metrics.REGISTRY)
+            start_method: multiprocessing start method; 'spawn' is safe with the
+                server's threads
+        """
+        if n_workers < 1:
+            raise ValueError("n_workers must be at least 1")
+
+        self.models_dir = models_dir
+        self.n_workers = n_workers
+        self.max_pending = max_pending or 32 * n_workers
+        self.timeout = timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.detector_kwargs = detector_kwargs or {}
+
+        self._context = multiprocessing.get_context(start_method)
+        self._workers = [_WorkerState(index) for index in range(n_workers)]
+        self._pending: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._closed = False
+
+        # Exponentially weighted seconds from submission to answer, for Retry-After
+        self._latency = 0.01
+
+        self.rejected = 0
+        self.timed_out = 0
+
+        self._requests_total = None
+        registry = metrics or REGISTRY
+        if registry.enabled:
+            self._requests_total = registry.counter(
+                'threat_inference_pool_requests_total', "Inference pool requests by outcome", ('result',))
+
+    def start(self, wait: bool = True, timeout: float = 60.0) -> None:
+        """
+        Start the workers and the result dispatcher
+
+        Args:
+            wait: Block until every worker has loaded the models
+            timeout: Seconds to wait for the workers
+
+        Raises:
+            RuntimeError: If a worker fails to load the models or does not become ready in time
+        """
+        if self._dispatcher is not None:
+            return
+        for state in self._workers:
+            self._spawn(state)
+            state.sender = threading.Thread(target=self._send_loop, args=(state,),
+                                            name=f'inference-pool-sender-{state.index}', daemon=True)
+            state.sender.start()
+        self._dispatcher = threading.Thread(target=self._dispatch, name='inference-pool-dispatcher', daemon=True)
+        self._dispatcher.start()
+        # Stop the workers before multiprocessing's own exit handler terminates them
+        atexit.register(self.close)
+
+        if wait:
+            deadline = time.monotonic() + timeout
+            while not all(state.ready for state in self._workers):
+                failed = [state for state in self._workers if state.failed or state.dead]
+                if failed:
+                    self.close()
+                    raise RuntimeError(f"Inference worker {failed[0].index} exited while loading the models")
+                if time.monotonic() > deadline:
+                    self.close()
+                    raise RuntimeError(f"Inference workers not ready after {timeout}s")
+                time.sleep(0.05)
+
+    def _spawn(self, state: _WorkerState) -> None:
+        connection, child_connection = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, name=f'inference-worker-{state.index}', daemon=True,
+            args=(self.models_dir, self.detector_kwargs, child_connection, self.heartbeat_interval))
+        process.start()
+        child_connection.close()
+        with self._lock:
+            state.process, state.connection = process, connection
+            state.pid = process.pid
+            state.ready = state.dead = False
+            state.spawned_at = time.monotonic()
+
+    def _send_loop(self, state: _WorkerState) -> None:
+        """
+        Forward queued requests to one worker, so submit never blocks on a busy worker's pipe
+        """
+        while True:
+            item = state.outbox.get()
+            if item is _STOP:
+                try:
+                    state.connection.send(_STOP)
+                except (OSError, ValueError):
+                    pass
+                return
+
+            request_id = item[0]
+            with self._lock:
+                # Skip requests that were reaped or failed with a dead worker while queued here
+                if request_id not in state.inflight:
+                    continue
+                connection = state.connection
+            try:
+                connection.send(item)
+            except (OSError, ValueError):
+                with self._lock:
+                    entry = self._pending.pop(request_id, None)
+                    state.inflight.discard(request_id)
+                if entry is not None:
+                    _settle(entry[0], exception=WorkerError(f"Inference worker {state.index} exited"))
+
+    def _count(self, result: str) -> None:
+        if self._requests_total is not None:
+            self._requests_total.inc(result=result)
+
+    def _dispatch(self) -> None:
+        """
+        Resolve futures from worker results, reap abandoned requests and restart dead workers
+        """
+        while not self._closed:
+            owners = {}
+            for state in self._workers:
+                if state.process is not None and not state.dead:
+                    owners[state.connection] = state
+                    owners[state.process.sentinel] = state
+            try:
+                ready = wait_connections(list(owners), timeout=self.heartbeat_interval)
+            except OSError:
+                # A connection was closed underneath us by close()
+                ready = []
+
+            now = time.time()
+            for handle in ready:
+                state = owners[handle]
+                if state.dead:
+                    continue
+                if handle is not state.connection:
+                    # The process sentinel fired: the worker exited
+                    self._worker_exited(state)
+                    continue
+                try:
+                    message = state.connection.recv()
+                except (EOFError, OSError):
+                    self._worker_exited(state)
+                    continue
+                self._handle(state, message, now)
+
+            self._reap(now)
+            self._restart_dead()
+
+    def _handle(self, state: _WorkerState, message: tuple, now: float) -> None:
+        kind, key, value = message
+        state.last_seen = now
+        if kind == 'ready':
+            state.ready, state.pid, state.model_version = True, key, value
+        elif kind == 'failed':
+            # Not restarted: loading would fail again the same way
+            state.failed = True
+            print(f"Inference worker {state.index} failed to load the models: {value}")
+        elif kind in ('ok', 'error', 'expired'):
+            self._resolve(state, kind, key, value, now)
+
+    def _worker_exited(self, state: _WorkerState) -> None:
+        """
+        Fail the requests a dead worker was holding; _restart_dead replaces it
+        """
+        with self._lock:
+            state.dead = True
+            state.ready = False
+            entries = [self._pending.pop(request_id) for request_id in state.inflight
+                       if request_id in self._pending]
+            state.inflight.clear()
+        # Reap the process so its exit code is known
+        state.process.join(timeout=1.0)
+        for future, _, _ in entries:
+            _settle(future, exception=WorkerError(f"Inference worker {state.index} exited"))
+
+    def _resolve(self, state: _WorkerState, kind: str, request_id: int, value: Any, now: float) -> None:
+        with self._lock:
+            entry = self._pending.pop(request_id, None)
+            state.inflight.discard(request_id)
+        if kind == 'ok':
+            state.served += 1
+        elif kind == 'error':
+            state.errors += 1
+        else:
+            state.expired += 1
+        self._count(kind)
+        if entry is None:
+            # The request was already reaped; its caller has gone
+            return
+
+        future, submitted, deadline = entry
+        # Reloads carry no submission time; they would skew the Retry-After estimate
+        if submitted is not None:
+            self._latency = 0.9 * self._latency + 0.1 * (now - submitted)
+        if kind == 'ok':
+            _settle(future, result=value)
+        elif kind == 'error':
+            _settle(future, exception=WorkerError(value))
+        else:
+            _settle(future, exception=DeadlineExceeded("Request deadline passed before a worker picked it up"))
+
+    def _reap(self, now: float) -> None:
+        """
+        Forget requests well past their deadline, e.g. ones held by a worker that died
+        """
+        grace = max(1.0, self.heartbeat_interval)
+        with self._lock:
+            abandoned = [request_id for request_id, (_, _, deadline) in self._pending.items()
+                         if now > deadline + grace]
+            entries = [self._pending.pop(request_id) for request_id in abandoned]
+            for state in self._workers:
+                state.inflight.difference_update(abandoned)
+        for future, _, _ in entries:
+            _settle(future, exception=DeadlineExceeded("Request was not answered before its deadline"))
+
+    def _restart_dead(self) -> None:
+        # A worker that keeps crashing is restarted at most once per second
+        now = time.monotonic()
+        for state in self._workers:
+            if state.process is not None and state.process.exitcode is not None and not state.dead:
+                self._worker_exited(state)
+            if state.dead and not state.failed and not self._closed and now - state.spawned_at >= 1.0:
+                print(f"Inference worker {state.index} (pid {state.pid}) exited with code "
+                      f"{state.process.exitcode}; restarting")
+                state.restarts += 1
+                self._spawn(state)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def retry_after(self) -> int:
+        """
+        Seconds a rejected client should wait, at least 1
+
+        Recent requests were answered after queueing behind a similar backlog,
+        so their latency approximates how long the backlog takes to drain.
+        """
+        return max(1, math.ceil(self._latency))
+
+    def _choose_worker(self) -> Optional[_WorkerState]:
+        """
+        Least-loaded ready worker, else any live one (it queues until loaded); caller holds the lock
+        """
+        candidates = [state for state in self._workers if state.ready and not state.dead]
+        if not candidates:
+            candidates = [state for state in self._workers
+                          if state.process is not None and not state.dead and not state.failed]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda state: len(state.inflight))
+
+    def _register(self, state: _WorkerState, future: Future, submitted: Optional[float], deadline: float) -> int:
+        """
+        Record an outstanding request assigned to a worker; caller holds the lock
+        """
+        request_id = next(self._ids)
+        self._pending[request_id] = (future, submitted, deadline)
+        state.inflight.add(request_id)
+        return request_id
+
+    def submit(self, method: str, payload: Any, timeout: Optional[float] = None) -> Future:
+        """
+        Queue a detector call without waiting for it
+
+        Args:
+            method: One of POOL_METHODS
+            payload: The method's argument (a record, or a batch of records)
+            timeout: Seconds until the request's deadline (defaults to the pool timeout)
+
+        Returns:
+            concurrent.futures.Future resolved with the detector's return value
+
+        Raises:
+            PoolSaturated: If max_pending requests are already outstanding
+            WorkerError: If no worker is able to take the request
+        """
+        if method not in POOL_METHODS:
+            raise ValueError(f"method must be one of {POOL_METHODS}")
+        if self._closed:
+            raise RuntimeError("InferencePool is closed")
+        if self._dispatcher is None:
+            self.start()
+
+        timeout = self.timeout if timeout is None else timeout
+        now = time.time()
+        future: Future = Future()
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                state = None
+            else:
+                state = self._choose_worker()
+                if state is None:
+                    raise WorkerError("No inference worker is available")
+                request_id = self._register(state, future, now, now + timeout)
+        if state is None:
+            self._count('rejected')
+            raise PoolSaturated(self.retry_after())
+
+        state.outbox.put((request_id, now + timeout, method, payload))
+        return future
+
+    def call(self, method: str, payload: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Blocking detector call, e.g. as MicroBatcher's predict_batch from its executor thread
+
+        Raises:
+            PoolSaturated: If the pool is saturated
+            DeadlineExceeded: If no answer arrives before the deadline
+            WorkerError: If the detector raised inside the worker
+        """
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(method, payload, timeout)
+        try:
+            return future.result(timeout)
+        except DeadlineExceeded:
+            raise
+        except FutureTimeoutError:
+            self.timed_out += 1
+            self._count('timeout')
+            raise DeadlineExceeded(f"No answer within {timeout}s")
+
+    async def run(self, method: str, payload: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Awaitable detector call; the event loop stays free while a worker scores
+        """
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(method, payload, timeout)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except DeadlineExceeded:
+            raise
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self._count('timeout')
+            raise DeadlineExceeded(f"No answer within {timeout}s")
+
+    async def predict(self, record: Dict, timeout: Optional[float] = None) -> Dict:
+        return await self.run('predict', record, timeout)
+
+    async def predict_batch(self, records: List[Dict], timeout: Optional[float] = None) -> List[Dict]:
+        return await self.run('predict_batch', records, timeout)
+
+    def reload(self, models_dir: Optional[str] = None, timeout: float = 120.0) -> Dict:
+        """
+        Rolling model reload: each worker in turn loads, canaries and swaps in the new models
+
+        One worker reloads at a time and is taken out of rotation meanwhile,
+        so the others keep serving. Each worker's ModelRegistry finishes the
+        request it is scoring on the old version before loading. A worker
+        whose new model is rejected keeps the old one and stops the rollout.
+
+        Args:
+            models_dir: Directory to load from (defaults to the pool's); restarted
+                workers load from it once the first worker has swapped
+            timeout: Seconds allowed for each worker's reload
+
+        Returns:
+            Dictionary with models_dir and one reload report per worker
+
+        Raises:
+            WorkerError: If a worker fails to load the models or they fail the canary
+            DeadlineExceeded: If a worker does not finish within timeout
+        """
+        if self._dispatcher is None:
+            self.start()
+        models_dir = models_dir or self.models_dir
+        reports = []
+        for state in self._workers:
+            if state.dead or state.failed:
+                continue
+            future: Future = Future()
+            deadline = time.time() + timeout
+            with self._lock:
+                # Out of rotation while it reloads; requests go to the other workers
+                state.ready = False
+                request_id = self._register(state, future, None, deadline)
+            state.outbox.put((request_id, deadline, _RELOAD, models_dir))
+            try:
+                report = future.result(timeout)
+            except FutureTimeoutError:
+                raise DeadlineExceeded(f"Worker {state.index} did not reload within {timeout}s")
+            finally:
+                if not state.dead:
+                    state.ready = True
+
+            state.model_version = report.get("version", state.model_version)
+            self.models_dir = models_dir
+            reports.append({"worker": state.index, **report})
+
+        return {"models_dir": models_dir, "workers": reports}
+
+    def health(self) -> Dict:
+        """
+        Worker health for the /health route
+
+        A worker is healthy when its process is alive, it has loaded the
+        models and it reported in recently (idle workers send heartbeats,
+        busy ones report through their results).
+
+        Returns:
+            Dictionary with status ('ok', 'degraded' or 'down'), pending and
+            max_pending, rejected and timed-out counts, and one entry per worker
+        """
+        now = time.time()
+        stale_after = max(3 * self.heartbeat_interval, self.timeout)
+        workers = []
+        for state in self._workers:
+            alive = state.process is not None and not state.dead and state.process.exitcode is None
+            healthy = alive and state.ready and now - state.last_seen <= stale_after
+            workers.append({
+                "index": state.index,
+                "pid": state.pid,
+                "alive": alive,
+                "ready": state.ready,
+                "healthy": healthy,
+                "model_version": state.model_version,
+                "in_flight": len(state.inflight),
+                "seconds_since_seen": round(now - state.last_seen, 3) if state.last_seen else None,
+                "served": state.served,
+                "errors": state.errors,
+                "expired": state.expired,
+                "restarts": state.restarts
+            })
+
+        n_healthy = sum(worker["healthy"] for worker in workers)
+        status = 'ok' if n_healthy == self.n_workers else 'degraded' if n_healthy else 'down'
+        return {
+            "status": status,
+            "healthy_workers": n_healthy,
+            "workers_total": self.n_workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "saturated": self.pending >= self.max_pending,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "workers": workers
+        }
+
+    def close(self, timeout: float = 10.0) -> None:
+        """
+        Stop the workers and fail requests that are still outstanding
+        """
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        for state in self._workers:
+            state.outbox.put(_STOP)
+        deadline = time.monotonic() + timeout
+        for state in self._workers:
+            if state.process is not None:
+                state.process.join(max(0.0, deadline - time.monotonic()))
+                if state.process.is_alive():
+                    state.process.terminate()
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout=2 * self.heartbeat_interval)
+        for state in self._workers:
+            if state.sender is not None:
+                state.sender.join(timeout=1.0)
+            if state.connection is not None and not state.sender.is_alive():
+                state.connection.close()
+
+        with self._lock:
+            entries = list(self._pending.values())
+            self._pending.clear()
+        for future, _, _ in entries:
+            _settle(future, exception=RuntimeError("InferencePool closed"))
+
+
+def install_pool_handlers(app, pool: InferencePool) -> None:
+    """
+    Start and stop the pool with the app and map its errors to HTTP responses
+
+    PoolSaturated becomes 503 with a Retry-After header, DeadlineExceeded 504
+    and WorkerError 500.
+
+    Args:
+        app: FastAPI application
+        pool: Pool used by the app's routes
+    """
+    from fastapi.responses import JSONResponse
+    from starlette.concurrency import run_in_threadpool
+
+    @app.on_event("startup")
+    async def start_inference_pool():
+        # Loading the models in every worker takes a while; keep the loop responsive
+        await run_in_threadpool(pool.start)
+
+    @app.on_event("shutdown")
+    async def close_inference_pool():
+        await run_in_threadpool(pool.close)
+
+    @app.exception_handler(PoolSaturated)
+    async def pool_saturated(request, exc: PoolSaturated):
+        return JSONResponse(status_code=503, content={"detail": str(exc)},
+                            headers={"Retry-After": str(exc.retry_after)})
+
+    @app.exception_handler(DeadlineExceeded)
+    async def deadline_exceeded(request, exc: DeadlineExceeded):
+        return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+    @app.exception_handler(WorkerError)
+    async def worker_error(request, exc: WorkerError):
+        return JSONResponse(status_code=500, content={"detail": str(exc)})
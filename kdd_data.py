@@ -0,0 +1,147 @@
+import os
+import numpy as np
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+# pandas is only needed to build or read datasets, so the column definitions
+# below can be imported by the serving path without it
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Column names for NSL-KDD dataset
+col_names = [
+    'duration', 'protocol_type', 'service', 'flag', 'src_bytes', 'dst_bytes',
+    'land', 'wrong_fragment', 'urgent', 'hot', 'num_failed_logins', 'logged_in',
+    'num_compromised', 'root_shell', 'su_attempted', 'num_root', 'num_file_creations',
+    'num_shells', 'num_access_files', 'num_outbound_cmds', 'is_host_login',
+    'is_guest_login', 'count', 'srv_count', 'serror_rate', 'srv_serror_rate',
+    'rerror_rate', 'srv_rerror_rate', 'same_srv_rate', 'diff_srv_rate',
+    'srv_diff_host_rate', 'dst_host_count', 'dst_host_srv_count', 'dst_host_same_srv_rate',
+    'dst_host_diff_srv_rate', 'dst_host_same_src_port_rate', 'dst_host_srv_diff_host_rate',
+    'dst_host_serror_rate', 'dst_host_srv_serror_rate', 'dst_host_rerror_rate',
+    'dst_host_srv_rerror_rate', 'class', 'difficulty'
+]
+
+categorical_columns = ['protocol_type', 'service', 'flag']
+
+# The 41 connection features, without the label and difficulty columns
+feature_names = col_names[:-2]
+
+numeric_columns = [col for col in feature_names if col not in categorical_columns]
+
+# Explicit dtypes avoid pandas type inference on every chunk
+column_dtypes: Dict[str, object] = {col: np.float64 for col in numeric_columns}
+column_dtypes.update({col: str for col in categorical_columns})
+column_dtypes.update({'class': str, 'difficulty': np.float64})
+
+
+def generate_synthetic_data(n_samples: int = 1000) -> 'pd.DataFrame':
+    """
+    Generate a random dataset in the NSL-KDD layout
+
+    Uses NumPy's global random state, so seed it with np.random.seed for
+    reproducible data.
+
+    Args:
+        n_samples: Number of rows to generate
+
+    Returns:
+        DataFrame with the col_names columns, including class and difficulty
+    """
+    import pandas as pd
+
+    # Generate numeric features
+    numeric_features = np.random.rand(n_samples, 38)
+
+    # Generate categorical features
+    protocols = np.random.choice(['tcp', 'udp', 'icmp'], n_samples)
+    services = np.random.choice(['http', 'ftp', 'smtp', 'ssh', 'dns'], n_samples)
+    flags = np.random.choice(['SF', 'S0', 'REJ', 'RSTO'], n_samples)
+
+    # Generate labels: normal, dos, probe, r2l, u2r
+    labels = np.random.choice(['normal', 'dos', 'probe', 'r2l', 'u2r'],
+                             n_samples, p=[0.6, 0.2, 0.1, 0.07, 0.03])
+
+    # Create DataFrame
+    df = pd.DataFrame(numeric_features, columns=numeric_columns)
+
+    df['protocol_type'] = protocols
+    df['service'] = services
+    df['flag'] = flags
+    df['class'] = labels
+    df['difficulty'] = np.random.randint(0, 21, n_samples)
+
+    # Reorder columns to match col_names
+    return df[col_names]
+
+
+def detect_format(path: str) -> str:
+    """
+    Guess the input format from a file extension
+
+    Args:
+        path: Input file path
+
+    Returns:
+        One of 'csv', 'jsonl' or 'parquet'
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    # KDDTrain+.txt / KDDTest+.txt are comma separated without a header
+    return 'csv'
+
+
+def _csv_columns(path: str) -> List[str]:
+    """
+    Column names for a header-less KDD file, based on its field count
+    """
+    with open(path) as f:
+        first_line = f.readline()
+    n_fields = len(first_line.rstrip('\n').split(','))
+    if n_fields > len(col_names):
+        raise ValueError(f"{path} has {n_fields} fields, expected at most {len(col_names)}")
+    return col_names[:n_fields]
+
+
+def iter_chunks(path: str, chunk_size: int = 50000, input_format: Optional[str] = None,
+                header: bool = False) -> Iterator['pd.DataFrame']:
+    """
+    Stream a KDD-format file as fixed-size DataFrame chunks
+
+    Args:
+        path: CSV (NSL-KDD layout), JSONL or Parquet file
+        chunk_size: Rows per chunk
+        input_format: 'csv', 'jsonl' or 'parquet'; detected from the extension when None
+        header: Whether a CSV file starts with a header row instead of the bare KDD layout
+
+    Yields:
+        DataFrames of at most chunk_size rows
+    """
+    import pandas as pd
+
+    input_format = input_format or detect_format(path)
+
+    if input_format == 'csv':
+        names = None if header else _csv_columns(path)
+        reader = pd.read_csv(path, header=0 if header else None, names=names,
+                             dtype=column_dtypes, chunksize=chunk_size)
+        for chunk in reader:
+            yield chunk
+
+    elif input_format == 'jsonl':
+        reader = pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False)
+        for chunk in reader:
+            yield chunk
+
+    elif input_format == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet files requires pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+    else:
+        raise ValueError(f"Unsupported input format: {input_format}")
@@ -0,0 +1,296 @@
+import asyncio
+import contextlib
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from alerts_store import LIST_FIELDS
+
+# Seconds between SSE comment lines that keep proxies from closing idle streams
+HEARTBEAT_INTERVAL = 15.0
+
+
+class _Subscriber:
+    __slots__ = ('queue', 'loop', 'overflowed')
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.loop = loop
+        self.overflowed = False
+
+
+class AlertHub:
+    """
+    In-process fan-out of alert deltas to live subscribers
+
+    Every published event gets an id and is kept in a bounded replay
+    buffer, so a client that reconnects with its last seen id receives what
+    it missed. Each subscriber has its own bounded queue; a subscriber that
+    falls behind is disconnected instead of buffering without limit or
+    slowing the publisher, and resumes from the replay buffer when it
+    reconnects.
+
+    Event ids are "<epoch>-<sequence>". The epoch changes on every process
+    start, so ids from before a restart are recognised and answered with a
+    'reset' event telling the client to reload instead of silently
+    missing events.
+    """
+
+    def __init__(self, buffer_size: int = 1000, max_queue_size: int = 256):
+        """
+        Args:
+            buffer_size: Events kept for replay to reconnecting clients
+            max_queue_size: Undelivered events a subscriber may accumulate before it is dropped
+        """
+        self.max_queue_size = max_queue_size
+        self.epoch = format(int(time.time() * 1000), 'x')
+        self._sequence = itertools.count(1)
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._subscribers: List[_Subscriber] = []
+        self._lock = threading.Lock()
+
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def publish(self, event_type: str, data: Dict) -> str:
+        """
+        Broadcast an event to every subscriber; safe to call from any thread
+
+        Args:
+            event_type: Event name, e.g. 'prediction' or 'status'
+            data: JSON-serialisable payload
+
+        Returns:
+            The event id
+        """
+        with self._lock:
+            event_id = f"{self.epoch}-{next(self._sequence)}"
+            event = {"id": event_id, "type": event_type, "data": data}
+            self._buffer.append(event)
+            subscribers = list(self._subscribers)
+            self.published += 1
+
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(self._deliver, subscriber, event)
+            except RuntimeError:
+                # The subscriber's event loop has been closed
+                self._remove(subscriber)
+        return event_id
+
+    def _deliver(self, subscriber: _Subscriber, event: Dict) -> None:
+        if subscriber.overflowed:
+            return
+        try:
+            subscriber.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            subscriber.overflowed = True
+            self.dropped_subscribers += 1
+            self._remove(subscriber)
+
+    def _remove(self, subscriber: _Subscriber) -> None:
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def _replay(self, last_event_id: Optional[str]) -> Tuple[List[Dict], bool]:
+        """
+        Buffered events after last_event_id, and whether the client must reload instead
+        """
+        if not last_event_id:
+            return [], False
+        epoch, _, sequence = last_event_id.partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return [], True
+
+        sequence = int(sequence)
+        events = [event for event in self._buffer if int(event["id"].rsplit('-', 1)[1]) > sequence]
+        oldest = int(self._buffer[0]["id"].rsplit('-', 1)[1]) if self._buffer else sequence + 1
+        # Events between the client's position and the start of the buffer are gone
+        return events, oldest > sequence + 1
+
+    async def subscribe(self, last_event_id: Optional[str] = None) -> AsyncIterator[Dict]:
+        """
+        Yield events as they are published, starting after last_event_id
+
+        The iterator ends when the subscriber falls too far behind; the
+        client is expected to reconnect with the id of the last event it saw.
+
+        Args:
+            last_event_id: Id of the last event the client received, if resuming
+
+        Yields:
+            Event dictionaries with id, type and data
+        """
+        subscriber = _Subscriber(asyncio.get_running_loop(), self.max_queue_size)
+        with self._lock:
+            # Register and snapshot the buffer together, so no event is missed or repeated
+            replay, reset = self._replay(last_event_id)
+            self._subscribers.append(subscriber)
+
+        try:
+            if reset:
+                with self._lock:
+                    last_id = self._buffer[-1]["id"] if self._buffer else f"{self.epoch}-0"
+                yield {"id": last_id, "type": "reset", "data": {}}
+            for event in replay:
+                yield event
+            while not subscriber.overflowed or not subscriber.queue.empty():
+                yield await subscriber.queue.get()
+        finally:
+            self._remove(subscriber)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def stats(self) -> Dict:
+        """
+        Snapshot of hub counters
+
+        Returns:
+            Dictionary with subscribers, published, dropped_subscribers and buffered
+        """
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped_subscribers": self.dropped_subscribers,
+            "buffered": len(self._buffer)
+        }
+
+
+def prediction_delta(alert_id: str, alert: Dict) -> Dict:
+    """
+    Small payload describing a new alert, limited to the list view fields
+
+    Args:
+        alert_id: Alert document id
+        alert: Stored alert document
+
+    Returns:
+        Dictionary with the id and LIST_FIELDS values
+    """
+    delta = {field: alert[field] for field in LIST_FIELDS if field in alert}
+    delta["id"] = alert_id
+    return delta
+
+
+def status_delta(alert_id: str, status: str, previous_status: Optional[str] = None,
+                 severity: Optional[str] = None) -> Dict:
+    """
+    Small payload describing a status change
+
+    Args:
+        alert_id: Alert document id
+        status: New status
+        previous_status: Status before the change, so clients can adjust their counts
+        severity: Alert severity (alerts_store.alert_severity()), so clients can
+            adjust the counts of Critical and High alerts as well
+
+    Returns:
+        Dictionary with id, status, previous_status and severity
+    """
+    return {"id": alert_id, "status": status, "previous_status": previous_status, "severity": severity}
+
+
+def format_sse(event: Dict) -> str:
+    """
+    Encode an event in the text/event-stream wire format
+    """
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+async def sse_stream(hub: AlertHub, last_event_id: Optional[str] = None,
+                     heartbeat: float = HEARTBEAT_INTERVAL) -> AsyncIterator[str]:
+    """
+    Server-Sent Events body for one client, with periodic heartbeats
+
+    Args:
+        hub: Hub to subscribe to
+        last_event_id: Last-Event-ID sent by a reconnecting client
+        heartbeat: Seconds of silence before a keep-alive comment is sent
+
+    Yields:
+        Encoded SSE frames
+    """
+    # Tell EventSource how long to wait before reconnecting after a drop
+    yield "retry: 1000\n\n"
+    events = hub.subscribe(last_event_id).__aiter__()
+    next_event = None
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(events.__anext__())
+            done, _ = await asyncio.wait({next_event}, timeout=heartbeat)
+            if not done:
+                yield ": keep-alive\n\n"
+                continue
+            try:
+                event = next_event.result()
+            except StopAsyncIteration:
+                return
+            next_event = None
+            yield format_sse(event)
+    finally:
+        if next_event is not None:
+            next_event.cancel()
+            # aclose() fails while the generator is still running the cancelled __anext__
+            with contextlib.suppress(asyncio.CancelledError, StopAsyncIteration):
+                await next_event
+        await events.aclose()
+
+
+def create_live_router(hub: AlertHub, path: str = '/alerts/stream'):
+    """
+    Build a FastAPI route streaming hub events as Server-Sent Events
+
+    Publish from the existing handlers after the write is queued:
+
+        hub = AlertHub()
+        app.include_router(create_live_router(hub))
+
+        @app.post("/predict")
+        async def predict_threat(data: dict):
+            result = threat_detector.predict(data)
+            document = {**data, **result, "source_data": data}
+            alert_id = writer.submit(document)
+            hub.publish('prediction', prediction_delta(alert_id, document))
+            return {"id": alert_id, **result}
+
+        @app.patch("/threats/{alert_id}/status")
+        def update_status(alert_id: str, body: dict):
+            previous = update_alert_status(db, alert_id, body["status"], summary=summary)
+            if previous is None:
+                raise HTTPException(status_code=404, detail="Threat not found")
+            hub.publish('status', status_delta(alert_id, body["status"], previous.get("status"),
+                                               alert_severity(previous)))
+            return {"id": alert_id, "status": body["status"]}
+
+    Include it before any /alerts/{alert_id} route.
+
+    Args:
+        hub: Hub whose events are streamed
+        path: Route path
+
+    Returns:
+        fastapi.APIRouter
+    """
+    from fastapi import APIRouter, Header
+    from fastapi.responses import StreamingResponse
+
+    router = APIRouter()
+
+    @router.get(path)
+    async def alert_stream(last_event_id: Optional[str] = Header(None),
+                           since: Optional[str] = None):
+        # EventSource sends Last-Event-ID on reconnects; ?since= covers the first connection
+        return StreamingResponse(
+            sse_stream(hub, last_event_id or since),
+            media_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    return router
@@ -0,0 +1,457 @@
+import argparse
+import asyncio
+import importlib
+import ipaddress
+import json
+import random
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from memory_firestore import MemoryFirestore
+from SendThreat import fixed_data, threats
+
+# Seconds before a request is abandoned and counted as an error
+DEFAULT_TIMEOUT = 10.0
+
+PERCENTILES = (50, 90, 95, 99)
+
+# How each SendThreat scenario departs from the benign fixed_data template.
+# Every entry maps a feature to a function of the random generator
+SCENARIO_FEATURES: Dict[str, Dict[str, Callable[[random.Random], object]]] = {
+    "Ransomware": {
+        "src_bytes": lambda rng: int(rng.lognormvariate(9, 1.5)),
+        "dst_bytes": lambda rng: int(rng.lognormvariate(11, 1.5)),
+        "hot": lambda rng: rng.randint(2, 20),
+        "num_file_creations": lambda rng: rng.randint(5, 40),
+        "num_access_files": lambda rng: rng.randint(1, 9),
+        "count": lambda rng: rng.randint(20, 200)
+    },
+    "Brute Force": {
+        "flag": lambda rng: rng.choice(['REJ', 'RSTO', 'SF']),
+        "logged_in": lambda rng: int(rng.random() < 0.05),
+        "num_failed_logins": lambda rng: rng.randint(1, 5),
+        "count": lambda rng: rng.randint(50, 500),
+        "srv_count": lambda rng: rng.randint(50, 500),
+        "rerror_rate": lambda rng: round(rng.uniform(0.5, 1.0), 2),
+        "srv_rerror_rate": lambda rng: round(rng.uniform(0.5, 1.0), 2),
+        "dst_host_rerror_rate": lambda rng: round(rng.uniform(0.5, 1.0), 2)
+    },
+    "Data Exfiltration": {
+        "duration": lambda rng: rng.randint(60, 5000),
+        "src_bytes": lambda rng: int(rng.lognormvariate(14, 1.5)),
+        "dst_bytes": lambda rng: int(rng.lognormvariate(6, 1)),
+        "num_file_creations": lambda rng: rng.randint(0, 3),
+        "dst_host_same_src_port_rate": lambda rng: round(rng.uniform(0.5, 1.0), 2)
+    },
+    "Phishing": {
+        "src_bytes": lambda rng: int(rng.lognormvariate(8, 1)),
+        "dst_bytes": lambda rng: int(rng.lognormvariate(6, 1)),
+        "count": lambda rng: rng.randint(1, 100),
+        "dst_host_count": lambda rng: rng.randint(50, 255)
+    },
+    "Zero-Day Exploit": {
+        "wrong_fragment": lambda rng: rng.choice([0, 0, 1, 3]),
+        "urgent": lambda rng: rng.choice([0, 0, 1]),
+        "hot": lambda rng: rng.randint(0, 30),
+        "num_compromised": lambda rng: rng.randint(0, 10),
+        "root_shell": lambda rng: int(rng.random() < 0.3),
+        "num_root": lambda rng: rng.randint(0, 5),
+        "num_shells": lambda rng: rng.randint(0, 2)
+    }
+}
+
+
+class RecordGenerator:
+    """
+    Randomized /predict payloads built from the SendThreat.py templates
+
+    Most production traffic is benign, so a share of normal_ratio records
+    are the fixed_data connection with jittered volumes and rates from a
+    random internal host. The rest follow one of the threat scenarios, with
+    the scenario's characteristic features drawn from SCENARIO_FEATURES and
+    sources spread over the template address's /24, so repeated sources and
+    targets occur as they do in real bursts.
+    """
+
+    def __init__(self, normal_ratio: float = 0.7, seed: Optional[int] = None):
+        """
+        Args:
+            normal_ratio: Share of benign records
+            seed: Seed for reproducible record streams
+        """
+        self.normal_ratio = normal_ratio
+        self.rng = random.Random(seed)
+
+    def _jitter(self, record: Dict) -> None:
+        rng = self.rng
+        record["duration"] = int(rng.expovariate(1 / 2.0)) if rng.random() < 0.3 else 0
+        record["src_bytes"] = int(rng.lognormvariate(5.2, 0.8))
+        record["dst_bytes"] = int(rng.lognormvariate(8.5, 1.0))
+        record["count"] = rng.randint(1, 30)
+        record["srv_count"] = rng.randint(1, record["count"])
+        record["dst_host_count"] = rng.randint(1, 255)
+        record["dst_host_srv_count"] = rng.randint(1, 255)
+        record["dst_host_same_src_port_rate"] = round(rng.random() * 0.3, 2)
+
+    def _source(self, template: str) -> str:
+        try:
+            network = ipaddress.ip_network(f"{template}/24", strict=False)
+        except ValueError:
+            return template
+        return str(network.network_address + self.rng.randint(1, 254))
+
+    def record(self) -> Dict:
+        """
+        Generate one payload
+
+        Returns:
+            Feature dictionary, with the SendThreat request fields for threat records
+        """
+        rng = self.rng
+        record = dict(fixed_data)
+        self._jitter(record)
+
+        if rng.random() < self.normal_ratio:
+            record.update({
+                "protocol_type": "tcp",
+                "service": rng.choice(['http', 'http', 'http', 'smtp', 'ftp', 'dns']),
+                "source": f"10.0.{rng.randint(0, 15)}.{rng.randint(1, 254)}",
+                "target": rng.choice(['Web Application Server', 'File Server', 'Mail Server'])
+            })
+            return record
+
+        threat = rng.choice(threats)
+        record.update(threat)
+        for feature, draw in SCENARIO_FEATURES.get(threat["type"], {}).items():
+            record[feature] = draw(rng)
+        record["source"] = self._source(threat["source"])
+        return record
+
+    def batch(self, size: int) -> List[Dict]:
+        """
+        Generate a /bulk-predict payload of size records
+        """
+        return [self.record() for _ in range(size)]
+
+
+class LoadStats:
+    """
+    Outcomes of the requests sent at one load level
+    """
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.records = 0
+        self.skipped = 0
+
+    def record(self, latency: float, outcome: str, records: int) -> None:
+        self.latencies.append(latency)
+        self.outcomes[outcome] += 1
+        if outcome == '200':
+            self.records += records
+
+    def summary(self, elapsed: float) -> Dict:
+        """
+        Summarize the level
+
+        Args:
+            elapsed: Seconds the measured part of the level lasted
+
+        Returns:
+            Dictionary with request and error counts, throughput and latency percentiles in ms
+        """
+        requests = len(self.latencies)
+        errors = requests - self.outcomes.get('200', 0)
+        summary = {
+            "requests": requests,
+            "errors": errors,
+            "error_rate": errors / requests if requests else 0.0,
+            "skipped": self.skipped,
+            "outcomes": dict(self.outcomes),
+            "requests_per_second": requests / elapsed if elapsed > 0 else 0.0,
+            "records_per_second": self.records / elapsed if elapsed > 0 else 0.0
+        }
+        if requests:
+            latencies = np.array(self.latencies) * 1000.0
+            for percentile in PERCENTILES:
+                summary[f"p{percentile}_ms"] = float(np.percentile(latencies, percentile))
+            summary["max_ms"] = float(latencies.max())
+        return summary
+
+
+class LoadGenerator:
+    """
+    Drive /predict or /bulk-predict at a fixed arrival rate or concurrency
+
+    Open-loop mode (rate) schedules requests on a Poisson arrival process
+    whether or not earlier ones have finished, the way independent clients
+    behave, and measures latency from each request's scheduled start, so a
+    stalled server is charged for the queueing it causes instead of hiding
+    it (coordinated omission). Closed-loop mode (concurrency) keeps a fixed
+    number of requests in flight and reports the throughput that sustains.
+
+    Requests share one httpx.AsyncClient, so connections are pooled and
+    reused as they would be behind a load balancer.
+    """
+
+    def __init__(self, client, generator: RecordGenerator, endpoint: str = '/predict', batch_size: int = 100,
+                 headers: Optional[Dict] = None, max_in_flight: int = 1000):
+        """
+        Args:
+            client: httpx.AsyncClient pointed at the backend
+            generator: Source of request payloads
+            endpoint: '/predict' or '/bulk-predict'
+            batch_size: Records per /bulk-predict request
+            headers: Extra request headers, e.g. Authorization
+            max_in_flight: Open-loop requests allowed in flight before new
+                arrivals are skipped and counted, so an overloaded server cannot
+                exhaust the client
+        """
+        self.client = client
+        self.generator = generator
+        self.endpoint = endpoint
+        self.bulk = endpoint.rstrip('/').endswith('bulk-predict')
+        self.batch_size = batch_size
+        self.headers = headers or {}
+        self.max_in_flight = max_in_flight
+
+    async def _send(self, stats: Optional[LoadStats], started: float) -> None:
+        if self.bulk:
+            payload, records = self.generator.batch(self.batch_size), self.batch_size
+        else:
+            payload, records = self.generator.record(), 1
+        try:
+            response = await self.client.post(self.endpoint, json=payload, headers=self.headers)
+            outcome = str(response.status_code)
+        except Exception as e:
+            outcome = type(e).__name__
+        if stats is not None:
+            stats.record(time.perf_counter() - started, outcome, records)
+
+    async def run_rate(self, rate: float, duration: float, warmup: float = 0.0) -> Dict:
+        """
+        Send requests at an average of `rate` per second
+
+        Args:
+            rate: Mean arrivals per second
+            duration: Measured seconds
+            warmup: Seconds of load sent first and left out of the results
+
+        Returns:
+            LoadStats.summary of the measured part, plus the offered rate
+        """
+        stats = LoadStats()
+        tasks = set()
+        began = time.perf_counter()
+        measure_from = began + warmup
+        scheduled = began
+        while True:
+            scheduled += random.expovariate(rate)
+            if scheduled - measure_from > duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            measured = scheduled >= measure_from
+            if len(tasks) >= self.max_in_flight:
+                if measured:
+                    stats.skipped += 1
+                continue
+            task = asyncio.create_task(self._send(stats if measured else None, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+
+        summary = stats.summary(max(time.perf_counter() - measure_from, 1e-9))
+        summary["offered_rate"] = rate
+        return summary
+
+    async def run_concurrency(self, concurrency: int, duration: float, warmup: float = 0.0) -> Dict:
+        """
+        Keep `concurrency` requests in flight
+
+        Args:
+            concurrency: Concurrent requests
+            duration: Measured seconds
+            warmup: Seconds of load sent first and left out of the results
+
+        Returns:
+            LoadStats.summary of the measured part, plus the concurrency
+        """
+        stats = LoadStats()
+        began = time.perf_counter()
+        measure_from = began + warmup
+        deadline = measure_from + duration
+
+        async def worker():
+            while True:
+                started = time.perf_counter()
+                if started >= deadline:
+                    return
+                await self._send(stats if started >= measure_from else None, started)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        summary = stats.summary(max(time.perf_counter() - measure_from, 1e-9))
+        summary["concurrency"] = concurrency
+        return summary
+
+
+def saturated(summary: Dict, slo_ms: float, max_error_rate: float) -> Optional[str]:
+    """
+    Reason a load level is past the saturation point, or None if it is sustainable
+
+    Args:
+        summary: Result of a LoadGenerator run
+        slo_ms: Largest acceptable p99 latency
+        max_error_rate: Largest acceptable share of failed requests
+    """
+    if not summary["requests"]:
+        return "no requests completed"
+    if summary["error_rate"] > max_error_rate:
+        return f"error rate {summary['error_rate']:.1%}"
+    if summary["p99_ms"] > slo_ms:
+        return f"p99 {summary['p99_ms']:.0f} ms > {slo_ms:.0f} ms"
+    offered = summary.get("offered_rate")
+    if offered and (summary["requests_per_second"] < 0.9 * offered or summary["skipped"]):
+        return f"served {summary['requests_per_second']:.0f}/s of {offered:.0f}/s offered"
+    return None
+
+
+def create_app_client(app_path: str, timeout: float):
+    """
+    Client for a backend app running in this process with Firestore stubbed out
+
+    The module's Firestore client is replaced with MemoryFirestore and token
+    verification is bypassed, as in benchmark.py, so the run measures the
+    API and the model rather than a remote database.
+
+    Args:
+        app_path: Backend application as 'module:attribute', e.g. 'main:app'
+        timeout: Request timeout in seconds
+
+    Returns:
+        Tuple of the app and an httpx.AsyncClient calling it over ASGI
+    """
+    import httpx
+
+    module_name, attribute = app_path.split(':')
+    module = importlib.import_module(module_name)
+    app = getattr(module, attribute)
+
+    module.db = MemoryFirestore()
+    if hasattr(module, 'verify_token'):
+        app.dependency_overrides[module.verify_token] = lambda: {"uid": "load-test", "email": "load-test@localhost"}
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://load-test', timeout=timeout)
+    return app, client
+
+
+async def run_levels(args) -> List[Dict]:
+    """
+    Run every requested load level in turn, stopping after the first saturated one
+    """
+    import httpx
+
+    generator = RecordGenerator(normal_ratio=args.normal_ratio, seed=args.seed)
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    levels = args.rate or args.concurrency
+
+    if args.app:
+        app, client = create_app_client(args.app, args.timeout)
+        lifespan = app.router.lifespan_context(app)
+    else:
+        # Enough pooled connections that the client is never the bottleneck
+        connections = max(levels) if args.concurrency else args.max_in_flight
+        limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits)
+        lifespan = None
+
+    results = []
+    try:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        async with client:
+            load = LoadGenerator(client, generator, endpoint=args.endpoint, batch_size=args.batch_size,
+                                 headers=headers, max_in_flight=args.max_in_flight)
+            for level in levels:
+                if args.rate:
+                    summary = await load.run_rate(level, args.duration, args.warmup)
+                else:
+                    summary = await load.run_concurrency(int(level), args.duration, args.warmup)
+                summary["saturated"] = saturated(summary, args.slo_ms, args.max_error_rate)
+                results.append(summary)
+                print_level(level, summary)
+                if summary["saturated"] and not args.keep_going:
+                    break
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+    return results
+
+
+def print_level(level, summary: Dict) -> None:
+    latencies = ''.join(f"{summary.get(f'p{p}_ms', float('nan')):>10.1f}" for p in PERCENTILES)
+    print(f"{level:>10g}{summary['requests_per_second']:>12.1f}{summary['records_per_second']:>12.1f}"
+          f"{summary['error_rate']:>9.1%}{latencies}  {summary['saturated'] or 'ok'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /predict and /bulk-predict routes")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', default='http://localhost:8000', help="Base URL of a running backend")
+    target.add_argument('--app', default=None,
+                        help="Run the backend in-process with Firestore stubbed out, e.g. main:app")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--rate', type=float, nargs='+', help="Open-loop arrival rates (requests/sec) to step through")
+    mode.add_argument('--concurrency', type=int, nargs='+', help="Closed-loop concurrency levels to step through")
+    parser.add_argument('--endpoint', default='/predict', help="'/predict' or '/bulk-predict'")
+    parser.add_argument('--batch-size', type=int, default=100, help="Records per /bulk-predict request")
+    parser.add_argument('--duration', type=float, default=30.0, help="Measured seconds per level")
+    parser.add_argument('--warmup', type=float, default=5.0, help="Unmeasured seconds before each level")
+    parser.add_argument('--slo-ms', type=float, default=500.0, help="p99 latency a level must stay under")
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help="Error rate a level must stay under")
+    parser.add_argument('--max-in-flight', type=int, default=1000, help="Open-loop requests in flight before skipping")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="Request timeout in seconds")
+    parser.add_argument('--token', default=None, help="Bearer token for /bulk-predict on a remote backend")
+    parser.add_argument('--normal-ratio', type=float, default=0.7, help="Share of benign records")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for reproducible records")
+    parser.add_argument('--keep-going', action='store_true', help="Run every level even after saturation")
+    parser.add_argument('--output', default=None, help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    unit = 'rate' if args.rate else 'conc'
+    print(f"Load testing {args.app or args.url}{args.endpoint}")
+    print(f"{unit:>10}{'req/sec':>12}{'rec/sec':>12}{'errors':>9}"
+          + ''.join(f"{f'p{p} ms':>10}" for p in PERCENTILES) + "  status")
+    results = asyncio.run(run_levels(args))
+
+    sustained = [summary for summary in results if not summary["saturated"]]
+    if sustained:
+        best = max(sustained, key=lambda summary: summary["requests_per_second"])
+        print(f"\nHighest sustainable load: {best['requests_per_second']:.1f} req/sec "
+              f"({best['records_per_second']:.1f} records/sec), p99 {best['p99_ms']:.1f} ms")
+    else:
+        print("\nEvery level was saturated; try lower levels")
+
+    if args.output:
+        report = {
+            "meta": {
+                "target": args.app or args.url,
+                "endpoint": args.endpoint,
+                "batch_size": args.batch_size if args.endpoint.rstrip('/').endswith('bulk-predict') else 1,
+                "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z')
+            },
+            "levels": results
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
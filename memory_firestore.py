@@ -0,0 +1,315 @@
+import copy
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+# Same values as google.cloud.firestore.Query.ASCENDING / DESCENDING
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+
+_OPERATORS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a is not None and a < b,
+    '<=': lambda a, b: a is not None and a <= b,
+    '>': lambda a, b: a is not None and a > b,
+    '>=': lambda a, b: a is not None and a >= b,
+    'in': lambda a, b: a in b,
+    'not-in': lambda a, b: a not in b,
+    'array_contains': lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+def _get_field(data: Dict, field_path: str) -> Any:
+    """
+    Read a dotted field path from a document
+    """
+    value = data
+    for part in field_path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _set_field(data: Dict, field_path: str, value: Any) -> None:
+    """
+    Write a dotted field path into a document, resolving Increment transforms
+    """
+    parts = field_path.split('.')
+    target = data
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    if isinstance(value, Increment):
+        value = (target.get(parts[-1]) or 0) + value.value
+    target[parts[-1]] = value
+
+
+def _merge_fields(target: Dict, data: Dict) -> None:
+    """
+    Deep-merge a set() payload into a document, resolving Increment transforms
+    """
+    for field, value in data.items():
+        if isinstance(value, dict):
+            existing = target.get(field)
+            if not isinstance(existing, dict):
+                existing = target[field] = {}
+            _merge_fields(existing, value)
+        elif isinstance(value, Increment):
+            target[field] = (target.get(field) or 0) + value.value
+        else:
+            target[field] = copy.deepcopy(value)
+
+
+class Increment:
+    """
+    Stand-in for google.cloud.firestore.Increment
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+
+class MemoryDocumentSnapshot:
+    def __init__(self, reference: 'MemoryDocumentReference', data: Optional[Dict]):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str) -> Any:
+        return _get_field(self._data or {}, field_path)
+
+
+class MemoryDocumentReference:
+    def __init__(self, client: 'MemoryFirestore', collection: str, document_id: str):
+        self._client = client
+        self.collection_name = collection
+        self.id = document_id
+
+    @property
+    def path(self) -> str:
+        return f"{self.collection_name}/{self.id}"
+
+    def set(self, data: Dict, merge: bool = False) -> None:
+        self._client._write([('set', self, data, merge)])
+
+    def update(self, data: Dict) -> None:
+        self._client._write([('update', self, data, False)])
+
+    def delete(self) -> None:
+        self._client._write([('delete', self, None, False)])
+
+    def get(self) -> MemoryDocumentSnapshot:
+        self._client._simulate_latency()
+        with self._client._lock:
+            data = self._client._collections.get(self.collection_name, {}).get(self.id)
+            return MemoryDocumentSnapshot(self, copy.deepcopy(data))
+
+
+class MemoryQuery:
+    def __init__(self, client: 'MemoryFirestore', collection: str, filters: tuple = (),
+                 orders: tuple = (), limit_count: Optional[int] = None, fields: Optional[tuple] = None,
+                 cursor: Optional[tuple] = None):
+        self._client = client
+        self._collection = collection
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit_count
+        self._fields = fields
+        self._cursor = cursor
+
+    def _copy(self, **changes) -> 'MemoryQuery':
+        state = {
+            'filters': self._filters, 'orders': self._orders, 'limit_count': self._limit,
+            'fields': self._fields, 'cursor': self._cursor
+        }
+        state.update(changes)
+        return MemoryQuery(self._client, self._collection, **state)
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value: Any = None,
+              filter=None) -> 'MemoryQuery':
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in _OPERATORS:
+            raise ValueError(f"Unsupported operator: {op_string}")
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> 'MemoryQuery':
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> 'MemoryQuery':
+        return self._copy(limit_count=count)
+
+    def select(self, field_paths: List[str]) -> 'MemoryQuery':
+        return self._copy(fields=tuple(field_paths))
+
+    def start_after(self, document_fields) -> 'MemoryQuery':
+        """
+        Resume after a snapshot, a dict of ordered fields, or a list of ordered values
+        """
+        if isinstance(document_fields, MemoryDocumentSnapshot):
+            values = tuple(document_fields.id if field == '__name__' else document_fields.get(field)
+                           for field, _ in self._orders)
+        elif isinstance(document_fields, dict):
+            values = tuple(document_fields.get(field) for field, _ in self._orders)
+        else:
+            values = tuple(document_fields)
+        return self._copy(cursor=values)
+
+    def _sort_key(self, document_id: str, data: Dict) -> tuple:
+        return tuple(document_id if field == '__name__' else _get_field(data, field)
+                     for field, _ in self._orders)
+
+    def _after_cursor(self, key: tuple) -> bool:
+        for value, cursor_value, (_, direction) in zip(key, self._cursor, self._orders):
+            if value == cursor_value:
+                continue
+            return value < cursor_value if direction == DESCENDING else value > cursor_value
+        return False
+
+    def stream(self) -> Iterator[MemoryDocumentSnapshot]:
+        self._client._simulate_latency()
+        with self._client._lock:
+            documents = list(self._client._collections.get(self._collection, {}).items())
+
+        matches = [
+            (document_id, data) for document_id, data in documents
+            if all(_OPERATORS[op](_get_field(data, field), value) for field, op, value in self._filters)
+        ]
+        # Documents missing an ordered field are excluded, as in Firestore
+        for field, direction in reversed(self._orders):
+            if field != '__name__':
+                matches = [(i, d) for i, d in matches if _get_field(d, field) is not None]
+            matches.sort(key=lambda item: item[0] if field == '__name__' else _get_field(item[1], field),
+                         reverse=direction == DESCENDING)
+        if self._cursor is not None:
+            matches = [(i, d) for i, d in matches if self._after_cursor(self._sort_key(i, d))]
+        if self._limit is not None:
+            matches = matches[:self._limit]
+
+        for document_id, data in matches:
+            if self._fields is not None:
+                projected = {}
+                for field in self._fields:
+                    value = _get_field(data, field)
+                    if value is not None:
+                        _set_field(projected, field, value)
+                data = projected
+            reference = MemoryDocumentReference(self._client, self._collection, document_id)
+            yield MemoryDocumentSnapshot(reference, copy.deepcopy(data))
+
+    def get(self) -> List[MemoryDocumentSnapshot]:
+        return list(self.stream())
+
+
+class MemoryCollectionReference(MemoryQuery):
+    def __init__(self, client: 'MemoryFirestore', name: str):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, document_id: Optional[str] = None) -> MemoryDocumentReference:
+        return MemoryDocumentReference(self._client, self._collection, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, data: Dict):
+        reference = self.document()
+        reference.set(data)
+        return time.time(), reference
+
+
+class MemoryWriteBatch:
+    def __init__(self, client: 'MemoryFirestore'):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference: MemoryDocumentReference, data: Dict, merge: bool = False) -> None:
+        self._writes.append(('set', reference, data, merge))
+
+    def update(self, reference: MemoryDocumentReference, data: Dict) -> None:
+        self._writes.append(('update', reference, data, False))
+
+    def delete(self, reference: MemoryDocumentReference) -> None:
+        self._writes.append(('delete', reference, None, False))
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def commit(self) -> List:
+        self._client._write(self._writes)
+        writes = self._writes
+        self._writes = []
+        return writes
+
+
+class MemoryFirestore:
+    """
+    In-memory stand-in for the firestore.Client subset used by the backend
+
+    Supports collections, documents, batched writes, where/order_by/limit/
+    select/start_after queries and Increment transforms. Optional latency and
+    injected failures make it usable for benchmarks and persistence tests
+    without network access or the Firestore emulator.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency: Seconds each read or write round trip sleeps, to mimic a remote store
+        """
+        self.latency = latency
+        self._collections: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+        self._failures_remaining = 0
+        self.write_calls = 0
+
+    def collection(self, name: str) -> MemoryCollectionReference:
+        return MemoryCollectionReference(self, name)
+
+    def batch(self) -> MemoryWriteBatch:
+        return MemoryWriteBatch(self)
+
+    def fail_next_writes(self, count: int) -> None:
+        """
+        Make the next count write calls raise, to exercise retry paths
+        """
+        self._failures_remaining = count
+
+    def documents(self, collection: str) -> Dict[str, Dict]:
+        """
+        Copy of every document in a collection, keyed by document id
+        """
+        with self._lock:
+            return copy.deepcopy(self._collections.get(collection, {}))
+
+    def _simulate_latency(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _write(self, writes: List) -> None:
+        self._simulate_latency()
+        with self._lock:
+            self.write_calls += 1
+            if self._failures_remaining > 0:
+                self._failures_remaining -= 1
+                raise ConnectionError("Simulated Firestore write failure")
+
+            for kind, reference, data, merge in writes:
+                documents = self._collections.setdefault(reference.collection_name, {})
+                if kind == 'delete':
+                    documents.pop(reference.id, None)
+                elif kind == 'update':
+                    if reference.id not in documents:
+                        raise KeyError(f"No document to update: {reference.path}")
+                    for field_path, value in data.items():
+                        _set_field(documents[reference.id], field_path, copy.deepcopy(value))
+                else:
+                    document = documents.get(reference.id, {}) if merge else {}
+                    _merge_fields(document, data)
+                    documents[reference.id] = document
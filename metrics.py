@@ -0,0 +1,254 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from 50 microseconds to 10 seconds
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Shared no-op context returned by timers when metrics are disabled
+NULL_TIMER = nullcontext()
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with optional labels, in Prometheus semantics
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts (non-cumulative, last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, **labels) -> 'Timer':
+        """
+        Context manager observing the elapsed wall time of its block
+        """
+        return Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Timer:
+    """
+    Observes the duration of a with-block into a histogram
+    """
+
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram: Histogram, labels: Dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> 'Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class MetricsRegistry:
+    """
+    Collection of counters and histograms rendered in Prometheus text format
+
+    A disabled registry still hands out metric objects, but callers check
+    `enabled` once at setup time and skip timing entirely, so instrumentation
+    costs nothing on the request path.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as {type(metric).__name__}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format (version 0.0.4)
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        for _, metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry; set THREAT_METRICS_DISABLED=1 to turn instrumentation off
+REGISTRY = MetricsRegistry(enabled=os.environ.get('THREAT_METRICS_DISABLED', '0') != '1')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def stage_timer(stage: str, registry: Optional[MetricsRegistry] = None, **labels):
+    """
+    Time a backend stage, e.g. a Firestore write, into threat_backend_stage_seconds
+
+    Args:
+        stage: Stage name, e.g. 'firestore_write'
+        registry: Registry to record into (defaults to REGISTRY)
+        **labels: Extra label values; only 'route' is recorded
+
+    Returns:
+        Context manager; a shared no-op when the registry is disabled
+    """
+    registry = registry or REGISTRY
+    if not registry.enabled:
+        return NULL_TIMER
+    histogram = registry.histogram('threat_backend_stage_seconds', "Time spent in backend handler stages",
+                                   ('stage', 'route'))
+    return histogram.time(stage=stage, route=labels.get('route', ''))
+
+
+def instrument_app(app, registry: Optional[MetricsRegistry] = None, path: str = '/metrics') -> None:
+    """
+    Add request timing middleware and a Prometheus /metrics route to a FastAPI app
+
+    Requests are labelled by route template (e.g. /alerts/{alert_id}) rather
+    than raw path, so label cardinality stays bounded.
+
+    Example:
+        app = FastAPI()
+        instrument_app(app)
+
+        @app.post("/predict")
+        async def predict_threat(data: dict):
+            result = threat_detector.predict(data)
+            with stage_timer('firestore_write', route='/predict'):
+                db.collection('alerts').add(result)
+            return result
+
+    Args:
+        app: FastAPI application
+        registry: Registry to record into and expose (defaults to REGISTRY)
+        path: Route serving the metrics
+    """
+    from fastapi import Response
+
+    registry = registry or REGISTRY
+
+    @app.get(path, include_in_schema=False)
+    def metrics_endpoint():
+        return Response(registry.render(), media_type=CONTENT_TYPE)
+
+    if not registry.enabled:
+        return
+
+    request_seconds = registry.histogram('threat_http_request_seconds', "HTTP request latency",
+                                         ('method', 'route', 'status'))
+    request_errors = registry.counter('threat_http_errors_total', "HTTP requests that raised or returned 5xx",
+                                      ('method', 'route'))
+
+    @app.middleware("http")
+    async def record_request_metrics(request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = request.scope.get('route')
+            template = getattr(route, 'path', 'unmatched')
+            if template != path:
+                request_seconds.observe(time.perf_counter() - start, method=request.method,
+                                        route=template, status=status)
+                if status >= 500:
+                    request_errors.inc(method=request.method, route=template)
@@ -0,0 +1,206 @@
+import asyncio
+import os
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional
+
+# Defaults can be tuned per deployment without code changes
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get('PREDICT_MAX_BATCH_SIZE', '64'))
+DEFAULT_MAX_DELAY_MS = float(os.environ.get('PREDICT_MAX_DELAY_MS', '2'))
+
+# Queue marker telling the flushing task to finish
+_STOP = object()
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-record predictions into batched model calls
+
+    Requests are queued and flushed as one predict_batch call when either
+    max_batch_size records are waiting or max_delay has passed since the first
+    record of the batch arrived. The model runs in an executor so the event loop
+    keeps accepting requests while a batch is scored.
+
+    Typical FastAPI wiring:
+
+        batcher = MicroBatcher(threat_detector.predict_batch)
+
+        @app.on_event("startup")
+        async def start_batcher():
+            await batcher.start()
+
+        @app.post("/predict")
+        async def predict_threat(data: ThreatData):
+            result = await batcher.predict(data.dict())
+    """
+
+    def __init__(self, predict_batch: Callable[[List[Dict]], List[Dict]],
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_delay: float = DEFAULT_MAX_DELAY_MS / 1000.0,
+                 executor: Optional[Executor] = None, max_queue_size: int = 10000):
+        """
+        Args:
+            predict_batch: Function scoring a list of records, e.g. detector.predict_batch
+            max_batch_size: Flush as soon as this many records are waiting
+            max_delay: Seconds to wait for more records after the first one arrives
+            executor: Executor running the model; None uses the loop's default executor
+            max_queue_size: Waiting records beyond which callers are held back
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.executor = executor
+        self.max_queue_size = max_queue_size
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closed = False
+
+        self.requests_total = 0
+        self.batches_total = 0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+
+    async def start(self) -> None:
+        """
+        Start the background flushing task on the running event loop
+        """
+        if self._worker is not None:
+            return
+        self._closed = False
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Score everything already queued, then stop the flushing task
+
+        predict() raises RuntimeError once stop() is called, and records that
+        were still queued when the task finished fail with the same error
+        instead of waiting forever.
+        """
+        if self._worker is None:
+            return
+        self._closed = True
+        await self._queue.put(_STOP)
+        try:
+            await self._worker
+        finally:
+            self._worker = None
+            self._fail_pending()
+
+    def _fail_pending(self) -> None:
+        """
+        Fail the futures of records left in the queue after the flushing task finished
+        """
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if item is not _STOP and not item[1].done():
+                item[1].set_exception(RuntimeError("MicroBatcher is closed"))
+
+    async def predict(self, record: Dict) -> Dict:
+        """
+        Queue a record and wait for its prediction
+
+        Args:
+            record: Dictionary containing feature values
+
+        Returns:
+            Prediction result for this record
+        """
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        if self._worker is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((record, future))
+        if self._worker is None:
+            # Held back by a full queue until stop() had already drained it
+            self._fail_pending()
+        self.requests_total += 1
+        return await future
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> Dict:
+        """
+        Snapshot of queue depth and batch-size distribution
+
+        Returns:
+            Dictionary with counters and the batch-size histogram keyed by bucket upper bound
+        """
+        labels = [str(bound) for bound in BATCH_SIZE_BUCKETS] + ['+Inf']
+        return {
+            "queue_depth": self.queue_depth,
+            "requests_total": self.requests_total,
+            "batches_total": self.batches_total,
+            "mean_batch_size": self.requests_total / self.batches_total if self.batches_total else 0.0,
+            "batch_size_histogram": dict(zip(labels, self.batch_size_counts))
+        }
+
+    async def _run(self) -> None:
+        """
+        Collect batches until size or deadline and score them
+        """
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List) -> None:
+        """
+        Score one batch in the executor and resolve each caller's future
+        """
+        if not batch:
+            return
+
+        self.batches_total += 1
+        bucket = next((i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if len(batch) <= bound),
+                      len(BATCH_SIZE_BUCKETS))
+        self.batch_size_counts[bucket] += 1
+
+        records = [record for record, _ in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self.executor, self.predict_batch, records)
+        except Exception as e:
+            print(f"Error during batched prediction: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Callers that gave up (e.g. disconnected clients) have cancelled futures
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+from typing import Dict, Optional, Sequence, Tuple
+
+from feature_encoder import FeatureEncoder
+from tree_engine import CompiledForest
+
+# Bump when the on-disk layout changes in a way older readers cannot handle
+BUNDLE_FORMAT_VERSION = 1
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def _file_sha256(path: str) -> str:
+    """
+    SHA-256 of a file, read in 1 MB blocks
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_bundle(bundle_dir: str, arrays: Dict[str, np.ndarray], metadata: Dict) -> str:
+    """
+    Write arrays and metadata as a versioned model bundle
+
+    Every array is stored as its own uncompressed .npy file so readers can
+    memory-map it. The bundle is written to a temporary directory and moved
+    into place, so readers never observe a half-written bundle.
+
+    Args:
+        bundle_dir: Destination directory
+        arrays: Named arrays to store
+        metadata: JSON-serializable metadata stored in the manifest
+
+    Returns:
+        Content version of the bundle
+    """
+    bundle_dir = os.path.abspath(bundle_dir)
+    staging_dir = f"{bundle_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+
+    entries = {}
+    for name, array in sorted(arrays.items()):
+        array = np.ascontiguousarray(array)
+        file_name = f"{name}.npy"
+        path = os.path.join(staging_dir, file_name)
+        np.save(path, array, allow_pickle=False)
+        entries[name] = {
+            "file": file_name,
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "sha256": _file_sha256(path)
+        }
+
+    # The version identifies the content, so retraining to identical models
+    # yields the same version and anything else yields a new one
+    content = json.dumps({"arrays": {name: entry["sha256"] for name, entry in entries.items()},
+                          "metadata": metadata}, sort_keys=True)
+    version = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+    manifest = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "version": version,
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "arrays": entries,
+        "metadata": metadata
+    }
+    with open(os.path.join(staging_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the new bundle in; processes that already mapped the old files keep
+    # reading them until they reload
+    retired_dir = f"{bundle_dir}.old-{os.getpid()}"
+    if os.path.isdir(bundle_dir):
+        os.rename(bundle_dir, retired_dir)
+    os.rename(staging_dir, bundle_dir)
+    shutil.rmtree(retired_dir, ignore_errors=True)
+
+    return version
+
+
+def read_manifest(bundle_dir: str) -> Dict:
+    """
+    Read and validate a bundle manifest
+
+    Args:
+        bundle_dir: Bundle directory
+
+    Returns:
+        Parsed manifest
+    """
+    with open(os.path.join(bundle_dir, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+
+    if manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model bundle format: {manifest.get('format_version')}")
+    return manifest
+
+
+def read_bundle(bundle_dir: str, mmap: bool = True, verify: bool = True) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """
+    Open a model bundle
+
+    With mmap enabled the arrays are read-only views of the page cache, so every
+    process that opens the same bundle shares one physical copy.
+
+    Args:
+        bundle_dir: Bundle directory
+        mmap: Memory-map the arrays instead of reading them into private memory
+        verify: Check every array file against its manifest checksum
+
+    Returns:
+        Tuple of (arrays, manifest)
+    """
+    manifest = read_manifest(bundle_dir)
+
+    arrays = {}
+    for name, entry in manifest["arrays"].items():
+        path = os.path.join(bundle_dir, entry["file"])
+        if verify and _file_sha256(path) != entry["sha256"]:
+            raise ValueError(f"Checksum mismatch for '{entry['file']}' in model bundle {bundle_dir}")
+
+        array = np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
+        if array.dtype.str != entry["dtype"] or list(array.shape) != entry["shape"]:
+            raise ValueError(f"Array '{name}' in model bundle {bundle_dir} does not match its manifest")
+
+        # A plain ndarray view keeps the shared mapping but skips memmap's
+        # per-indexing overhead
+        arrays[name] = array.view(np.ndarray)
+
+    return arrays, manifest
+
+
+def write_detector_bundle(bundle_dir: str, classification_model, anomaly_detector, scaler, label_encoder,
+                          feature_columns: Sequence[str], categorical_columns: Sequence[str],
+                          forest: Optional[CompiledForest] = None, compaction: Optional[Dict] = None,
+                          cascade: Optional[Dict] = None) -> str:
+    """
+    Export trained models into the bundle loaded by CybersecurityThreatDetector
+
+    Args:
+        bundle_dir: Destination directory
+        classification_model: Fitted RandomForestClassifier
+        anomaly_detector: Fitted IsolationForest
+        scaler: Fitted StandardScaler
+        label_encoder: Fitted LabelEncoder
+        feature_columns: Ordered model input columns
+        categorical_columns: Raw categorical fields expanded into indicator columns
+        forest: Compiled forest to store instead of compiling the two models, e.g.
+            a CompiledForest.compact() copy
+        compaction: Report describing how forest was compacted, kept in the manifest
+        cascade: Early-exit cascade calibration for forest, kept in the manifest
+
+    Returns:
+        Content version of the bundle
+    """
+    if forest is None:
+        forest = CompiledForest.from_models(classification_model, anomaly_detector)
+    arrays, forest_metadata = forest.to_arrays()
+
+    encoder = FeatureEncoder.from_scaler(feature_columns, scaler, categorical_columns)
+    arrays["scaler_mean"] = encoder.mean
+    arrays["scaler_scale"] = encoder.scale
+    arrays["feature_importances"] = np.asarray(classification_model.feature_importances_, dtype=np.float64)
+
+    metadata = {
+        "forest": forest_metadata,
+        "feature_columns": [str(col) for col in feature_columns],
+        "categorical_columns": list(categorical_columns),
+        "label_classes": [str(name) for name in label_encoder.classes_]
+    }
+    if compaction is not None:
+        metadata["compaction"] = compaction
+    if cascade is not None:
+        metadata["cascade"] = cascade
+    return write_bundle(bundle_dir, arrays, metadata)
@@ -0,0 +1,407 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from metrics import REGISTRY, MetricsRegistry
+from model_bundle import MANIFEST_NAME, read_manifest
+from predict import CybersecurityThreatDetector
+
+DEFAULT_POLL_INTERVAL = float(os.environ.get('MODEL_POLL_INTERVAL', '5'))
+
+# Files whose replacement means train.py has written new models
+MODEL_FILES = ('classification_model.pkl', 'anomaly_detector.pkl', 'scaler.pkl', 'label_encoder.pkl',
+               'feature_columns.pkl', 'cascade.json')
+
+
+class CanaryFailed(RuntimeError):
+    """
+    Raised when a freshly loaded model fails its canary batch; the old model keeps serving
+    """
+
+
+def model_fingerprint(models_dir: str) -> Optional[tuple]:
+    """
+    Cheap identity of the models on disk, from file metadata only
+
+    train.py moves a complete bundle into place with a rename, so the
+    manifest's inode changes with every retrain.
+
+    Args:
+        models_dir: Directory containing the saved models
+
+    Returns:
+        Tuple of (name, inode, mtime, size) entries, or None when no models exist
+    """
+    paths = [os.path.join(models_dir, 'bundle', MANIFEST_NAME)]
+    paths += [os.path.join(models_dir, file_name) for file_name in MODEL_FILES]
+    entries = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((os.path.basename(path), stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    return tuple(entries) or None
+
+
+def bundle_version(models_dir: str) -> Optional[str]:
+    """
+    Version recorded in the bundle manifest, without loading any arrays
+    """
+    bundle_dir = os.path.join(models_dir, 'bundle')
+    if not os.path.exists(os.path.join(bundle_dir, MANIFEST_NAME)):
+        return None
+    try:
+        return read_manifest(bundle_dir)["version"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def synthetic_canary(detector: CybersecurityThreatDetector) -> List[Dict]:
+    """
+    Canary records covering every categorical value the model knows
+
+    They complement the sampled live records, which may not cover every
+    category. Numeric features are left at 0.
+    """
+    records = [{}]
+    for col, value in detector.encoder.indicator_slots:
+        records.append({col: value})
+    return records
+
+
+class ModelRegistry:
+    """
+    Serves predictions from the current detector and swaps in retrained models without downtime
+
+    A reload loads the new models in the calling (or a background) thread,
+    runs a canary batch through them and only then replaces the current
+    detector with a single reference assignment. Requests read that
+    reference once, so requests already in flight finish on the old version
+    and later ones use the new one; the old detector is freed when its last
+    request completes. A model that fails to load or fails the canary is
+    never swapped in.
+
+    The canary batch is a sample of recent live records plus synthetic
+    records covering every known category. Besides validating the
+    outputs it warms the new model, so its first real requests are not slow,
+    and measures how often it agrees with the current model.
+
+    Typical FastAPI wiring:
+
+        models = ModelRegistry('models')
+        models.watch()
+        app.include_router(create_reload_router(models.reload, models.status))
+
+        @app.post("/predict")
+        async def predict_threat(data: ThreatData):
+            result = models.predict(data.dict())
+    """
+
+    def __init__(self, models_dir: str = 'models', detector_kwargs: Optional[Dict] = None,
+                 detector_factory: Optional[Callable[[str], CybersecurityThreatDetector]] = None,
+                 canary_size: int = 64, min_canary_agreement: Optional[float] = None,
+                 metrics: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            models_dir: Directory containing the saved models
+            detector_kwargs: CybersecurityThreatDetector arguments used for every load
+            detector_factory: Builds a detector from a models directory; overrides detector_kwargs
+            canary_size: Recent live records kept for the canary batch
+            min_canary_agreement: Refuse a model whose canary predictions agree with
+                the current model's on less than this fraction of records
+                (None accepts any agreement; retrains may change predictions)
+            metrics: Registry for reload counters (defaults to metrics.REGISTRY)
+        """
+        self.models_dir = models_dir
+        self.detector_kwargs = detector_kwargs or {}
+        self.detector_factory = detector_factory or (
+            lambda path: CybersecurityThreatDetector(path, **self.detector_kwargs))
+        self.min_canary_agreement = min_canary_agreement
+
+        self._recent: deque = deque(maxlen=canary_size)
+        self._reload_lock = threading.Lock()
+        self._future_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._reload_future: Optional[Future] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+        self.reloads = 0
+        self.last_reload: Optional[Dict] = None
+
+        self._reloads_total = None
+        registry = metrics or REGISTRY
+        if registry.enabled:
+            self._reloads_total = registry.counter(
+                'threat_model_reloads_total', "Model reload attempts by outcome", ('result',))
+
+        self._fingerprint = model_fingerprint(models_dir)
+        self._detector = self.detector_factory(models_dir)
+        self.loaded_at = time.time()
+
+    @property
+    def current(self) -> CybersecurityThreatDetector:
+        """
+        Detector serving new requests; hold on to it for the duration of a request
+        """
+        return self._detector
+
+    @property
+    def model_version(self) -> str:
+        return self._detector.model_version
+
+    def _remember(self, records) -> None:
+        # One record per call keeps the sample cheap and spread over time
+        if isinstance(records, list) and records and isinstance(records[-1], dict):
+            self._recent.append(records[-1])
+
+    def predict(self, data: Dict) -> Dict:
+        self._remember([data])
+        return self._detector.predict(data)
+
+    def predict_batch(self, data, explain: Optional[bool] = None) -> List[Dict]:
+        self._remember(data)
+        return self._detector.predict_batch(data, explain)
+
+    def score_batch(self, data, explain: Optional[bool] = None) -> Dict[str, np.ndarray]:
+        self._remember(data)
+        return self._detector.score_batch(data, explain)
+
+    def _count(self, result: str) -> None:
+        if self._reloads_total is not None:
+            self._reloads_total.inc(result=result)
+
+    def run_canary(self, candidate: CybersecurityThreatDetector) -> Dict:
+        """
+        Score the canary batch with a candidate model and validate the results
+
+        Args:
+            candidate: Freshly loaded detector
+
+        Returns:
+            Dictionary with the number of canary records, seconds taken and the
+            fraction of predictions agreeing with the current model
+
+        Raises:
+            CanaryFailed: If the candidate errors, returns malformed results or
+                disagrees with the current model more than allowed
+        """
+        records = list(self._recent) + synthetic_canary(candidate)
+        known_classes = set(str(name) for name in candidate.label_classes)
+
+        start = time.perf_counter()
+        results = candidate.predict_batch(records)
+        seconds = time.perf_counter() - start
+
+        if len(results) != len(records):
+            raise CanaryFailed(f"Canary returned {len(results)} results for {len(records)} records")
+        for result in results:
+            if "error" in result:
+                raise CanaryFailed(f"Canary prediction failed: {result['error']}")
+            if result["prediction"] not in known_classes:
+                raise CanaryFailed(f"Canary predicted unknown class {result['prediction']!r}")
+            probabilities = list(result["class_probabilities"].values())
+            if not np.all(np.isfinite(probabilities)) or abs(sum(probabilities) - 1.0) > 1e-3:
+                raise CanaryFailed("Canary class probabilities are not a valid distribution")
+
+        reference = self._detector.predict_batch(records)
+        agreement = float(np.mean([new["prediction"] == old.get("prediction")
+                                   for new, old in zip(results, reference)]))
+        if self.min_canary_agreement is not None and agreement < self.min_canary_agreement:
+            raise CanaryFailed(f"Canary agreement {agreement:.3f} is below {self.min_canary_agreement}")
+
+        return {
+            "canary_records": len(records),
+            "canary_seconds": round(seconds, 4),
+            "canary_agreement": agreement
+        }
+
+    def reload(self, models_dir: Optional[str] = None, force: bool = False) -> Dict:
+        """
+        Load, canary and swap in the models from models_dir
+
+        Blocks until done; requests keep being served by the current model
+        meanwhile. Concurrent reloads run one after the other.
+
+        Args:
+            models_dir: Directory to load from (defaults to the current one); on
+                success it becomes the directory watched and reloaded from
+            force: Reload even when the bundle version is unchanged
+
+        Returns:
+            Dictionary with result ('swapped' or 'unchanged'), previous_version,
+            version, models_dir, load_seconds and the canary report
+
+        Raises:
+            CanaryFailed: If the new model fails its canary batch
+            Exception: Whatever loading the models raised
+        """
+        models_dir = models_dir or self.models_dir
+        with self._reload_lock:
+            previous_version = self.model_version
+            report = {"previous_version": previous_version, "models_dir": models_dir}
+            fingerprint = model_fingerprint(models_dir)
+
+            # A bundle names its version in the manifest, so an unchanged one need not be loaded
+            if not force and models_dir == self.models_dir and bundle_version(models_dir) == previous_version:
+                self._fingerprint = fingerprint
+                report.update(result='unchanged', version=previous_version)
+                self.last_reload = report
+                self._count('unchanged')
+                return report
+
+            try:
+                start = time.perf_counter()
+                candidate = self.detector_factory(models_dir)
+                report["load_seconds"] = round(time.perf_counter() - start, 4)
+                report["version"] = candidate.model_version
+
+                if candidate.model_version == previous_version and not force:
+                    result = 'unchanged'
+                else:
+                    report.update(self.run_canary(candidate))
+                    # The swap: new requests see the new detector, in-flight ones keep the old
+                    self._detector = candidate
+                    self.loaded_at = time.time()
+                    self.reloads += 1
+                    result = 'swapped'
+            except Exception as e:
+                print(f"Model reload from {models_dir} failed; keeping version {previous_version}: {str(e)}")
+                # Do not retry the same broken files on every watcher poll
+                if models_dir == self.models_dir:
+                    self._fingerprint = fingerprint
+                report.update(result='failed', error=str(e))
+                self.last_reload = report
+                self._count('failed')
+                raise
+
+            self.models_dir = models_dir
+            self._fingerprint = fingerprint
+            report["result"] = result
+            self.last_reload = report
+            self._count(result)
+            if result == 'swapped':
+                print(f"Model version {report['version']} is now serving (was {previous_version})")
+            return report
+
+    def reload_async(self, models_dir: Optional[str] = None, force: bool = False) -> Future:
+        """
+        Start a reload in a background thread
+
+        Returns:
+            Future resolved with reload()'s report; while a reload is running,
+            further calls return its future instead of queueing another
+        """
+        with self._future_lock:
+            if self._reload_future is not None and not self._reload_future.done():
+                return self._reload_future
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-reload')
+            self._reload_future = self._executor.submit(self.reload, models_dir, force)
+            return self._reload_future
+
+    def _watch(self, interval: float) -> None:
+        candidate = None
+        while not self._stop_watching.wait(interval):
+            fingerprint = model_fingerprint(self.models_dir)
+            if fingerprint is None or fingerprint == self._fingerprint:
+                candidate = None
+                continue
+            # Wait until the files stop changing, so a retrain still writing is not picked up
+            if fingerprint != candidate:
+                candidate = fingerprint
+                continue
+            candidate = None
+            try:
+                self.reload()
+            except Exception:
+                pass
+
+    def watch(self, interval: float = DEFAULT_POLL_INTERVAL) -> None:
+        """
+        Reload automatically when train.py writes new models to models_dir
+
+        A background thread compares file metadata every interval seconds and
+        reloads once a change has been stable for one interval.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5.0)
+            self._watcher = None
+
+    def status(self) -> Dict:
+        """
+        Current model and reload history, e.g. for an admin route
+        """
+        return {
+            "model_version": self.model_version,
+            "models_dir": self.models_dir,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "reloading": self._reload_lock.locked(),
+            "watching": self._watcher is not None and self._watcher.is_alive(),
+            "last_reload": self.last_reload
+        }
+
+
+def create_reload_router(reload: Callable[..., Dict], status: Callable[[], Dict], path: str = '/admin/reload',
+                         status_path: str = '/admin/model', allow_models_dir: bool = False):
+    """
+    Build a FastAPI router exposing a model reload and the model status
+
+    POST path reloads and answers with the reload report (500 with the error
+    when the new model is rejected; the old model keeps serving). GET
+    status_path returns status(). Mount it behind the API's admin auth.
+
+    Args:
+        reload: ModelRegistry.reload or InferencePool.reload
+        status: ModelRegistry.status or InferencePool.health
+        path: Route path of the reload
+        status_path: Route path of the status
+        allow_models_dir: Accept {"models_dir": ...} in the request body; off by
+            default so clients cannot point the server at arbitrary paths
+
+    Returns:
+        fastapi.APIRouter
+    """
+    from fastapi import APIRouter, Request
+    from fastapi.responses import JSONResponse
+    from starlette.concurrency import run_in_threadpool
+
+    router = APIRouter()
+
+    @router.post(path)
+    async def reload_models(request: Request):
+        models_dir = None
+        if allow_models_dir:
+            body = await request.body()
+            if body:
+                try:
+                    models_dir = json.loads(body).get("models_dir")
+                except (ValueError, AttributeError):
+                    return JSONResponse(status_code=400, content={"detail": "Body must be a JSON object"})
+        try:
+            # Loading takes a while; the event loop keeps serving predictions
+            return await run_in_threadpool(reload, models_dir)
+        except Exception as e:
+            return JSONResponse(status_code=500, content={"detail": str(e)})
+
+    @router.get(status_path)
+    def model_status():
+        return status()
+
+    return router
@@ -0,0 +1,408 @@
+import atexit
+import queue
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import REGISTRY, MetricsRegistry, stage_timer
+
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_WRITES = 500
+
+OVERFLOW_POLICIES = ('block', 'drop_newest', 'drop_oldest')
+
+_STOP = object()
+
+# Firestore's auto-id format: 20 characters from this alphabet
+_AUTO_ID_CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'
+_AUTO_ID_RANDOM = random.SystemRandom()
+
+
+def auto_id() -> str:
+    """
+    New random document id in Firestore's format, allocated without a client
+    """
+    return ''.join(_AUTO_ID_RANDOM.choices(_AUTO_ID_CHARS, k=20))
+
+
+class LazyFirestore:
+    """
+    Firestore client that is created on first use
+
+    Initializing firebase_admin and the Firestore client imports grpc and the
+    Google Cloud libraries and authenticates, which takes seconds. Wrapping
+    the initialization keeps it out of module import, so a new replica can
+    load the detector and report ready first. connect(background=True)
+    starts connecting right away without blocking startup.
+
+    Example (FastAPI backend):
+        def connect():
+            import firebase_admin
+            from firebase_admin import credentials, firestore
+            firebase_admin.initialize_app(credentials.Certificate('firebase/serviceAccountKey.json'))
+            return firestore.client()
+
+        db = LazyFirestore(connect)
+        writer = WriteBehindWriter(db, collection='threats')
+
+        @app.on_event("startup")
+        def connect_firestore():
+            db.connect(background=True)
+    """
+
+    def __init__(self, factory: Callable[[], object]):
+        """
+        Args:
+            factory: Creates and returns the Firestore client
+        """
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def connect(self, background: bool = False):
+        """
+        Create the client unless it already exists
+
+        Args:
+            background: Connect on a daemon thread and return immediately
+
+        Returns:
+            The client, or None when connecting in the background
+        """
+        if background:
+            def run():
+                # A failed attempt is retried by the first request that needs the client
+                try:
+                    self.connect()
+                except Exception as e:
+                    print(f"Error connecting to Firestore: {str(e)}")
+
+            threading.Thread(target=run, name='firestore-connect', daemon=True).start()
+            return None
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    @property
+    def connected(self) -> bool:
+        return self._client is not None
+
+    def __getattr__(self, name: str):
+        return getattr(self.connect(), name)
+
+
+class WriteBehindWriter:
+    """
+    Persist prediction documents to Firestore from a background thread
+
+    submit() only enqueues the document, so storage latency and outages no
+    longer delay the response. A worker drains the queue into batched
+    commits of up to batch_size writes, retrying failed commits with
+    exponential backoff. Document ids are allocated at submit time, so the
+    caller can return the id before the write lands.
+
+    When the queue is full, the default 'block' policy makes submit() wait
+    up to block_timeout for room. Called from an async route handler, that
+    wait blocks the event loop and every other request with it. Async
+    handlers should use overflow='drop_newest' or 'drop_oldest', which never
+    wait, or call submit() through run_in_threadpool.
+
+    Example (FastAPI backend):
+        writer = WriteBehindWriter(db, collection='threats', overflow='drop_newest')
+
+        @app.on_event("shutdown")
+        def close_writer():
+            writer.close()
+
+        @app.post("/predict")
+        async def predict_threat(data: dict):
+            result = threat_detector.predict(data)
+            result["id"] = writer.submit({**result, "source_data": data})
+            return result
+    """
+
+    def __init__(self, db, collection: str = 'threats', max_queue_size: int = 10000,
+                 batch_size: int = MAX_BATCH_WRITES, max_delay: float = 0.05, max_retries: int = 5,
+                 backoff_base: float = 0.1, backoff_max: float = 5.0, overflow: str = 'block',
+                 block_timeout: float = 0.1, on_failure: Optional[Callable[[List[Tuple[str, Dict]]], None]] = None,
+                 before_commit: Optional[Callable[[object, List[Dict]], object]] = None,
+                 before_commit_writes: int = 20, metrics: Optional[MetricsRegistry] = None, start: bool = True):
+        """
+        Args:
+            db: firestore.Client or a compatible stand-in such as MemoryFirestore
+            collection: Collection receiving the documents
+            max_queue_size: Documents held in memory before the overflow policy applies
+            batch_size: Maximum writes per commit (Firestore allows 500)
+            max_delay: Seconds the worker waits for more documents before committing a partial batch
+            max_retries: Commit attempts after the first one before a batch is given up
+            backoff_base: Delay before the first retry, doubled on every further attempt
+            backoff_max: Upper bound on the retry delay
+            overflow: What submit() does when the queue is full: 'block' waits up to
+                block_timeout and then drops the document, 'drop_newest' drops it
+                immediately, 'drop_oldest' discards the oldest queued document instead
+            block_timeout: Seconds submit() may wait under the 'block' policy; the
+                calling thread (or event loop) is blocked meanwhile
+            on_failure: Called with the (document id, data) pairs of a batch that
+                exhausted its retries, e.g. to spool them to disk
+            before_commit: Called with the write batch and the documents it carries just
+                before each commit, to add related writes such as
+                AlertSummary.add_to_batch
+            before_commit_writes: Most writes before_commit adds to one batch (one per
+                distinct day for AlertSummary.add_to_batch); batch_size is capped so
+                the documents plus these stay within Firestore's limit
+            metrics: Registry for write counters (defaults to metrics.REGISTRY)
+            start: Start the worker thread immediately
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+        if not 1 <= batch_size <= MAX_BATCH_WRITES:
+            raise ValueError(f"batch_size must be between 1 and {MAX_BATCH_WRITES}")
+        if before_commit is not None:
+            if not 0 <= before_commit_writes < MAX_BATCH_WRITES:
+                raise ValueError(f"before_commit_writes must be between 0 and {MAX_BATCH_WRITES - 1}")
+            # A batch over the limit fails every commit and every retry
+            batch_size = min(batch_size, MAX_BATCH_WRITES - before_commit_writes)
+
+        self.db = db
+        self.collection = collection
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.on_failure = on_failure
+        self.before_commit = before_commit
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+        self.commits = 0
+
+        registry = metrics or REGISTRY
+        self._registry = registry
+        self._writes_total = None
+        if registry.enabled:
+            self._writes_total = registry.counter(
+                'threat_persistence_writes_total', "Prediction documents by persistence outcome", ('result',))
+
+        if start:
+            self.start()
+
+    def start(self) -> None:
+        """
+        Start the background worker and flush remaining documents at interpreter exit
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='firestore-write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, data: Dict, document_id: Optional[str] = None, merge: bool = False) -> Optional[str]:
+        """
+        Queue a document for writing
+
+        Writes are committed in submission order, so a merge write queued after
+        the document it updates always lands after it.
+
+        Args:
+            data: Document fields
+            document_id: Document id, or None to allocate one with auto_id()
+            merge: Merge data into an existing document instead of replacing it,
+                leaving fields it does not mention untouched
+
+        Returns:
+            The document id, or None when the document was dropped
+        """
+        if self._closed:
+            raise RuntimeError("WriteBehindWriter is closed")
+
+        # Allocated locally: asking the client would connect a LazyFirestore on the request path
+        if document_id is None:
+            document_id = auto_id()
+        item = (document_id, data, merge)
+
+        try:
+            if self.overflow == 'block':
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            if self.overflow != 'drop_oldest':
+                self._count('dropped')
+                return None
+            # Make room by discarding the oldest queued document
+            try:
+                oldest = self._queue.get_nowait()
+            except queue.Empty:
+                oldest = None
+            if oldest is _STOP:
+                # close() ran meanwhile; the worker must still see the sentinel
+                self._queue.task_done()
+                self._queue.put(_STOP)
+                self._count('dropped')
+                return None
+            if oldest is not None:
+                self._queue.task_done()
+                self._count('dropped')
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self._count('dropped')
+                return None
+
+        self.submitted += 1
+        return document_id
+
+    def _count(self, result: str, amount: int = 1) -> None:
+        if result == 'dropped':
+            self.dropped += amount
+        elif result == 'written':
+            self.written += amount
+        else:
+            self.failed += amount
+        if self._writes_total is not None:
+            self._writes_total.inc(amount, result=result)
+
+    def _next_batch(self) -> Tuple[List[Tuple[str, Dict, bool]], bool]:
+        """
+        Block for the first document, then gather more until the batch is full or max_delay passes
+
+        Returns:
+            Tuple of the batch and whether the stop sentinel was reached
+        """
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _commit(self, batch: List[Tuple[str, Dict, bool]]) -> None:
+        """
+        Commit one batch, retrying with exponential backoff and jitter
+        """
+        collection = self.db.collection(self.collection)
+        for attempt in range(self.max_retries + 1):
+            try:
+                write_batch = self.db.batch()
+                for document_id, data, merge in batch:
+                    write_batch.set(collection.document(document_id), data, merge=merge)
+                if self.before_commit is not None:
+                    self.before_commit(write_batch, [data for _, data, _ in batch])
+                with stage_timer('firestore_batch_commit', registry=self._registry):
+                    write_batch.commit()
+                self.commits += 1
+                self._count('written', len(batch))
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"Error persisting {len(batch)} predictions after {attempt + 1} attempts: {str(e)}")
+                    break
+                self.retries += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+
+        self._count('failed', len(batch))
+        if self.on_failure is not None:
+            try:
+                self.on_failure([(document_id, data) for document_id, data, _ in batch])
+            except Exception as e:
+                print(f"Error in persistence failure handler: {str(e)}")
+
+    def _run(self) -> None:
+        while True:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._commit(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            if stopping:
+                self._queue.task_done()
+                return
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued document has been written or given up
+
+        Args:
+            timeout: Maximum seconds to wait, or None to wait indefinitely
+
+        Returns:
+            True if the queue drained within the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = 30.0) -> bool:
+        """
+        Stop accepting documents, write out the queue and stop the worker
+
+        Args:
+            timeout: Maximum seconds to wait for the remaining writes
+
+        Returns:
+            True if everything queued was written or given up within the timeout;
+            False as well when the queue stayed full for the whole timeout
+        """
+        if self._closed:
+            return True
+        self._closed = True
+        atexit.unregister(self.close)
+        if self._thread is None:
+            return self._queue.empty()
+
+        # The sentinel goes behind every queued document, so they are all committed
+        # first. A full queue behind a worker stuck retrying may not make room in time
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return False
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        self._thread.join(remaining)
+        return not self._thread.is_alive()
+
+    def stats(self) -> Dict:
+        """
+        Snapshot of the writer's counters
+
+        Returns:
+            Dictionary with queue depth and submitted, written, dropped, failed, retry and commit counts
+        """
+        return {
+            "queue_depth": self._queue.qsize(),
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "retries": self.retries,
+            "commits": self.commits
+        }
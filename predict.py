@@ -1,57 +1,243 @@
+import hashlib
+import json
 import pickle
 import numpy as np
-import pandas as pd
 import os
-from typing import Dict, List, Union, Tuple
+import sys
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional, Union, Tuple
+
+from feature_encoder import FeatureEncoder
+from metrics import NULL_TIMER, REGISTRY, MetricsRegistry
+from model_bundle import MANIFEST_NAME, read_bundle
+from result_cache import PredictionCache
+from tree_engine import CascadeForest, CompiledForest
+
+# Serving needs only NumPy and the model bundle; pandas is accepted as input
+# but never imported here, and sklearn is only loaded with the pickled models
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def _is_dataframe(data) -> bool:
+    """
+    Whether data is a pandas DataFrame, without importing pandas
+
+    A DataFrame can only exist once the caller has imported pandas.
+    """
+    pd = sys.modules.get('pandas')
+    return pd is not None and isinstance(data, pd.DataFrame)
+
 
 class CybersecurityThreatDetector:
     """
     A class for detecting and classifying cybersecurity threats using trained ML models
     """
     
-    def __init__(self, models_dir: str = 'models'):
+    def __init__(self, models_dir: str = 'models', engine_max_rows: int = 1024, use_bundle: bool = True,
+                 cache_size: int = 0, cache_ttl: Optional[float] = None,
+                 metrics: Optional[MetricsRegistry] = None, explain: bool = True, explain_top_k: int = 5,
+                 cascade: bool = False):
         """
         Initialize the threat detector by loading the trained models
         
         Args:
             models_dir: Directory containing the saved models
+            engine_max_rows: Largest batch scored by the compiled tree engine when the
+                sklearn models are loaded; larger batches go through sklearn, whose
+                compiled traversal wins at that size, unless they are explained
+            use_bundle: Open models_dir/bundle when present instead of the pickled models
+            cache_size: Number of scored feature vectors to keep in an LRU cache (0 disables it)
+            cache_ttl: Seconds a cached result stays valid, or None for no expiry
+            metrics: Registry receiving per-stage timings and counters (defaults to
+                metrics.REGISTRY); a disabled registry skips all timing
+            explain: Attach per-record feature contributions to every prediction,
+                computed from the same tree traversal as the scores; callers that
+                do not read them can pass explain=False per batch
+            explain_top_k: Number of features listed in each per-record explanation
+            cascade: Score with the early-exit cascade calibrated by train.py --cascade:
+                a few trees settle confidently normal records and only the rest run
+                the full forests. Applies wherever the compiled engine scores (every
+                batch when loading a bundle)
         """
         print("Loading cybersecurity threat detection models...")
         
+        self.engine_max_rows = engine_max_rows
+        self.cache = PredictionCache(cache_size, cache_ttl) if cache_size > 0 else None
+        self.explain_top_k = explain_top_k
+        
         # Load models and preprocessing tools
         try:
-            with open(os.path.join(models_dir, 'classification_model.pkl'), 'rb') as f:
-                self.classification_model = pickle.load(f)
-                
-            with open(os.path.join(models_dir, 'anomaly_detector.pkl'), 'rb') as f:
-                self.anomaly_detector = pickle.load(f)
-                
-            with open(os.path.join(models_dir, 'scaler.pkl'), 'rb') as f:
-                self.scaler = pickle.load(f)
-                
-            with open(os.path.join(models_dir, 'label_encoder.pkl'), 'rb') as f:
-                self.label_encoder = pickle.load(f)
-                
-            with open(os.path.join(models_dir, 'feature_columns.pkl'), 'rb') as f:
-                self.feature_columns = pickle.load(f)
+            bundle_dir = os.path.join(models_dir, 'bundle')
+            if use_bundle and os.path.exists(os.path.join(bundle_dir, MANIFEST_NAME)):
+                self._load_bundle(bundle_dir)
+            else:
+                self._load_pickles(models_dir)
                 
-            print("Models loaded successfully!")
+            print(f"Models loaded successfully! (version {self.model_version})")
             
-            # Define categorical columns that were used during training
-            self.categorical_columns = ['protocol_type', 'service', 'flag']
+            self._init_metrics(metrics or REGISTRY)
             
-            # Get all possible categorical values from the training data
-            # In a real implementation, you would save these during training
-            self.categorical_values = {
-                'protocol_type': ['tcp', 'udp', 'icmp'],
-                'service': ['http', 'ftp', 'smtp', 'ssh', 'dns'],
-                'flag': ['SF', 'S0', 'REJ', 'RSTO']
-            }
+            # The global explanation only depends on the trained model, so build it once
+            self.feature_names = np.asarray(self.feature_columns, dtype=object)
+            self.explanation = self._global_explanation()
+            
+            # Per-record contributions come from the compiled engine's tree paths
+            self.explain = explain and self.engine is not None
+            
+            self.cascade = None
+            if cascade:
+                if self.engine is not None and self.cascade_config is not None:
+                    self.cascade = CascadeForest.from_config(self.engine, self.cascade_config, self.label_classes)
+                else:
+                    print("No calibrated cascade for these models (run train.py --cascade); using the full forests")
             
         except Exception as e:
             print(f"Error loading models: {str(e)}")
             raise
     
+    def _load_bundle(self, bundle_dir: str) -> None:
+        """
+        Load the memory-mapped model bundle written by train.py
+        
+        The sklearn objects are not unpickled; the compiled engine serves every
+        request and all worker processes share the mapped arrays.
+        
+        Args:
+            bundle_dir: Bundle directory
+        """
+        arrays, manifest = read_bundle(bundle_dir)
+        metadata = manifest["metadata"]
+        
+        self.classification_model = None
+        self.anomaly_detector = None
+        self.scaler = None
+        self.label_encoder = None
+        self.model_version = manifest["version"]
+        
+        self.feature_columns = metadata["feature_columns"]
+        self.categorical_columns = metadata["categorical_columns"]
+        self.label_classes = np.array(metadata["label_classes"])
+        self.feature_importances = arrays["feature_importances"]
+        self.cascade_config = metadata.get("cascade")
+        
+        self.encoder = FeatureEncoder(self.feature_columns, arrays["scaler_mean"], arrays["scaler_scale"],
+                                      self.categorical_columns)
+        self.engine = CompiledForest.from_arrays(arrays, metadata["forest"])
+    
+    def _load_pickles(self, models_dir: str) -> None:
+        """
+        Load the pickled sklearn models saved by train.py
+        
+        Args:
+            models_dir: Directory containing the saved models
+        """
+        # Hash the raw files while loading them so the version tracks their content
+        version_hash = hashlib.sha256()
+        
+        def load(file_name: str):
+            with open(os.path.join(models_dir, file_name), 'rb') as f:
+                payload = f.read()
+            version_hash.update(payload)
+            return pickle.loads(payload)
+        
+        self.classification_model = load('classification_model.pkl')
+        self.anomaly_detector = load('anomaly_detector.pkl')
+        self.scaler = load('scaler.pkl')
+        self.label_encoder = load('label_encoder.pkl')
+        self.feature_columns = load('feature_columns.pkl')
+        self.model_version = version_hash.hexdigest()[:16]
+        
+        cascade_path = os.path.join(models_dir, 'cascade.json')
+        self.cascade_config = None
+        if os.path.exists(cascade_path):
+            with open(cascade_path) as f:
+                self.cascade_config = json.load(f)
+        
+        self.label_classes = np.asarray(self.label_encoder.classes_)
+        self.feature_importances = getattr(self.classification_model, 'feature_importances_', None)
+        
+        # Define categorical columns that were used during training
+        self.categorical_columns = ['protocol_type', 'service', 'flag']
+        
+        # Compile the one-hot layout and scaler statistics once; the known
+        # categorical values are the indicator columns saved in feature_columns
+        self.encoder = FeatureEncoder.from_scaler(self.feature_columns, self.scaler, self.categorical_columns)
+        
+        # Flatten both forests into node arrays evaluated in a single traversal
+        try:
+            self.engine = CompiledForest.from_models(self.classification_model, self.anomaly_detector)
+        except (AttributeError, ValueError) as e:
+            print(f"Compiled tree engine unavailable, using sklearn models: {str(e)}")
+            self.engine = None
+    
+    def _init_metrics(self, registry: MetricsRegistry) -> None:
+        """
+        Create the detector's metrics, or leave them unset when the registry is disabled
+        
+        Args:
+            registry: Metrics registry
+        """
+        self._stage_seconds = None
+        if not registry.enabled:
+            return
+        
+        self._stage_seconds = registry.histogram(
+            'threat_detector_stage_seconds', "Time spent in each detector stage", ('stage', 'model'))
+        self._records_total = registry.counter(
+            'threat_detector_records_total', "Records scored by the detector", ('model',))
+        self._errors_total = registry.counter(
+            'threat_detector_errors_total', "Detector failures by stage", ('stage', 'model'))
+        self._cache_lookups = registry.counter(
+            'threat_detector_cache_lookups_total', "Result cache lookups", ('result', 'model'))
+        self._early_exits_total = registry.counter(
+            'threat_detector_early_exits_total', "Records settled by the cascade's first stage", ('model',))
+    
+    def _timed(self, stage: str):
+        """
+        Context manager timing one stage, or a shared no-op when metrics are disabled
+        """
+        if self._stage_seconds is None:
+            return NULL_TIMER
+        return self._stage_seconds.time(stage=stage, model=self.model_version)
+    
+    def _count_error(self, stage: str) -> None:
+        if self._stage_seconds is not None:
+            self._errors_total.inc(stage=stage, model=self.model_version)
+    
+    @staticmethod
+    def _batch_length(data: Union[List[Dict], Dict[str, List], 'pd.DataFrame']) -> int:
+        """
+        Count the records in a batch without validating its contents
+        """
+        try:
+            if isinstance(data, dict):
+                return len(next(iter(data.values()))) if data else 0
+            return len(data)
+        except TypeError:
+            return 1
+    
+    def preprocess_batch(self, data: Union[List[Dict], Dict[str, List], 'pd.DataFrame']) -> np.ndarray:
+        """
+        Preprocess a batch of records for prediction
+        
+        Args:
+            data: List of records, columnar dictionary (column -> values) or DataFrame
+            
+        Returns:
+            Preprocessed data as numpy array with one row per record
+        """
+        try:
+            with self._timed('preprocess'):
+                if isinstance(data, dict) or _is_dataframe(data):
+                    return self.encoder.encode_columns(data)
+                return self.encoder.encode_records(list(data))
+            
+        except Exception as e:
+            print(f"Error preprocessing data: {str(e)}")
+            self._count_error('preprocess')
+            raise
+    
     def preprocess_data(self, data: Dict) -> np.ndarray:
         """
         Preprocess input data for prediction
@@ -63,108 +249,316 @@ class CybersecurityThreatDetector:
             Preprocessed data as numpy array
         """
         try:
-            # Convert input dictionary to DataFrame
-            df = pd.DataFrame([data])
-            
-            # Handle categorical features with one-hot encoding
-            df_categorical = pd.get_dummies(df[self.categorical_columns], drop_first=True)
-            
-            # Make sure all expected columns are present
-            for col in self.categorical_columns:
-                expected_cols = [f"{col}_{val}" for val in self.categorical_values[col][1:]]
-                for exp_col in expected_cols:
-                    if exp_col not in df_categorical.columns:
-                        df_categorical[exp_col] = 0
-            
-            # Combine numerical and categorical features
-            X = pd.concat([df.drop(self.categorical_columns, axis=1), df_categorical], axis=1)
-            X = X.reindex(columns=self.feature_columns, fill_value=0)
-
-            # Apply scaling
-            X_scaled = self.scaler.transform(X)
-            
-            return X_scaled
+            with self._timed('preprocess'):
+                return self.encoder.encode(data)
             
         except Exception as e:
             print(f"Error preprocessing data: {str(e)}")
+            self._count_error('preprocess')
             raise
     
-    def predict(self, data: Dict) -> Dict:
+    def _global_explanation(self) -> Dict:
         """
-        Predict threat type and anomaly score for input data
+        Build the model-wide feature importance ranking
+        
+        It is attached to predictions when per-record explanations are disabled.
+        
+        Returns:
+            Dictionary with the top features and their importances, most important first
+        """
+        if self.feature_importances is not None:
+            top_indices = np.argsort(self.feature_importances)[::-1][:self.explain_top_k]
+            return {
+                "method": "feature_importance",
+                "top_features": [str(self.feature_names[i]) for i in top_indices],
+                "importance_values": [float(self.feature_importances[i]) for i in top_indices]
+            }
+        return {"message": "Feature importance not available for this model"}
+    
+    def _top_contributions(self, contributions: np.ndarray, bias: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Keep the strongest contributions of each row
         
         Args:
-            data: Dictionary containing feature values
+            contributions: Path contributions towards the predicted class (n_records x n_features)
+            bias: Predicted class probability before any split, per record
             
         Returns:
-            Dictionary with prediction results
+            Tuple of feature indices and contributions (n_records x k, strongest
+            first by absolute value) and the bias
+        """
+        k = min(self.explain_top_k, contributions.shape[1])
+        magnitude = np.abs(contributions)
+        top = np.argpartition(-magnitude, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(magnitude, top, axis=1), axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        return top, np.take_along_axis(contributions, top, axis=1), bias
+    
+    @staticmethod
+    def _threat_levels(class_preds: np.ndarray, is_anomaly: np.ndarray) -> np.ndarray:
+        """
+        Determine threat levels based on classification and anomaly flags
+        
+        Args:
+            class_preds: Predicted class names
+            is_anomaly: Boolean anomaly flags
+            
+        Returns:
+            Array of threat level names
+        """
+        is_normal = class_preds == 'normal'
+        conditions = [
+            is_normal & ~is_anomaly,
+            is_normal & is_anomaly,
+            np.isin(class_preds, ['probe', 'dos']),
+            np.isin(class_preds, ['r2l', 'u2r'])
+        ]
+        return np.select(conditions, ['low', 'medium', 'high', 'critical'], default='unknown')
+    
+    def _explain_batch(self, n_records: int, explain: Optional[bool]) -> bool:
+        """
+        Whether a call scoring n_records computes per-record contributions
+        
+        Args:
+            n_records: Records in the call
+            explain: The caller's choice, or None for the detector's default
+        """
+        if not self.explain or n_records == 0:
+            return False
+        return True if explain is None else explain
+    
+    def _score(self, X: np.ndarray, explain: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Optional[Tuple]]:
+        """
+        Run the classifier and anomaly detector over a preprocessed matrix
+        
+        Args:
+            X: Preprocessed data
+            explain: Compute the top per-record contributions
+            
+        Returns:
+            Tuple of class probabilities, encoded labels, anomaly scores, anomaly flags
+            and the top contributions from _top_contributions() (None when not explaining)
+        """
+        if self.engine is not None and (explain or X.shape[0] <= self.engine_max_rows
+                                        or self.classification_model is None):
+            # The compiled engine runs the classifier and anomaly trees in one traversal,
+            # and the contributions reuse the leaves it reached; sklearn does not expose
+            # decision paths per class, so explained batches always take this path
+            with self._timed('engine'):
+                if self.cascade is not None:
+                    outputs = self.cascade.evaluate(X, explain=explain)
+                    if self._stage_seconds is not None:
+                        self._early_exits_total.inc(int(np.count_nonzero(outputs["early_exit"])),
+                                                    model=self.model_version)
+                else:
+                    outputs = self.engine.evaluate(X, explain=explain)
+                attributions = None
+                if explain:
+                    attributions = self._top_contributions(outputs["contributions"], outputs["bias"])
+            return (outputs["probabilities"], outputs["labels"], outputs["anomaly_scores"], outputs["is_anomaly"],
+                    attributions)
+        
+        # A single predict_proba call yields both the probabilities and the
+        # label (RandomForestClassifier.predict is the argmax of the same values)
+        with self._timed('classifier'):
+            class_probs = self.classification_model.predict_proba(X)
+            class_pred_encoded = self.classification_model.classes_.take(np.argmax(class_probs, axis=1))
+        
+        # A single decision_function call yields both the score and the flag
+        # (IsolationForest.predict marks negative decision values as -1)
+        with self._timed('anomaly'):
+            anomaly_scores = self.anomaly_detector.decision_function(X)
+            is_anomaly = anomaly_scores < 0
+        
+        return class_probs, class_pred_encoded, anomaly_scores, is_anomaly, None
+    
+    def _score_cached(self, X: np.ndarray, explain: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Optional[Tuple]]:
+        """
+        Like _score(), but serve rows seen before from the result cache
+        
+        Args:
+            X: Preprocessed data
+            explain: Compute the top per-record contributions; entries cached
+                without them count as misses
+            
+        Returns:
+            Tuple of class probabilities, encoded labels, anomaly scores, anomaly flags
+            and the top contributions (None when not explaining)
+        """
+        n_records = X.shape[0]
+        with self._timed('cache'):
+            keys = [self.cache.key(row, self.model_version) for row in X]
+            cached = [self.cache.get(key) for key in keys]
+            if explain:
+                cached = [entry if entry is not None and entry[4] is not None else None for entry in cached]
+            missing = [i for i, entry in enumerate(cached) if entry is None]
+        
+        if self._stage_seconds is not None:
+            self._cache_lookups.inc(n_records - len(missing), result='hit', model=self.model_version)
+            self._cache_lookups.inc(len(missing), result='miss', model=self.model_version)
+        
+        class_probs = np.empty((n_records, len(self.label_classes)))
+        class_pred_encoded = np.empty(n_records, dtype=np.intp)
+        anomaly_scores = np.empty(n_records)
+        is_anomaly = np.empty(n_records, dtype=bool)
+        attributions = None
+        if explain:
+            k = min(self.explain_top_k, X.shape[1])
+            attributions = (np.empty((n_records, k), dtype=np.intp), np.empty((n_records, k)), np.empty(n_records))
+        
+        for i, entry in enumerate(cached):
+            if entry is not None:
+                class_probs[i], class_pred_encoded[i], anomaly_scores[i], is_anomaly[i], explained = entry
+                if attributions is not None:
+                    attributions[0][i], attributions[1][i], attributions[2][i] = explained
+        
+        if missing:
+            probs, labels, scores, flags, explained = self._score(X[missing], explain)
+            class_probs[missing] = probs
+            class_pred_encoded[missing] = labels
+            anomaly_scores[missing] = scores
+            is_anomaly[missing] = flags
+            if attributions is not None:
+                for target, values in zip(attributions, explained):
+                    target[missing] = values
+            for j, i in enumerate(missing):
+                # Copy the array rows so the entry does not pin the whole batch arrays
+                row_explained = None
+                if explained is not None:
+                    row_explained = (explained[0][j].copy(), explained[1][j].copy(), explained[2][j])
+                self.cache.put(keys[i], (probs[j].copy(), labels[j], scores[j], flags[j], row_explained))
+        
+        return class_probs, class_pred_encoded, anomaly_scores, is_anomaly, attributions
+    
+    def score_batch(self, data: Union[List[Dict], Dict[str, List], 'pd.DataFrame'],
+                    explain: Optional[bool] = None) -> Dict[str, np.ndarray]:
+        """
+        Score a batch of records and return column arrays instead of per-record dicts
+        
+        This is the cheapest way to score large volumes; predict_batch() formats
+        the same values into one response dictionary per record.
+        
+        Args:
+            data: List of records, columnar dictionary (column -> values) or DataFrame
+            explain: Compute per-record contributions; None follows the detector's
+                explain setting, False skips them for this call
+            
+        Returns:
+            Dictionary of arrays: prediction, threat_level, class_probabilities
+            (n_records x n_classes, ordered like label_classes), anomaly_score, is_anomaly;
+            when explaining also explanation_features and explanation_contributions
+            (n_records x k, strongest first) and explanation_baseline
         """
+        # Preprocess the whole batch at once
+        if isinstance(data, list) and len(data) == 1:
+            X = self.preprocess_data(data[0])
+        else:
+            X = self.preprocess_batch(data)
+        
+        explain = self._explain_batch(X.shape[0], explain)
+        if self.cache is None:
+            class_probs, class_pred_encoded, anomaly_scores, is_anomaly, attributions = self._score(X, explain)
+        else:
+            class_probs, class_pred_encoded, anomaly_scores, is_anomaly, attributions = self._score_cached(X, explain)
+        class_preds = self.label_classes.take(class_pred_encoded)
+        
+        if self._stage_seconds is not None:
+            self._records_total.inc(X.shape[0], model=self.model_version)
+        
+        scores = {
+            "prediction": class_preds,
+            "threat_level": self._threat_levels(class_preds, is_anomaly),
+            "class_probabilities": class_probs,
+            "anomaly_score": anomaly_scores,
+            "is_anomaly": is_anomaly
+        }
+        if attributions is not None:
+            top_features, top_contributions, baseline = attributions
+            scores["explanation_features"] = self.feature_names[top_features]
+            scores["explanation_contributions"] = top_contributions
+            scores["explanation_baseline"] = baseline
+        return scores
+    
+    def predict_batch(self, data: Union[List[Dict], Dict[str, List], 'pd.DataFrame'],
+                      explain: Optional[bool] = None) -> List[Dict]:
+        """
+        Predict threat types and anomaly scores for a batch of records
+        
+        Each model runs once over the whole feature matrix, so the per-record
+        cost is dominated by result formatting rather than model overhead.
+        
+        Args:
+            data: List of records, columnar dictionary (column -> values) or DataFrame
+            explain: Attach per-record contributions; None follows the detector's
+                explain setting, False gives every record the global feature importance
+            
+        Returns:
+            List of prediction results, one per record, shaped like predict(), each
+            tagged with the model_version that produced it
+        """
+        if self._batch_length(data) == 0:
+            return []
+        
         try:
-            # Preprocess the data
-            X = self.preprocess_data(data)
-            
-            # Get classification prediction
-            class_pred_encoded = self.classification_model.predict(X)[0]
-            class_pred = self.label_encoder.inverse_transform([class_pred_encoded])[0]
-            
-            # Get classification probabilities
-            class_probs = self.classification_model.predict_proba(X)[0]
-            class_names = self.label_encoder.classes_
-            class_probabilities = {name: float(prob) for name, prob in zip(class_names, class_probs)}
-            
-            # Get anomaly score
-            anomaly_score = float(self.anomaly_detector.decision_function(X)[0])
-            is_anomaly = self.anomaly_detector.predict(X)[0] == -1
-            
-            # Determine threat level based on classification and anomaly score
-            if class_pred == 'normal' and not is_anomaly:
-                threat_level = 'low'
-            elif class_pred == 'normal' and is_anomaly:
-                threat_level = 'medium'
-            elif class_pred in ['probe', 'dos']:
-                threat_level = 'high'
-            elif class_pred in ['r2l', 'u2r']:
-                threat_level = 'critical'
-            else:
-                threat_level = 'unknown'
+            scores = self.score_batch(data, explain)
+            class_preds = scores["prediction"]
+            threat_levels = scores["threat_level"]
+            class_probs = scores["class_probabilities"]
+            anomaly_scores = scores["anomaly_score"]
+            is_anomaly = scores["is_anomaly"]
+            n_records = len(class_preds)
             
-            # Get feature importances for explanation
-            if hasattr(self.classification_model, 'feature_importances_'):
-                # For models like Random Forest that have feature_importances_
-                feature_importances = self.classification_model.feature_importances_
+            with self._timed('format'):
+                class_names = [str(name) for name in self.label_classes]
+                timestamp = datetime.now(timezone.utc).isoformat()
                 
-                # Get feature names (this would need to match your training data)
-                # In a real implementation, you would save these during training
-                feature_names = [f"feature_{i}" for i in range(len(feature_importances))]
+                if "explanation_features" in scores:
+                    top_features = scores["explanation_features"].tolist()
+                    top_contributions = scores["explanation_contributions"].tolist()
+                    baseline = scores["explanation_baseline"].tolist()
+                    explanations = [
+                        {
+                            "method": "path_contributions",
+                            "target_class": str(class_preds[i]),
+                            "baseline": baseline[i],
+                            "top_features": top_features[i],
+                            "contributions": top_contributions[i]
+                        }
+                        for i in range(n_records)
+                    ]
+                else:
+                    explanations = [self.explanation] * n_records
                 
-                # Get top 5 most important features
-                top_indices = np.argsort(feature_importances)[-5:]
-                top_features = [feature_names[i] for i in top_indices]
-                top_importances = [float(feature_importances[i]) for i in top_indices]
-                
-                explanation = {
-                    "top_features": top_features,
-                    "importance_values": top_importances
-                }
-            else:
-                explanation = {"message": "Feature importance not available for this model"}
-            
-            # Prepare response
-            result = {
-                "prediction": class_pred,
-                "threat_level": threat_level,
-                "class_probabilities": class_probabilities,
-                "anomaly_score": anomaly_score,
-                "is_anomaly": bool(is_anomaly),
-                "explanation": explanation,
-                "timestamp": pd.Timestamp.now().isoformat()
-            }
-            
-            return result
+                return [
+                    {
+                        "prediction": str(class_preds[i]),
+                        "threat_level": str(threat_levels[i]),
+                        "class_probabilities": dict(zip(class_names, class_probs[i].tolist())),
+                        "anomaly_score": float(anomaly_scores[i]),
+                        "is_anomaly": bool(is_anomaly[i]),
+                        "explanation": explanations[i],
+                        "model_version": self.model_version,
+                        "timestamp": timestamp
+                    }
+                    for i in range(n_records)
+                ]
             
         except Exception as e:
-            print(f"Error during prediction: {str(e)}")
-            return {"error": str(e)}
+            print(f"Error during batch prediction: {str(e)}")
+            self._count_error('predict')
+            return [{"error": str(e), "model_version": self.model_version} for _ in range(self._batch_length(data))]
+    
+    def predict(self, data: Dict) -> Dict:
+        """
+        Predict threat type and anomaly score for input data
+        
+        Args:
+            data: Dictionary containing feature values
+            
+        Returns:
+            Dictionary with prediction results
+        """
+        return self.predict_batch([data])[0]
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of model outputs keyed by the encoded feature vector
+
+    Keys hash the preprocessed row, so records that differ only in key order,
+    metadata fields or representation (1 vs 1.0) share an entry. The model
+    version is part of the key, so retrained models never serve stale results.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: Optional[float] = None):
+        """
+        Args:
+            max_size: Maximum number of cached entries; least recently used entries are evicted
+            ttl: Seconds an entry stays valid, or None to keep entries until evicted
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key(row: np.ndarray, model_version: str) -> bytes:
+        """
+        Hash an encoded feature row together with the model version
+
+        Args:
+            row: One preprocessed feature row
+            model_version: Version of the model producing the cached outputs
+
+        Returns:
+            16-byte cache key
+        """
+        digest = hashlib.blake2b(np.ascontiguousarray(row, dtype=np.float64).tobytes(), digest_size=16)
+        digest.update(model_version.encode('utf-8'))
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[Any]:
+        """
+        Look up a cached value, refreshing its recency
+
+        Args:
+            key: Cache key from key()
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: bytes, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entry when full
+
+        Args:
+            key: Cache key from key()
+            value: Value to cache
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        """
+        Snapshot of cache counters for sizing the cache
+
+        Returns:
+            Dictionary with size, capacity, hits, misses, evictions, expirations and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
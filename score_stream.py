@@ -0,0 +1,159 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, TextIO
+
+import pandas as pd
+
+from kdd_data import iter_chunks
+from predict import CybersecurityThreatDetector
+
+# Detector owned by each pool worker, loaded once by _init_worker
+_worker_detector: Optional[CybersecurityThreatDetector] = None
+
+
+def _init_worker(models_dir: str) -> None:
+    """
+    Load the detector once per worker process
+    """
+    global _worker_detector
+    _worker_detector = CybersecurityThreatDetector(models_dir, explain=False)
+
+
+def _score_in_worker(chunk: pd.DataFrame) -> pd.DataFrame:
+    return score_chunk(_worker_detector, chunk)
+
+
+def score_chunk(detector: CybersecurityThreatDetector, chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Score one chunk into a flat result table
+
+    Args:
+        detector: Loaded threat detector
+        chunk: Input records
+
+    Returns:
+        DataFrame with prediction, threat_level, anomaly_score, is_anomaly and one
+        prob_<class> column per class, aligned with the chunk's rows
+    """
+    scores = detector.score_batch(chunk, explain=False)
+    result = pd.DataFrame({
+        "prediction": scores["prediction"],
+        "threat_level": scores["threat_level"],
+        "anomaly_score": scores["anomaly_score"],
+        "is_anomaly": scores["is_anomaly"]
+    })
+    for name, column in zip(detector.label_classes, scores["class_probabilities"].T):
+        result[f"prob_{name}"] = column
+    return result
+
+
+def _write_chunk(output: TextIO, frame: pd.DataFrame, output_format: str, first: bool) -> None:
+    """
+    Append one scored chunk to the output stream
+    """
+    if output_format == 'csv':
+        frame.to_csv(output, header=first, index=False)
+    else:
+        text = frame.to_json(orient='records', lines=True, double_precision=15)
+        output.write(text if text.endswith('\n') else text + '\n')
+
+
+def score_file(input_path: str, output_path: str, models_dir: str = 'models', chunk_size: int = 50000,
+               workers: Optional[int] = None, input_format: Optional[str] = None,
+               output_format: Optional[str] = None, include_input: bool = False,
+               header: bool = False, progress: bool = True) -> Dict:
+    """
+    Stream a KDD-format file through the detector and write the scores
+
+    Chunks are scored in a process pool while at most two chunks per worker
+    are in flight, so memory stays bounded regardless of the file size.
+    Results are written in input order.
+
+    Args:
+        input_path: CSV (NSL-KDD layout), JSONL or Parquet file
+        output_path: Destination .csv or .jsonl file
+        models_dir: Directory containing the saved models
+        chunk_size: Rows per chunk
+        workers: Scoring processes; 0 scores in this process, None uses every core
+        input_format: 'csv', 'jsonl' or 'parquet'; detected from the extension when None
+        output_format: 'csv' or 'jsonl'; detected from the extension when None
+        include_input: Copy the input columns next to the scores
+        header: Whether a CSV input starts with a header row
+        progress: Print throughput after every chunk
+
+    Returns:
+        Dictionary with rows, chunks, seconds and rows_per_second
+    """
+    if output_format is None:
+        output_format = 'csv' if output_path.lower().endswith('.csv') else 'jsonl'
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    chunks = iter_chunks(input_path, chunk_size=chunk_size, input_format=input_format, header=header)
+
+    rows = 0
+    n_chunks = 0
+    start = time.perf_counter()
+
+    def write(output: TextIO, chunk: pd.DataFrame, scored: pd.DataFrame) -> None:
+        nonlocal rows, n_chunks
+        scored.insert(0, "row", range(rows, rows + len(scored)))
+        if include_input:
+            scored = pd.concat([scored, chunk.reset_index(drop=True)], axis=1)
+        _write_chunk(output, scored, output_format, first=n_chunks == 0)
+        rows += len(scored)
+        n_chunks += 1
+        if progress:
+            elapsed = time.perf_counter() - start
+            print(f"Scored {rows:,} rows ({rows / elapsed:,.0f} rows/sec)")
+
+    with open(output_path, 'w', newline='') as output:
+        if workers == 0:
+            detector = CybersecurityThreatDetector(models_dir, explain=False)
+            for chunk in chunks:
+                write(output, chunk, score_chunk(detector, chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(models_dir,)) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append((chunk, pool.submit(_score_in_worker, chunk)))
+                    if len(pending) >= 2 * workers:
+                        done_chunk, future = pending.popleft()
+                        write(output, done_chunk, future.result())
+                while pending:
+                    done_chunk, future = pending.popleft()
+                    write(output, done_chunk, future.result())
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "rows": rows,
+        "chunks": n_chunks,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed > 0 else 0.0
+    }
+    print(f"Finished: {rows:,} rows in {elapsed:.2f}s ({stats['rows_per_second']:,.0f} rows/sec)")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a large NSL-KDD style file in streaming chunks")
+    parser.add_argument('input', help="Input file (.csv/.txt in NSL-KDD layout, .jsonl or .parquet)")
+    parser.add_argument('output', help="Output file (.csv or .jsonl)")
+    parser.add_argument('--models-dir', default='models', help="Directory containing the saved models")
+    parser.add_argument('--chunk-size', type=int, default=50000, help="Rows per chunk")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Scoring processes (0 scores in-process, default: all cores)")
+    parser.add_argument('--input-format', choices=['csv', 'jsonl', 'parquet'], default=None)
+    parser.add_argument('--output-format', choices=['csv', 'jsonl'], default=None)
+    parser.add_argument('--header', action='store_true', help="CSV input has a header row")
+    parser.add_argument('--include-input', action='store_true', help="Copy input columns into the output")
+    parser.add_argument('--quiet', action='store_true', help="Only print the final summary")
+    args = parser.parse_args()
+
+    score_file(args.input, args.output, models_dir=args.models_dir, chunk_size=args.chunk_size,
+               workers=args.workers, input_format=args.input_format, output_format=args.output_format,
+               include_input=args.include_input, header=args.header, progress=not args.quiet)
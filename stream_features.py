@@ -0,0 +1,230 @@
+import argparse
+import contextlib
+import json
+import sys
+from collections import deque
+from typing import Dict, Iterable, Iterator, Tuple
+
+from kdd_data import feature_names
+
+# Connection flags counted as SYN errors and REJ errors by the KDD window features
+SYN_ERROR_FLAGS = frozenset(['S0', 'S1', 'S2', 'S3'])
+REJ_ERROR_FLAGS = frozenset(['REJ'])
+
+# Basic and content features copied from the event when present, else 0
+PASSTHROUGH_FEATURES = [
+    'duration', 'wrong_fragment', 'urgent', 'hot', 'num_failed_logins', 'logged_in',
+    'num_compromised', 'root_shell', 'su_attempted', 'num_root', 'num_file_creations',
+    'num_shells', 'num_access_files', 'num_outbound_cmds', 'is_host_login', 'is_guest_login'
+]
+
+
+class _WindowCounts:
+    """
+    Hash-indexed counters over the connections currently inside one window
+    """
+
+    def __init__(self):
+        self.counts: Dict[tuple, int] = {}
+
+    def add(self, keys: Tuple[tuple, ...]) -> None:
+        counts = self.counts
+        for key in keys:
+            counts[key] = counts.get(key, 0) + 1
+
+    def remove(self, keys: Tuple[tuple, ...]) -> None:
+        counts = self.counts
+        for key in keys:
+            remaining = counts[key] - 1
+            if remaining:
+                counts[key] = remaining
+            else:
+                # Dropping empty keys keeps memory proportional to the window contents
+                del counts[key]
+
+    def get(self, key: tuple) -> int:
+        return self.counts.get(key, 0)
+
+
+def _rate(part: int, whole: int) -> float:
+    return round(part / whole, 2) if whole else 0.0
+
+
+class StreamingFeatureExtractor:
+    """
+    Incrementally compute the NSL-KDD traffic features from raw connection events
+
+    Two windows are maintained:
+
+    - the time window holds connections from the last `time_window` seconds
+      and yields count, srv_count and the serror/rerror/same_srv/diff_srv/
+      srv_diff_host rates
+    - the host window holds the last `host_window` connections and yields
+      the dst_host_* features
+
+    Each window is a deque plus hash counters keyed by destination host,
+    service, (host, service), (service, host) and (host, source port), so
+    admitting or evicting a connection is O(1) and memory is bounded by the
+    window sizes, not by traffic volume or the number of hosts ever seen.
+    As in the KDD definitions, the current connection counts towards its
+    own windows.
+    """
+
+    def __init__(self, time_window: float = 2.0, host_window: int = 100,
+                 max_time_window_events: int = 100000):
+        """
+        Args:
+            time_window: Seconds covered by the time-based features
+            host_window: Connections covered by the host-based features
+            max_time_window_events: Hard cap on the time window, so a traffic
+                burst cannot grow it without bound
+        """
+        self.time_window = time_window
+        self.host_window = host_window
+        self.max_time_window_events = max_time_window_events
+
+        self._time_events: deque = deque()
+        self._time_counts = _WindowCounts()
+        self._host_events: deque = deque()
+        self._host_counts = _WindowCounts()
+
+    @staticmethod
+    def _keys(dst: str, service: str, src_port, flag: str) -> Tuple[tuple, ...]:
+        keys = [('dst', dst), ('srv', service), ('dst_srv', dst, service), ('srv_dst', service, dst),
+                ('dst_port', dst, src_port)]
+        if flag in SYN_ERROR_FLAGS:
+            keys += [('dst_serror', dst), ('srv_serror', service)]
+        elif flag in REJ_ERROR_FLAGS:
+            keys += [('dst_rerror', dst), ('srv_rerror', service)]
+        return tuple(keys)
+
+    def _advance(self, timestamp: float, keys: Tuple[tuple, ...]) -> None:
+        """
+        Admit a connection to both windows and evict what fell out of them
+        """
+        time_events = self._time_events
+        cutoff = timestamp - self.time_window
+        while time_events and (time_events[0][0] <= cutoff or len(time_events) >= self.max_time_window_events):
+            self._time_counts.remove(time_events.popleft()[1])
+        time_events.append((timestamp, keys))
+        self._time_counts.add(keys)
+
+        host_events = self._host_events
+        if len(host_events) >= self.host_window:
+            self._host_counts.remove(host_events.popleft())
+        host_events.append(keys)
+        self._host_counts.add(keys)
+
+    def update(self, event: Dict) -> Dict:
+        """
+        Add one connection and return its complete feature row
+
+        Args:
+            event: Connection record with timestamp (seconds), src, dst, service,
+                flag, src_bytes and dst_bytes; protocol_type, src_port, dst_port
+                and the basic/content features (duration, hot, logged_in, ...)
+                are used when present
+
+        Returns:
+            Dictionary with every NSL-KDD feature, ready for CybersecurityThreatDetector
+        """
+        dst = event['dst']
+        service = event['service']
+        flag = event['flag']
+        src_port = event.get('src_port')
+        keys = self._keys(dst, service, src_port, flag)
+        self._advance(float(event['timestamp']), keys)
+
+        row = {name: event.get(name, 0) for name in PASSTHROUGH_FEATURES}
+        row['protocol_type'] = event.get('protocol_type', 'tcp')
+        row['service'] = service
+        row['flag'] = flag
+        row['src_bytes'] = event.get('src_bytes', 0)
+        row['dst_bytes'] = event.get('dst_bytes', 0)
+        row['land'] = int(event['src'] == dst and src_port is not None and src_port == event.get('dst_port'))
+
+        counts = self._time_counts
+        count = counts.get(('dst', dst))
+        srv_count = counts.get(('srv', service))
+        row['count'] = count
+        row['srv_count'] = srv_count
+        row['serror_rate'] = _rate(counts.get(('dst_serror', dst)), count)
+        row['srv_serror_rate'] = _rate(counts.get(('srv_serror', service)), srv_count)
+        row['rerror_rate'] = _rate(counts.get(('dst_rerror', dst)), count)
+        row['srv_rerror_rate'] = _rate(counts.get(('srv_rerror', service)), srv_count)
+        row['same_srv_rate'] = _rate(counts.get(('dst_srv', dst, service)), count)
+        row['diff_srv_rate'] = _rate(count - counts.get(('dst_srv', dst, service)), count)
+        row['srv_diff_host_rate'] = _rate(srv_count - counts.get(('srv_dst', service, dst)), srv_count)
+
+        counts = self._host_counts
+        host_count = counts.get(('dst', dst))
+        host_srv_count = counts.get(('srv', service))
+        row['dst_host_count'] = host_count
+        row['dst_host_srv_count'] = host_srv_count
+        row['dst_host_same_srv_rate'] = _rate(counts.get(('dst_srv', dst, service)), host_count)
+        row['dst_host_diff_srv_rate'] = _rate(host_count - counts.get(('dst_srv', dst, service)), host_count)
+        row['dst_host_same_src_port_rate'] = _rate(counts.get(('dst_port', dst, src_port)), host_count)
+        row['dst_host_srv_diff_host_rate'] = _rate(
+            host_srv_count - counts.get(('srv_dst', service, dst)), host_srv_count)
+        row['dst_host_serror_rate'] = _rate(counts.get(('dst_serror', dst)), host_count)
+        row['dst_host_srv_serror_rate'] = _rate(counts.get(('srv_serror', service)), host_srv_count)
+        row['dst_host_rerror_rate'] = _rate(counts.get(('dst_rerror', dst)), host_count)
+        row['dst_host_srv_rerror_rate'] = _rate(counts.get(('srv_rerror', service)), host_srv_count)
+
+        return {name: row[name] for name in feature_names}
+
+    def process(self, events: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Feature rows for a time-ordered stream of connection events
+        """
+        for event in events:
+            yield self.update(event)
+
+    def window_sizes(self) -> Dict[str, int]:
+        """
+        Current number of connections and counter keys held by each window
+        """
+        return {
+            "time_window_events": len(self._time_events),
+            "time_window_keys": len(self._time_counts.counts),
+            "host_window_events": len(self._host_events),
+            "host_window_keys": len(self._host_counts.counts)
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Turn raw connection events (JSONL) into NSL-KDD feature rows")
+    parser.add_argument('input', nargs='?', default='-', help="JSONL file of connection events (default: stdin)")
+    parser.add_argument('--score', action='store_true', help="Also score each row with the threat detector")
+    parser.add_argument('--models-dir', default='models', help="Directory containing the saved models")
+    parser.add_argument('--batch-size', type=int, default=256, help="Rows per detector call with --score")
+    args = parser.parse_args()
+
+    extractor = StreamingFeatureExtractor()
+    detector = None
+    if args.score:
+        from predict import CybersecurityThreatDetector
+        # Keep stdout clean JSONL; the detector reports loading progress with print
+        with contextlib.redirect_stdout(sys.stderr):
+            detector = CybersecurityThreatDetector(args.models_dir)
+
+    source = sys.stdin if args.input == '-' else open(args.input)
+    pending = []
+
+    def emit(rows) -> None:
+        results = detector.predict_batch(rows) if detector is not None else [None] * len(rows)
+        for row, result in zip(rows, results):
+            if result is not None:
+                row = {**row, "prediction": result.get("prediction"), "threat_level": result.get("threat_level"),
+                       "anomaly_score": result.get("anomaly_score")}
+            print(json.dumps(row))
+
+    with source:
+        for line in source:
+            if line.strip():
+                pending.append(extractor.update(json.loads(line)))
+            if len(pending) >= args.batch_size:
+                emit(pending)
+                pending = []
+    if pending:
+        emit(pending)
@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to this directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def models_dir(tmp_path_factory) -> str:
+    """
+    Directory with a tiny model trained on synthetic data, pickles and bundle
+    """
+    path = str(tmp_path_factory.mktemp('models'))
+    subprocess.run([sys.executable, 'train.py', '--synthetic-rows', '2000', '--n-estimators', '10',
+                    '--n-jobs', '1', '--models-dir', path], cwd=ROOT, capture_output=True, check=True)
+    return path
@@ -0,0 +1,37 @@
+import threading
+import time
+
+from alert_aggregator import AlertAggregator
+
+
+def test_slow_sink_does_not_block_other_groups_and_keeps_group_order():
+    emitted = []
+    release = threading.Event()
+
+    def on_emit(document_id, fields, created):
+        if fields.get('source') == 'slow':
+            release.wait(5)
+        emitted.append((document_id, created, fields.get('revision')))
+
+    aggregator = AlertAggregator(on_emit, start=False)
+    slow = threading.Thread(target=aggregator.add, args=({'source': 'slow'},))
+    slow.start()
+    time.sleep(0.05)
+
+    # The slow group's creation is still being emitted; other groups and its own merges go through
+    started = time.perf_counter()
+    aggregator.add({'source': 'fast'})
+    slow_id = aggregator.add({'source': 'slow'})
+    assert time.perf_counter() - started < 1
+
+    # The slow group's update waits for its creation instead of overtaking it
+    flusher = threading.Thread(target=aggregator.flush)
+    flusher.start()
+    time.sleep(0.05)
+    release.set()
+    slow.join()
+    flusher.join()
+
+    assert [(created, revision) for document_id, created, revision in emitted if document_id == slow_id] == [
+        (True, 0), (False, 1)]
+    aggregator.close()
@@ -0,0 +1,9 @@
+from cold_start import measure_cold_start
+
+
+def test_serving_path_imports_no_heavy_modules(models_dir):
+    # Timings depend on the machine, so only the import leaks and the engine are checked
+    result = measure_cold_start(models_dir, runs=1)
+
+    assert result["heavy_modules"] == {}
+    assert result["engine"] is True
@@ -0,0 +1,20 @@
+import numpy as np
+
+from feature_encoder import FeatureEncoder
+
+
+def test_missing_values_encode_alike_in_every_path():
+    encoder = FeatureEncoder(['duration', 'src_bytes', 'dst_bytes', 'protocol_type_udp'],
+                             mean=np.array([1.0, 100.0, 50.0, 0.2]), scale=np.array([2.0, 40.0, 10.0, 0.4]),
+                             categorical_columns=['protocol_type'])
+    record = {'duration': None, 'src_bytes': float('nan'), 'dst_bytes': 70, 'protocol_type': 'udp'}
+    columns = {name: [value] for name, value in record.items()}
+
+    single = encoder.encode(record)
+    listed = encoder.encode_records([record])
+    columnar = encoder.encode_columns(columns)
+
+    assert not np.isnan(single).any()
+    np.testing.assert_array_equal(single, listed)
+    np.testing.assert_array_equal(single, columnar)
+    np.testing.assert_array_equal(single, encoder.encode({'dst_bytes': 70, 'protocol_type': 'udp'}))
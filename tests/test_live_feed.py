@@ -0,0 +1,17 @@
+import asyncio
+
+from live_feed import AlertHub, sse_stream
+
+
+def test_stream_closed_mid_heartbeat_unsubscribes():
+    async def scenario():
+        hub = AlertHub()
+        stream = sse_stream(hub, heartbeat=0.01)
+        assert await stream.__anext__() == "retry: 1000\n\n"
+        assert await stream.__anext__() == ": keep-alive\n\n"
+        assert hub.subscriber_count == 1
+
+        await stream.aclose()
+        return hub.subscriber_count
+
+    assert asyncio.run(scenario()) == 0
@@ -0,0 +1,22 @@
+import persistence
+from memory_firestore import MemoryFirestore
+from persistence import LazyFirestore, WriteBehindWriter
+
+
+def test_submit_does_not_connect_lazy_client():
+    db = LazyFirestore(MemoryFirestore)
+    writer = WriteBehindWriter(db, start=False)
+
+    document_id = writer.submit({"prediction": "normal"})
+
+    assert len(document_id) == 20 and document_id.isalnum()
+    assert not db.connected
+
+
+def test_drop_oldest_keeps_stop_sentinel():
+    writer = WriteBehindWriter(MemoryFirestore(), max_queue_size=1, overflow='drop_oldest', start=False)
+    # close() queued the sentinel just before this submit found the queue full
+    writer._queue.put(persistence._STOP)
+
+    assert writer.submit({"prediction": "normal"}) is None
+    assert writer._queue.get_nowait() is persistence._STOP
@@ -0,0 +1,19 @@
+import os
+import pickle
+
+from tree_engine import CompiledForest, check_parity, parity_inputs
+
+
+def test_compiled_forest_matches_sklearn(models_dir):
+    with open(os.path.join(models_dir, 'classification_model.pkl'), 'rb') as f:
+        clf = pickle.load(f)
+    with open(os.path.join(models_dir, 'anomaly_detector.pkl'), 'rb') as f:
+        iso = pickle.load(f)
+
+    forest = CompiledForest.from_models(clf, iso)
+    results = check_parity(forest, clf, iso, parity_inputs(forest, 2000, clf.n_features_in_))
+
+    assert results["max_probability_diff"] <= 1e-9
+    assert results["max_anomaly_score_diff"] <= 1e-9
+    assert results["label_mismatches"] == 0
+    assert results["anomaly_flag_mismatches"] == 0
@@ -1,239 +1,892 @@
-import pandas as pd
-import numpy as np
+import argparse
+import json
+import os
 import pickle
-from sklearn.model_selection import train_test_split
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.ensemble import RandomForestClassifier, IsolationForest
 from sklearn.metrics import classification_report, confusion_matrix
-import matplotlib.pyplot as plt
-import seaborn as sns
-import os
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 
-# Create directories for models and visualizations
-os.makedirs('models', exist_ok=True)
-os.makedirs('visualizations', exist_ok=True)
-
-print("Loading and preprocessing NSL-KDD dataset...")
-
-# Load the NSL-KDD dataset
-# You would need to download this dataset from: https://www.unb.ca/cic/datasets/nsl.html
-# For this example, we'll assume you have KDDTrain+.txt and KDDTest+.txt files
-
-# Column names for NSL-KDD dataset
-col_names = [
-    'duration', 'protocol_type', 'service', 'flag', 'src_bytes', 'dst_bytes',
-    'land', 'wrong_fragment', 'urgent', 'hot', 'num_failed_logins', 'logged_in',
-    'num_compromised', 'root_shell', 'su_attempted', 'num_root', 'num_file_creations',
-    'num_shells', 'num_access_files', 'num_outbound_cmds', 'is_host_login',
-    'is_guest_login', 'count', 'srv_count', 'serror_rate', 'srv_serror_rate',
-    'rerror_rate', 'srv_rerror_rate', 'same_srv_rate', 'diff_srv_rate',
-    'srv_diff_host_rate', 'dst_host_count', 'dst_host_srv_count', 'dst_host_same_srv_rate',
-    'dst_host_diff_srv_rate', 'dst_host_same_src_port_rate', 'dst_host_srv_diff_host_rate',
-    'dst_host_serror_rate', 'dst_host_srv_serror_rate', 'dst_host_rerror_rate',
-    'dst_host_srv_rerror_rate', 'class', 'difficulty'
-]
-
-try:
-    # For demonstration purposes, we'll simulate loading the dataset
-    # In a real scenario, you'd use:
-    # train_data = pd.read_csv('KDDTrain+.txt', header=None, names=col_names)
-    # test_data = pd.read_csv('KDDTest+.txt', header=None, names=col_names)
-    
-    # For this code, we'll create a simulated dataset
-    print("Simulating dataset for demonstration...")
-    
-    # Create a function to generate synthetic data
-    def generate_synthetic_data(n_samples=1000):
-        # Generate numeric features
-        numeric_features = np.random.rand(n_samples, 38)
-        
-        # Generate categorical features
-        protocols = np.random.choice(['tcp', 'udp', 'icmp'], n_samples)
-        services = np.random.choice(['http', 'ftp', 'smtp', 'ssh', 'dns'], n_samples)
-        flags = np.random.choice(['SF', 'S0', 'REJ', 'RSTO'], n_samples)
-        
-        # Generate labels: normal, dos, probe, r2l, u2r
-        labels = np.random.choice(['normal', 'dos', 'probe', 'r2l', 'u2r'], 
-                                 n_samples, p=[0.6, 0.2, 0.1, 0.07, 0.03])
-        
-        # Create DataFrame
-        df = pd.DataFrame(numeric_features, columns=[col for col in col_names 
-                                                 if col not in ['protocol_type', 'service', 'flag', 'class', 'difficulty']])
-        
-        df['protocol_type'] = protocols
-        df['service'] = services
-        df['flag'] = flags
-        df['class'] = labels
-        df['difficulty'] = np.random.randint(0, 21, n_samples)
-        
-        # Reorder columns to match col_names
-        return df[col_names]
-    
-    # Generate synthetic data
-    train_data = generate_synthetic_data(10000)
-    test_data = generate_synthetic_data(2000)
-    
-    # Check for DataFrame creation
-    if train_data.empty or test_data.empty:
-        raise ValueError("Failed to create synthetic datasets")
-    
-    print(f"Training data shape: {train_data.shape}")
-    print(f"Testing data shape: {test_data.shape}")
-
-    # Data preprocessing
-    print("Preprocessing data...")
-    
-    # Drop the 'difficulty' column as it's not needed for classification
-    train_data.drop('difficulty', axis=1, inplace=True)
-    test_data.drop('difficulty', axis=1, inplace=True)
-    
-    # Convert attack classes to categories
-    # In NSL-KDD, there are 5 main categories: normal, DoS, Probe, R2L, U2R
-    def categorize_attack(attack):
-        dos_attacks = ['neptune', 'smurf', 'pod', 'teardrop', 'land', 'back', 'apache2']
-        probe_attacks = ['ipsweep', 'nmap', 'portsweep', 'satan', 'mscan', 'saint']
-        r2l_attacks = ['guesspasswd', 'ftp_write', 'imap', 'phf', 'multihop', 'warezmaster', 
-                      'warezclient', 'spy', 'xlock', 'xsnoop', 'snmpguess', 'snmpgetattack', 
-                      'httptunnel', 'sendmail', 'named']
-        u2r_attacks = ['buffer_overflow', 'loadmodule', 'rootkit', 'perl', 'sqlattack', 'xterm', 'ps']
-        
-        if attack == 'normal':
-            return 'normal'
-        elif attack in dos_attacks:
-            return 'dos'
-        elif attack in probe_attacks:
-            return 'probe'
-        elif attack in r2l_attacks:
-            return 'r2l'
-        elif attack in u2r_attacks:
-            return 'u2r'
-        else:
-            # For any other attacks not categorized
-            return 'other'
-    
-    # For synthetic data, we already have the categories, but in real data you'd map detailed attack names to categories
-    # train_data['class'] = train_data['class'].apply(categorize_attack)
-    # test_data['class'] = test_data['class'].apply(categorize_attack)
-    
-    # Handle categorical features
-    print("Encoding categorical features...")
-    categorical_columns = ['protocol_type', 'service', 'flag']
-    
-    # Apply one-hot encoding to categorical features
-    train_categorical = pd.get_dummies(train_data[categorical_columns], drop_first=True)
-    test_categorical = pd.get_dummies(test_data[categorical_columns], drop_first=True)
-    
-    # Ensure test set has all columns from train set
-    for col in train_categorical.columns:
-        if col not in test_categorical.columns:
-            test_categorical[col] = 0
-    
-    # Match the column order
-    test_categorical = test_categorical[train_categorical.columns]
-    
-    # Separate features and target
-    X_train = pd.concat([train_data.drop(categorical_columns + ['class'], axis=1), train_categorical], axis=1)
-    y_train = train_data['class']
-    
-    # Line 136: Save feature columns for use during prediction
-    feature_columns = X_train.columns
-    with open('models/feature_columns.pkl', 'wb') as f:
-        pickle.dump(feature_columns, f)
-    
-    X_test = pd.concat([test_data.drop(categorical_columns + ['class'], axis=1), test_categorical], axis=1)
-    y_test = test_data['class']
-    
-    # Standardize numerical features
-    print("Standardizing numerical features...")
+from kdd_data import categorical_columns, generate_synthetic_data, iter_chunks, numeric_columns
+from model_bundle import write_detector_bundle
+from tree_engine import CascadeForest, CompiledForest
+
+# The 5 main categories used as classification targets
+ATTACK_CATEGORIES = ['normal', 'dos', 'probe', 'r2l', 'u2r']
+
+# Samples per isolation tree when growing the anomaly detector chunk by chunk (--incremental)
+ISOLATION_MAX_SAMPLES = 256
+
+# Wall time and memory of each finished stage, printed as a summary at the end
+stage_stats: List[Dict] = []
+
+
+def _reset_peak_rss() -> bool:
+    """
+    Reset the kernel's peak RSS counter (Linux 4.0+), so each stage reports its own peak
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes() -> int:
+    """
+    Peak resident memory since the last reset, or since process start where resetting is unsupported
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a pipeline stage and record its wall time and peak memory
+
+    Peak memory is the process's resident set high-water mark, which also
+    covers memory allocated inside sklearn's compiled code. On systems
+    without a resettable counter it is the peak since process start.
+
+    Args:
+        name: Stage name
+    """
+    print(f"\n[{name}]")
+    per_stage = _reset_peak_rss()
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    peak_mb = _peak_rss_bytes() / 2**20
+    stage_stats.append({"stage": name, "seconds": elapsed, "peak_rss_mb": peak_mb, "per_stage": per_stage})
+    print(f"[{name}] {elapsed:.2f}s, peak RSS {peak_mb:.1f} MB{'' if per_stage else ' (since start)'}")
+
+
+def categorize_attack(attack: str) -> str:
+    """
+    Map a detailed NSL-KDD attack name to one of the 5 main categories
+
+    Args:
+        attack: Attack name from the class column
+
+    Returns:
+        'normal', 'dos', 'probe', 'r2l', 'u2r' or 'other'
+    """
+    dos_attacks = ['neptune', 'smurf', 'pod', 'teardrop', 'land', 'back', 'apache2']
+    probe_attacks = ['ipsweep', 'nmap', 'portsweep', 'satan', 'mscan', 'saint']
+    r2l_attacks = ['guesspasswd', 'ftp_write', 'imap', 'phf', 'multihop', 'warezmaster',
+                  'warezclient', 'spy', 'xlock', 'xsnoop', 'snmpguess', 'snmpgetattack',
+                  'httptunnel', 'sendmail', 'named']
+    u2r_attacks = ['buffer_overflow', 'loadmodule', 'rootkit', 'perl', 'sqlattack', 'xterm', 'ps']
+
+    if attack == 'normal':
+        return 'normal'
+    elif attack in dos_attacks:
+        return 'dos'
+    elif attack in probe_attacks:
+        return 'probe'
+    elif attack in r2l_attacks:
+        return 'r2l'
+    elif attack in u2r_attacks:
+        return 'u2r'
+    else:
+        # For any other attacks not categorized
+        return 'other'
+
+
+def chunk_source(data, chunk_size: int) -> Callable[[], Iterator[pd.DataFrame]]:
+    """
+    Make a re-iterable chunk source over a KDD file or an in-memory frame
+
+    Args:
+        data: Path to a KDDTrain+/KDDTest+ style file (CSV, JSONL or Parquet) or a DataFrame
+        chunk_size: Rows per chunk
+
+    Returns:
+        Function returning a fresh iterator of DataFrame chunks on every call
+    """
+    if isinstance(data, pd.DataFrame):
+        return lambda: (data.iloc[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+    return lambda: iter_chunks(data, chunk_size=chunk_size)
+
+
+def chunk_labels(chunk: pd.DataFrame) -> np.ndarray:
+    """
+    Attack categories of a chunk; detailed attack names are mapped with categorize_attack
+    """
+    labels = chunk['class'].astype(str).to_numpy()
+    if not np.isin(labels, ATTACK_CATEGORIES).all():
+        labels = np.array([categorize_attack(label) for label in labels])
+    return labels
+
+
+class ChunkEncoder:
+    """
+    Encode raw chunks into the model's feature layout with fixed categorical codes
+
+    The layout matches pd.get_dummies(..., drop_first=True) over the full
+    training set: numeric columns first, then one indicator column per
+    category except the alphabetically first, in categorical_columns order.
+    Categories are fixed after the scan, so every chunk (and the test set)
+    gets identical columns, and values never seen in training encode as all
+    zeros.
+    """
+
+    def __init__(self, categories: Dict[str, List[str]]):
+        """
+        Args:
+            categories: Sorted category values per categorical column
+        """
+        self.categories = categories
+        self.feature_columns = pd.Index(
+            list(numeric_columns) +
+            [f"{col}_{value}" for col in categorical_columns for value in categories[col][1:]]
+        )
+
+        # Offset of each categorical column's first indicator, shifted so code 0 (the dropped category) has none
+        self.offsets = {}
+        position = len(numeric_columns)
+        for col in categorical_columns:
+            self.offsets[col] = position - 1
+            position += len(categories[col]) - 1
+
+    def encode(self, chunk: pd.DataFrame) -> np.ndarray:
+        """
+        Encode a chunk without scaling
+
+        Args:
+            chunk: Raw records with the numeric and categorical columns
+
+        Returns:
+            Float64 matrix with one row per record and len(feature_columns) columns
+        """
+        n_rows = len(chunk)
+        X = np.zeros((n_rows, len(self.feature_columns)))
+        X[:, :len(numeric_columns)] = chunk[numeric_columns].to_numpy(dtype=np.float64)
+
+        rows = np.arange(n_rows)
+        for col in categorical_columns:
+            codes = pd.Categorical(chunk[col].astype(str), categories=self.categories[col]).codes
+            # Code 0 is the dropped first category and -1 an unseen value; neither sets an indicator
+            present = codes > 0
+            X[rows[present], self.offsets[col] + codes[present]] = 1.0
+        return X
+
+
+def scan_training_data(chunks: Callable[[], Iterator[pd.DataFrame]]) -> Tuple[Dict[str, List[str]], Dict[str, int]]:
+    """
+    First pass: collect the categorical values and class counts
+
+    Args:
+        chunks: Training chunk source
+
+    Returns:
+        Tuple of sorted categories per categorical column and row count per class
+    """
+    values = {col: set() for col in categorical_columns}
+    class_counts: Dict[str, int] = {}
+    for chunk in chunks():
+        for col in categorical_columns:
+            values[col].update(chunk[col].astype(str).unique())
+        labels, counts = np.unique(chunk_labels(chunk), return_counts=True)
+        for label, count in zip(labels, counts):
+            class_counts[str(label)] = class_counts.get(str(label), 0) + int(count)
+    return {col: sorted(found) for col, found in values.items()}, class_counts
+
+
+def fit_scaler_and_sample(chunks: Callable[[], Iterator[pd.DataFrame]], encoder: ChunkEncoder,
+                          sample_fraction: float, seed: int) -> Tuple[StandardScaler, np.ndarray, np.ndarray]:
+    """
+    Second pass: fit the scaler on every row and keep a uniform sample for fitting the forests
+
+    Args:
+        chunks: Training chunk source
+        encoder: Encoder built from the scan
+        sample_fraction: Probability of keeping each row (1.0 keeps all)
+        seed: Random seed for the sample
+
+    Returns:
+        Tuple of the fitted scaler, the sampled unscaled features and their labels
+    """
+    rng = np.random.default_rng(seed)
     scaler = StandardScaler()
-    X_train = scaler.fit_transform(X_train)
-    X_test = scaler.transform(X_test)
-    
-    # Save the scaler
-    with open('models/scaler.pkl', 'wb') as f:
-        pickle.dump(scaler, f)
-    
-    # Encode target labels
-    le = LabelEncoder()
-    y_train_encoded = le.fit_transform(y_train)
-    y_test_encoded = le.transform(y_test)
-    
-    # Save the label encoder
-    with open('models/label_encoder.pkl', 'wb') as f:
-        pickle.dump(le, f)
-    
-    # Train classification model
-    print("Training classification model (Random Forest)...")
-    clf = RandomForestClassifier(n_estimators=100, random_state=42)
-    clf.fit(X_train, y_train_encoded)
-    
-    # Save the classification model
-    with open('models/classification_model.pkl', 'wb') as f:
-        pickle.dump(clf, f)
-    
-    # Evaluate classification model
-    y_pred = clf.predict(X_test)
+    sampled_X, sampled_y = [], []
+    for chunk in chunks():
+        X = encoder.encode(chunk)
+        scaler.partial_fit(X)
+        keep = rng.random(len(X)) < sample_fraction if sample_fraction < 1.0 else slice(None)
+        sampled_X.append(X[keep])
+        sampled_y.append(chunk_labels(chunk)[keep])
+    return scaler, np.concatenate(sampled_X), np.concatenate(sampled_y)
+
+
+def scale(scaler: StandardScaler, X: np.ndarray) -> np.ndarray:
+    """
+    Standardize and cast to float32, the dtype sklearn's trees split on anyway
+    """
+    return scaler.transform(X).astype(np.float32)
+
+
+def fit_forests(X: np.ndarray, y_encoded: np.ndarray, is_normal: np.ndarray, n_estimators: int,
+                n_jobs: int, seed: int) -> Tuple[RandomForestClassifier, IsolationForest]:
+    """
+    Fit the classifier on all rows and the anomaly detector on normal rows, using every core
+
+    Args:
+        X: Scaled training features
+        y_encoded: Encoded class labels
+        is_normal: Mask of normal rows
+        n_estimators: Trees in the random forest
+        n_jobs: Parallel jobs (-1 uses all cores)
+        seed: Random seed
+
+    Returns:
+        Tuple of the fitted RandomForestClassifier and IsolationForest
+    """
+    clf = RandomForestClassifier(n_estimators=n_estimators, random_state=seed, n_jobs=n_jobs)
+    clf.fit(X, y_encoded)
+
+    # The anomaly detector learns what normal traffic looks like
+    anomaly_detector = IsolationForest(contamination=0.1, random_state=seed, n_jobs=n_jobs)
+    anomaly_detector.fit(X[is_normal])
+    return clf, anomaly_detector
+
+
+def fit_forests_incrementally(chunks: Callable[[], Iterator[pd.DataFrame]], encoder: ChunkEncoder,
+                              scaler: StandardScaler, label_encoder: LabelEncoder, anchor_X: np.ndarray,
+                              anchor_y: np.ndarray, normal_sample: np.ndarray, trees_per_chunk: int,
+                              n_jobs: int, seed: int) -> Tuple[RandomForestClassifier, IsolationForest]:
+    """
+    Grow both forests chunk by chunk with warm_start, holding one chunk in memory at a time
+
+    Every chunk adds trees_per_chunk trees to each forest. The chunk is
+    extended with a few anchor rows per class so every fit sees all classes
+    and the trees' class columns line up. The isolation forest skips chunks
+    with fewer than ISOLATION_MAX_SAMPLES normal rows so all its trees share
+    one sample size, and its threshold is recalibrated on a normal sample at
+    the end (the warm-started fit only calibrates on the last chunk).
+
+    Args:
+        chunks: Training chunk source
+        encoder: Encoder built from the scan
+        scaler: Fitted scaler
+        label_encoder: Fitted label encoder
+        anchor_X: Scaled anchor rows covering every class
+        anchor_y: Encoded labels of the anchor rows
+        normal_sample: Scaled normal rows used to calibrate the anomaly threshold
+        trees_per_chunk: Trees added per chunk to each forest
+        n_jobs: Parallel jobs (-1 uses all cores)
+        seed: Random seed
+
+    Returns:
+        Tuple of the fitted RandomForestClassifier and IsolationForest
+    """
+    clf = RandomForestClassifier(n_estimators=0, warm_start=True, random_state=seed, n_jobs=n_jobs)
+    anomaly_detector = IsolationForest(n_estimators=0, max_samples=ISOLATION_MAX_SAMPLES, contamination=0.1,
+                                       warm_start=True, random_state=seed, n_jobs=n_jobs)
+
+    for index, chunk in enumerate(chunks()):
+        X = scale(scaler, encoder.encode(chunk))
+        labels = chunk_labels(chunk)
+
+        clf.n_estimators += trees_per_chunk
+        clf.fit(np.concatenate([X, anchor_X]),
+                np.concatenate([label_encoder.transform(labels), anchor_y]))
+
+        X_normal = X[labels == 'normal']
+        if len(X_normal) >= ISOLATION_MAX_SAMPLES:
+            anomaly_detector.n_estimators += trees_per_chunk
+            anomaly_detector.fit(X_normal)
+        print(f"Chunk {index + 1}: {clf.n_estimators} classifier trees, "
+              f"{anomaly_detector.n_estimators} anomaly trees")
+
+    if anomaly_detector.n_estimators == 0:
+        raise ValueError(f"No chunk had {ISOLATION_MAX_SAMPLES} normal rows to fit the anomaly detector on")
+
+    # Same threshold rule as IsolationForest.fit, applied to a sample of all normal traffic
+    anomaly_detector.offset_ = np.percentile(anomaly_detector.score_samples(normal_sample),
+                                             100.0 * anomaly_detector.contamination)
+    return clf, anomaly_detector
+
+
+def evaluate(chunks: Callable[[], Iterator[pd.DataFrame]], encoder: ChunkEncoder, scaler: StandardScaler,
+             label_encoder: LabelEncoder, clf: RandomForestClassifier,
+             anomaly_detector: IsolationForest) -> Dict[str, np.ndarray]:
+    """
+    Score the test set chunk by chunk and print the classification and anomaly reports
+
+    Returns:
+        Dictionary with y_true and y_pred (encoded, for rows with known classes)
+    """
+    y_true, y_pred, true_anomalies, anomaly_predictions = [], [], [], []
+    known = set(label_encoder.classes_)
+    for chunk in chunks():
+        X = scale(scaler, encoder.encode(chunk))
+        labels = chunk_labels(chunk)
+
+        # Rows whose class never occurred in training cannot be scored by the classifier report
+        mask = np.array([label in known for label in labels])
+        y_true.append(label_encoder.transform(labels[mask]))
+        y_pred.append(clf.predict(X[mask]))
+
+        # IsolationForest.predict marks anomalies as -1; count every non-normal row as a true anomaly
+        anomaly_predictions.append(anomaly_detector.predict(X) == -1)
+        true_anomalies.append(labels != 'normal')
+
+    y_true, y_pred = np.concatenate(y_true), np.concatenate(y_pred)
+    true_anomalies = np.concatenate(true_anomalies).astype(int)
+    anomaly_predictions = np.concatenate(anomaly_predictions).astype(int)
+
     print("\nClassification Report:")
-    print(classification_report(y_test_encoded, y_pred, target_names=le.classes_))
-    
-    # Create confusion matrix visualization
+    print(classification_report(y_true, y_pred, labels=np.arange(len(label_encoder.classes_)),
+                                target_names=label_encoder.classes_, zero_division=0))
+
+    print("\nAnomaly Detection Results:")
+    print(f"Accuracy: {accuracy_score(true_anomalies, anomaly_predictions):.4f}")
+    print(f"Precision: {precision_score(true_anomalies, anomaly_predictions, zero_division=0):.4f}")
+    print(f"Recall: {recall_score(true_anomalies, anomaly_predictions, zero_division=0):.4f}")
+    print(f"F1 Score: {f1_score(true_anomalies, anomaly_predictions, zero_division=0):.4f}")
+
+    return {"y_true": y_true, "y_pred": y_pred}
+
+
+def validation_sample(chunks: Callable[[], Iterator[pd.DataFrame]], encoder: ChunkEncoder,
+                      scaler: StandardScaler, label_encoder: LabelEncoder,
+                      max_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scaled test rows with known classes, up to max_rows, for measuring compaction
+
+    Returns:
+        Tuple of the feature matrix and the encoded labels
+    """
+    X_parts, y_parts, n_rows = [], [], 0
+    known = set(label_encoder.classes_)
+    for chunk in chunks():
+        labels = chunk_labels(chunk)
+        mask = np.array([label in known for label in labels])
+        X_parts.append(scale(scaler, encoder.encode(chunk))[mask])
+        y_parts.append(label_encoder.transform(labels[mask]))
+        n_rows += int(mask.sum())
+        if n_rows >= max_rows:
+            break
+    return np.concatenate(X_parts)[:max_rows], np.concatenate(y_parts)[:max_rows]
+
+
+def _latency_ms(forest: CompiledForest, X: np.ndarray, repeat: int = 5) -> float:
+    """
+    Median milliseconds to evaluate X
+    """
+    forest.evaluate(X)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        forest.evaluate(X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def _split_halves(X: np.ndarray, y: np.ndarray, seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Shuffle validation rows into a selection half and a held-out reporting half
+
+    Settings chosen on the first half are scored on the second, so the
+    reported accuracy and agreement are not biased by the choice.
+    """
+    if len(X) < 2:
+        raise ValueError("At least two validation rows are needed")
+    order = np.random.default_rng(seed).permutation(len(X))
+    selection, held_out = order[:len(X) // 2], order[len(X) // 2:]
+    return X[selection], y[selection], X[held_out], y[held_out]
+
+
+def compact_forest(forest: CompiledForest, X: np.ndarray, y: np.ndarray, accuracy_budget: float,
+                   depths: Sequence[int], min_label_agreement: float = 0.99, min_trees: int = 10,
+                   min_validation_rows: int = 1000) -> Tuple[CompiledForest, Dict]:
+    """
+    Pick the smallest compact forest whose accuracy stays within the budget
+
+    Every depth limit is tried with every number of leading classifier
+    trees, down to min_trees; the running sum of per-tree class
+    distributions gives the accuracy of each tree count from a single
+    traversal per depth. The candidate with the fewest classifier nodes
+    whose accuracy is at most accuracy_budget below the full forest's and
+    whose labels agree with the full forest's on at least
+    min_label_agreement of the rows wins. Reduced precision alone (no
+    pruning) is always a candidate.
+
+    X is split in half: the candidate is chosen on one half and the report
+    is measured on the other. Pruning is dropped, keeping only the reduced
+    precision, when the held-out half has fewer than min_validation_rows
+    rows or the candidate misses the accuracy budget or the agreement floor
+    on it. Accuracy alone does not bound what consumers see: a forest of a
+    few trees can keep the accuracy while changing many labels, probabilities
+    and explanations.
+
+    Args:
+        forest: Full compiled forest
+        X: Scaled validation rows, split into selection and reporting halves
+        y: Encoded labels of X
+        accuracy_budget: Largest accepted accuracy loss (0.005 = half a point)
+        depths: Classifier depth limits to try
+        min_label_agreement: Smallest share of rows whose label must match the full forest's
+        min_trees: Fewest classifier trees a pruned forest may keep
+        min_validation_rows: Fewest held-out rows needed to accept pruning
+
+    Returns:
+        Tuple of the compact forest and a report with the chosen settings and
+        the size, latency and accuracy of both forests
+    """
+    X_select, y_select, X, y = _split_halves(X, y)
+    selection_labels = forest.evaluate(X_select)["labels"]
+    selection_baseline = float(np.mean(selection_labels == y_select))
+    min_trees = min(min_trees, forest.n_classifier_trees)
+
+    best = None
+    for depth in [None] + sorted(set(depths), reverse=True):
+        pruned = forest.compact(max_depth=depth)
+        n_trees = pruned.n_classifier_trees
+        leaves = pruned.apply(X_select)[:, :n_trees]
+        nodes_per_tree = np.cumsum(np.bincount(pruned.tree_of_nodes(), minlength=pruned.n_trees)[:n_trees])
+
+        running = np.zeros((len(X_select), pruned.value.shape[1]))
+        for tree in range(n_trees):
+            running += pruned.value[leaves[:, tree]]
+            if tree + 1 < min_trees:
+                continue
+            labels = pruned.classes.take(np.argmax(running, axis=1))
+            accuracy = float(np.mean(labels == y_select))
+            agreement = float(np.mean(labels == selection_labels))
+            if (accuracy >= selection_baseline - accuracy_budget and agreement >= min_label_agreement
+                    and (best is None or nodes_per_tree[tree] < best[0])):
+                best = (int(nodes_per_tree[tree]), depth, tree + 1)
+
+    _, depth, n_trees = best
+    full = forest.evaluate(X)
+    baseline = float(np.mean(full["labels"] == y))
+    compact = forest.compact(max_depth=depth, n_classifier_trees=n_trees)
+    outputs = compact.evaluate(X)
+    accuracy = float(np.mean(outputs["labels"] == y))
+    rejection_reasons = []
+    if depth is not None or n_trees < forest.n_classifier_trees:
+        if len(X) < min_validation_rows:
+            rejection_reasons.append(f"only {len(X):,} held-out rows (minimum {min_validation_rows:,})")
+        if accuracy < baseline - accuracy_budget:
+            rejection_reasons.append(f"accuracy loss {baseline - accuracy:.4f} exceeds the budget")
+        agreement = float(np.mean(outputs["labels"] == full["labels"]))
+        if agreement < min_label_agreement:
+            rejection_reasons.append(f"label agreement {agreement:.4f} below {min_label_agreement:.4f}")
+    pruning_rejected = bool(rejection_reasons)
+    if pruning_rejected:
+        depth, n_trees = None, forest.n_classifier_trees
+        compact = forest.compact()
+        outputs = compact.evaluate(X)
+        accuracy = float(np.mean(outputs["labels"] == y))
+
+    latency_rows = X[:1024]
+    report = {
+        "max_depth": depth,
+        "n_classifier_trees": n_trees,
+        "accuracy_budget": accuracy_budget,
+        "selection_rows": int(len(X_select)),
+        "validation_rows": int(len(X)),
+        "min_label_agreement": min_label_agreement,
+        "min_trees": min_trees,
+        "pruning_rejected": pruning_rejected,
+        "rejection_reasons": rejection_reasons,
+        "accuracy": {"full": baseline, "compact": accuracy, "delta": accuracy - baseline},
+        "label_agreement": float(np.mean(outputs["labels"] == full["labels"])),
+        "anomaly_flag_agreement": float(np.mean(outputs["is_anomaly"] == full["is_anomaly"])),
+        "nodes": {"full": int(len(forest.feature)), "compact": int(len(compact.feature))},
+        "bytes": {"full": int(forest.nbytes), "compact": int(compact.nbytes)},
+        "latency_ms": {
+            "full": {"1": _latency_ms(forest, X[:1]), str(len(latency_rows)): _latency_ms(forest, latency_rows)},
+            "compact": {"1": _latency_ms(compact, X[:1]), str(len(latency_rows)): _latency_ms(compact, latency_rows)}
+        }
+    }
+    return compact, report
+
+
+def calibrate_cascade(forest: CompiledForest, X: np.ndarray, y: np.ndarray, label_classes: np.ndarray,
+                      budget: float, stage_sizes: Sequence[int], normal_class: str = 'normal') -> Optional[Dict]:
+    """
+    Pick the cascade first stage and thresholds that save the most work within the budget
+
+    Every stage size (leading classifier and isolation trees) is tried, and
+    for each the confidence and anomaly-score thresholds are scanned over
+    quantiles of the stage's own outputs on X. A setting is admissible when
+    the rows it lets exit early change the full forest's decision (class or
+    anomaly flag) on at most budget of the rows. The admissible setting with
+    the lowest expected cost wins: the stage traversal for every row plus
+    the remaining trees for the rows that continue.
+
+    X is split in half: the setting is chosen on one half, and the other
+    half decides whether it is enabled and supplies the reported figures.
+    The held-out half must also stay within the budget and run faster.
+
+    Args:
+        forest: Compiled forest that will be served
+        X: Scaled validation rows, split into selection and reporting halves
+        y: Encoded labels of X
+        label_classes: Class names in the order of the class distributions
+        budget: Largest share of rows whose decision early exits may change
+        stage_sizes: First-stage tree counts to try
+        normal_class: Class the first stage may settle
+
+    Returns:
+        Report with the chosen settings (the config CascadeForest.from_config
+        reads), the early exit rate, and the accuracy and throughput of the
+        full forest and the cascade; None when no setting beats the full forest
+    """
+    names = [str(name) for name in label_classes]
+    if normal_class not in names:
+        return None
+    normal_index = names.index(normal_class)
+    X_select, _, X, y = _split_halves(X, y)
+
+    def settled_normal(outputs: Dict[str, np.ndarray]) -> np.ndarray:
+        return (outputs["labels"] == forest.classes[normal_index]) & ~outputs["is_anomaly"]
+
+    full_normal = settled_normal(forest.evaluate(X_select))
+    full_ms = _latency_ms(forest, X_select[:1024])
+
+    best = None
+    quantiles = np.linspace(0.0, 1.0, 21)
+    for n_trees in sorted(set(stage_sizes)):
+        if n_trees >= forest.n_classifier_trees:
+            continue
+        stage = forest.subset(n_trees, n_trees)
+        outputs = stage.evaluate(X_select)
+        confidence = outputs["probabilities"][:, normal_index]
+        candidate = np.argmax(outputs["probabilities"], axis=1) == normal_index
+        if not candidate.any():
+            continue
+        stage_ms = _latency_ms(stage, X_select[:1024])
+
+        for min_confidence in np.unique(np.quantile(confidence[candidate], quantiles)):
+            confident = candidate & (confidence >= min_confidence)
+            for min_anomaly_score in np.unique(np.quantile(outputs["anomaly_scores"][candidate], quantiles)):
+                exits = confident & (outputs["anomaly_scores"] >= min_anomaly_score)
+                if np.count_nonzero(exits & ~full_normal) > budget * len(X_select):
+                    continue
+                cost = stage_ms + (1.0 - np.mean(exits)) * max(0.0, full_ms - stage_ms)
+                if best is None or cost < best[0]:
+                    best = (cost, n_trees, float(min_confidence), float(min_anomaly_score))
+
+    if best is None or best[0] >= full_ms:
+        return None
+
+    _, n_trees, min_confidence, min_anomaly_score = best
+    cascade = CascadeForest(forest, n_trees, n_trees, normal_index, min_confidence, min_anomaly_score)
+    full = forest.evaluate(X)
+    outputs = cascade.evaluate(X)
+    if np.count_nonzero(outputs["early_exit"] & ~settled_normal(full)) > budget * len(X):
+        return None
+    baseline = float(np.mean(full["labels"] == y))
+    accuracy = float(np.mean(outputs["labels"] == y))
+    latency_rows = X[:1024]
+    full_ms = _latency_ms(forest, latency_rows)
+    cascade_ms = _latency_ms(cascade, latency_rows)
+    # The cost model ignores the overhead of splitting the batch; trust the measurement
+    if cascade_ms >= full_ms:
+        return None
+
+    return {
+        "classifier_trees": n_trees,
+        "anomaly_trees": n_trees,
+        "normal_class": normal_class,
+        "min_confidence": min_confidence,
+        "min_anomaly_score": min_anomaly_score,
+        "budget": budget,
+        "selection_rows": int(len(X_select)),
+        "validation_rows": int(len(X)),
+        "early_exit_rate": float(np.mean(outputs["early_exit"])),
+        "accuracy": {"full": baseline, "cascade": accuracy, "delta": accuracy - baseline},
+        "label_agreement": float(np.mean(outputs["labels"] == full["labels"])),
+        "anomaly_flag_agreement": float(np.mean(outputs["is_anomaly"] == full["is_anomaly"])),
+        "rows_per_second": {
+            "full": len(latency_rows) / full_ms * 1000,
+            "cascade": len(latency_rows) / cascade_ms * 1000
+        }
+    }
+
+
+def save_models(models_dir: str, clf, anomaly_detector, scaler, label_encoder, feature_columns,
+                forest: Optional[CompiledForest] = None, compaction: Optional[Dict] = None,
+                cascade: Optional[Dict] = None, full_cascade: Optional[Dict] = None) -> str:
+    """
+    Save the pickled models and the memory-mappable bundle
+
+    The pickles always hold the full models; a compact forest only replaces
+    the bundle's forest. cascade is the calibration for the bundle's forest
+    and full_cascade the one for the full models, stored as cascade.json for
+    detectors loading the pickles. Without a compact forest both are the same.
+
+    Returns:
+        Content version of the bundle
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    for file_name, obj in (('feature_columns.pkl', feature_columns), ('scaler.pkl', scaler),
+                           ('label_encoder.pkl', label_encoder), ('classification_model.pkl', clf),
+                           ('anomaly_detector.pkl', anomaly_detector)):
+        with open(os.path.join(models_dir, file_name), 'wb') as f:
+            pickle.dump(obj, f)
+
+    if forest is None:
+        full_cascade = cascade
+    cascade_path = os.path.join(models_dir, 'cascade.json')
+    if full_cascade is not None:
+        with open(cascade_path, 'w') as f:
+            json.dump(full_cascade, f, indent=2)
+    elif os.path.exists(cascade_path):
+        # A calibration only holds for the models it was measured on
+        os.remove(cascade_path)
+
+    # The bundle is what the detector loads; the pickles remain as the fallback format
+    return write_detector_bundle(os.path.join(models_dir, 'bundle'), clf, anomaly_detector, scaler,
+                                 label_encoder, feature_columns, categorical_columns,
+                                 forest=forest, compaction=compaction, cascade=cascade)
+
+
+def render_plots(output_dir: str, evaluation: Dict[str, np.ndarray], label_encoder: LabelEncoder,
+                 clf: RandomForestClassifier, feature_columns: pd.Index) -> None:
+    """
+    Optional stage: save the confusion matrix and feature importance charts
+
+    matplotlib and seaborn are only imported here, so training without
+    --plots does not need them.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    os.makedirs(output_dir, exist_ok=True)
+
     plt.figure(figsize=(10, 8))
-    cm = confusion_matrix(y_test_encoded, y_pred)
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=le.classes_, yticklabels=le.classes_)
+    cm = confusion_matrix(evaluation["y_true"], evaluation["y_pred"], labels=np.arange(len(label_encoder.classes_)))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=label_encoder.classes_,
+                yticklabels=label_encoder.classes_)
     plt.title('Confusion Matrix')
     plt.ylabel('True Label')
     plt.xlabel('Predicted Label')
     plt.tight_layout()
-    plt.savefig('visualizations/confusion_matrix.png')
-    
-    # Train anomaly detection model
-    print("\nTraining anomaly detection model (Isolation Forest)...")
-    # We'll train this on normal traffic data only
-    normal_idx = y_train == 'normal'
-    X_train_normal = X_train[normal_idx]
-    
-    anomaly_detector = IsolationForest(contamination=0.1, random_state=42)
-    anomaly_detector.fit(X_train_normal)
-    
-    # Save the anomaly detection model
-    with open('models/anomaly_detector.pkl', 'wb') as f:
-        pickle.dump(anomaly_detector, f)
-    
-    # Evaluate anomaly detection model
-    # For demonstration, we'll predict on the test set
-    anomaly_scores = anomaly_detector.decision_function(X_test)
-    anomaly_predictions = anomaly_detector.predict(X_test)
-    
-    # Convert predictions (-1 for anomaly, 1 for normal) to 0 for normal, 1 for anomaly
-    anomaly_predictions = np.where(anomaly_predictions == 1, 0, 1)
-    
-    # Calculate true anomalies (non-normal traffic)
-    true_anomalies = np.where(y_test != 'normal', 1, 0)
-    
-    # Calculate some metrics
-    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-    
-    print("\nAnomaly Detection Results:")
-    print(f"Accuracy: {accuracy_score(true_anomalies, anomaly_predictions):.4f}")
-    print(f"Precision: {precision_score(true_anomalies, anomaly_predictions, zero_division=0):.4f}")
-    print(f"Recall: {recall_score(true_anomalies, anomaly_predictions):.4f}")
-    print(f"F1 Score: {f1_score(true_anomalies, anomaly_predictions):.4f}")
-    
-    # Create feature importance visualization for the classification model
+    plt.savefig(os.path.join(output_dir, 'confusion_matrix.png'))
+    plt.close()
+
     plt.figure(figsize=(12, 8))
-    feature_names = list(train_data.drop(categorical_columns + ['class'], axis=1).columns) + list(train_categorical.columns)
     importances = clf.feature_importances_
     indices = np.argsort(importances)[-20:]  # Get top 20 features
-    
     plt.barh(range(len(indices)), importances[indices])
-    plt.yticks(range(len(indices)), [feature_names[i] for i in indices])
+    plt.yticks(range(len(indices)), [feature_columns[i] for i in indices])
     plt.title('Top 20 Feature Importances')
     plt.tight_layout()
-    plt.savefig('visualizations/feature_importance.png')
-    
+    plt.savefig(os.path.join(output_dir, 'feature_importance.png'))
+    plt.close()
+
+
+def print_compaction(report: Dict) -> None:
+    """
+    Print the size, latency and accuracy deltas of a compact_forest() report
+    """
+    depth = report["max_depth"] if report["max_depth"] is not None else "unlimited"
+    print(f"Compact forest: {report['n_classifier_trees']} classifier trees, depth {depth} "
+          f"(budget {report['accuracy_budget']:.2%}, chosen on {report['selection_rows']:,} rows, "
+          f"measured on {report['validation_rows']:,} held-out rows)")
+    if report["pruning_rejected"]:
+        print(f"  pruning rejected on the held-out rows ({'; '.join(report['rejection_reasons'])}); "
+              f"only the precision was reduced")
+    print(f"  nodes     {report['nodes']['full']:>12,} -> {report['nodes']['compact']:,}")
+    print(f"  size      {report['bytes']['full'] / 2**20:>12.2f} -> {report['bytes']['compact'] / 2**20:.2f} MB")
+    for rows, full_ms in report["latency_ms"]["full"].items():
+        print(f"  latency   {full_ms:>12.2f} -> {report['latency_ms']['compact'][rows]:.2f} ms ({rows} rows)")
+    accuracy = report["accuracy"]
+    print(f"  accuracy  {accuracy['full']:>12.4f} -> {accuracy['compact']:.4f} ({accuracy['delta']:+.4f})")
+    print(f"  label agreement {report['label_agreement']:.4f}, "
+          f"anomaly flag agreement {report['anomaly_flag_agreement']:.4f}")
+
+
+def print_cascade(report: Optional[Dict]) -> None:
+    """
+    Print the settings, throughput and accuracy deltas of a calibrate_cascade() report
+    """
+    if report is None:
+        print("Cascade: no first stage beats the full forest within the budget on held-out rows; not enabled")
+        return
+    print(f"Cascade: first stage of {report['classifier_trees']} classifier and {report['anomaly_trees']} "
+          f"isolation trees, exits at P({report['normal_class']}) >= {report['min_confidence']:.3f} and "
+          f"anomaly score >= {report['min_anomaly_score']:.4f}")
+    print(f"  early exits {report['early_exit_rate']:>10.2%} of {report['validation_rows']:,} held-out rows "
+          f"(budget {report['budget']:.2%})")
+    throughput = report["rows_per_second"]
+    print(f"  throughput  {throughput['full']:>10,.0f} -> {throughput['cascade']:,.0f} rows/s "
+          f"({throughput['cascade'] / throughput['full']:.2f}x)")
+    accuracy = report["accuracy"]
+    print(f"  accuracy    {accuracy['full']:>10.4f} -> {accuracy['cascade']:.4f} ({accuracy['delta']:+.4f})")
+    print(f"  label agreement {report['label_agreement']:.4f}, "
+          f"anomaly flag agreement {report['anomaly_flag_agreement']:.4f}")
+
+
+def main(args: argparse.Namespace) -> None:
+    np.random.seed(args.seed)
+
+    if args.train:
+        print(f"Loading NSL-KDD dataset from {args.train} and {args.test}...")
+        train_source = chunk_source(args.train, args.chunk_size)
+        test_source = chunk_source(args.test, args.chunk_size)
+    else:
+        # You would need to download the dataset from: https://www.unb.ca/cic/datasets/nsl.html
+        # and pass KDDTrain+.txt / KDDTest+.txt with --train / --test
+        print("Simulating dataset for demonstration...")
+        train_source = chunk_source(generate_synthetic_data(args.synthetic_rows), args.chunk_size)
+        test_source = chunk_source(generate_synthetic_data(max(1, args.synthetic_rows // 5)), args.chunk_size)
+
+    with stage("scan"):
+        categories, class_counts = scan_training_data(train_source)
+        n_rows = sum(class_counts.values())
+        if n_rows == 0:
+            raise ValueError("Training data is empty")
+        encoder = ChunkEncoder(categories)
+        print(f"Training rows: {n_rows:,}, features: {len(encoder.feature_columns)}, classes: {class_counts}")
+
+    with stage("scaler"):
+        sample_fraction = min(1.0, args.max_train_rows / n_rows) if args.max_train_rows else 1.0
+        if args.incremental:
+            # Only the anchors and the normal calibration sample are kept in memory
+            sample_fraction = min(sample_fraction, 50000 / n_rows)
+        scaler, X_sample, y_sample = fit_scaler_and_sample(train_source, encoder, sample_fraction, args.seed)
+        X_sample = scale(scaler, X_sample)
+        print(f"Kept {len(X_sample):,} rows ({sample_fraction:.1%}) in memory")
+
+    label_encoder = LabelEncoder()
+    label_encoder.fit(sorted(class_counts))
+
+    with stage("fit"):
+        if args.incremental:
+            anchors = np.concatenate([np.flatnonzero(y_sample == label)[:5] for label in label_encoder.classes_])
+            missing = set(label_encoder.classes_) - set(y_sample[anchors])
+            if missing:
+                raise ValueError(f"The sample holds no rows of {sorted(missing)}; lower --chunk-size or disable --incremental")
+            clf, anomaly_detector = fit_forests_incrementally(
+                train_source, encoder, scaler, label_encoder, X_sample[anchors],
+                label_encoder.transform(y_sample[anchors]), X_sample[y_sample == 'normal'],
+                args.trees_per_chunk, args.n_jobs, args.seed)
+        else:
+            clf, anomaly_detector = fit_forests(X_sample, label_encoder.transform(y_sample),
+                                                y_sample == 'normal', args.n_estimators, args.n_jobs, args.seed)
+        del X_sample, y_sample
+
+    compact, compaction = None, None
+    X_val, y_val = None, None
+    if args.compact:
+        with stage("compact"):
+            X_val, y_val = validation_sample(test_source, encoder, scaler, label_encoder, args.compact_rows)
+            compact, compaction = compact_forest(CompiledForest.from_models(clf, anomaly_detector), X_val, y_val,
+                                                 args.accuracy_budget, args.compact_depths,
+                                                 args.compact_min_agreement, args.compact_min_trees,
+                                                 args.compact_min_rows)
+            print_compaction(compaction)
+
+    cascade, full_cascade = None, None
+    if args.cascade:
+        with stage("cascade"):
+            if X_val is None:
+                X_val, y_val = validation_sample(test_source, encoder, scaler, label_encoder, args.compact_rows)
+            # Thresholds only hold for the forest they were calibrated on: the bundle
+            # serves the compact forest, detectors loading the pickles the full one
+            full_forest = CompiledForest.from_models(clf, anomaly_detector)
+            full_cascade = calibrate_cascade(full_forest, X_val, y_val, label_encoder.classes_,
+                                             args.cascade_budget, args.cascade_stages)
+            if compact is not None:
+                print("Full forest (cascade.json):")
+                print_cascade(full_cascade)
+                print("Compact forest (bundle):")
+                cascade = calibrate_cascade(compact, X_val, y_val, label_encoder.classes_, args.cascade_budget,
+                                            args.cascade_stages)
+            else:
+                cascade = full_cascade
+            print_cascade(cascade)
+
+    with stage("save"):
+        bundle_version = save_models(args.models_dir, clf, anomaly_detector, scaler, label_encoder,
+                                     encoder.feature_columns, forest=compact, compaction=compaction,
+                                     cascade=cascade, full_cascade=full_cascade)
+        print(f"Models saved in '{args.models_dir}' (bundle {bundle_version})")
+
+    with stage("evaluate"):
+        evaluation = evaluate(test_source, encoder, scaler, label_encoder, clf, anomaly_detector)
+
+    if args.plots:
+        with stage("plots"):
+            render_plots(args.visualizations_dir, evaluation, label_encoder, clf, encoder.feature_columns)
+            print(f"Visualizations saved in the '{args.visualizations_dir}' directory")
+
+    print("\nStage summary:")
+    for stats in stage_stats:
+        print(f"  {stats['stage']:<10}{stats['seconds']:>9.2f}s{stats['peak_rss_mb']:>10.1f} MB peak RSS")
     print("\nTraining completed successfully!")
-    print("Models saved in the 'models' directory")
-    print("Visualizations saved in the 'visualizations' directory")
 
-except Exception as e:
-    print(f"Error during training: {str(e)}")
\ No newline at end of file
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the threat classifier and anomaly detector")
+    parser.add_argument('--train', default=None, help="KDDTrain+.txt (or CSV/JSONL/Parquet in the same layout)")
+    parser.add_argument('--test', default=None, help="KDDTest+.txt (required with --train)")
+    parser.add_argument('--synthetic-rows', type=int, default=10000,
+                        help="Training rows to simulate when no --train file is given")
+    parser.add_argument('--models-dir', default='models', help="Where to save the models")
+    parser.add_argument('--chunk-size', type=int, default=100000, help="Rows read per chunk")
+    parser.add_argument('--max-train-rows', type=int, default=None,
+                        help="Fit on a uniform sample of at most this many rows")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Grow the forests chunk by chunk (warm_start) instead of fitting in memory")
+    parser.add_argument('--trees-per-chunk', type=int, default=10, help="Trees added per chunk with --incremental")
+    parser.add_argument('--n-estimators', type=int, default=100, help="Trees in the random forest")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Parallel jobs for fitting (-1 uses all cores)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed")
+    parser.add_argument('--compact', action='store_true',
+                        help="Store a reduced-precision, optionally pruned forest in the bundle")
+    parser.add_argument('--accuracy-budget', type=float, default=0.005,
+                        help="Largest test accuracy loss accepted from pruning with --compact")
+    parser.add_argument('--compact-depths', type=lambda value: [int(depth) for depth in value.split(',')],
+                        default=[8, 10, 12, 16, 20, 24, 32], help="Comma-separated classifier depth limits to try")
+    parser.add_argument('--compact-rows', type=int, default=20000,
+                        help="Test rows used to select and, on a held-out half, measure compaction and the cascade")
+    parser.add_argument('--compact-min-agreement', type=float, default=0.99,
+                        help="Smallest share of test labels a pruned forest must keep from the full forest")
+    parser.add_argument('--compact-min-trees', type=int, default=10,
+                        help="Fewest classifier trees a pruned forest may keep")
+    parser.add_argument('--compact-min-rows', type=int, default=1000,
+                        help="Fewest held-out test rows needed to accept pruning")
+    parser.add_argument('--cascade', action='store_true',
+                        help="Calibrate an early-exit cascade for CybersecurityThreatDetector(cascade=True)")
+    parser.add_argument('--cascade-budget', type=float, default=0.001,
+                        help="Largest share of test rows whose decision early exits may change with --cascade")
+    parser.add_argument('--cascade-stages', type=lambda value: [int(size) for size in value.split(',')],
+                        default=[4, 8, 16], help="Comma-separated first-stage tree counts tried with --cascade")
+    parser.add_argument('--plots', action='store_true', help="Also render the evaluation charts")
+    parser.add_argument('--visualizations-dir', default='visualizations', help="Where to save the charts")
+    args = parser.parse_args()
+
+    if bool(args.train) != bool(args.test):
+        parser.error("--train and --test must be given together")
+
+    try:
+        main(args)
+    except Exception as e:
+        print(f"Error during training: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,792 @@
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+
+def _average_path_length(n_samples_leaf: np.ndarray) -> np.ndarray:
+    """
+    Average path length of an unsuccessful BST search over n samples
+
+    Mirrors sklearn.ensemble._iforest._average_path_length so isolation scores
+    match the fitted IsolationForest bit for bit.
+    """
+    n_samples_leaf = np.asarray(n_samples_leaf, dtype=np.float64)
+    average_path_length = np.zeros(n_samples_leaf.shape)
+
+    mask_1 = n_samples_leaf <= 1
+    mask_2 = n_samples_leaf == 2
+    not_mask = ~np.logical_or(mask_1, mask_2)
+
+    average_path_length[mask_2] = 1.0
+    average_path_length[not_mask] = (
+        2.0 * (np.log(n_samples_leaf[not_mask] - 1.0) + np.euler_gamma)
+        - 2.0 * (n_samples_leaf[not_mask] - 1.0) / n_samples_leaf[not_mask]
+    )
+    return average_path_length
+
+
+def _index_dtype(max_value: int) -> np.dtype:
+    """
+    Narrowest signed integer type holding indices up to max_value
+    """
+    for dtype in (np.int16, np.int32):
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _float32_floor(values: np.ndarray) -> np.ndarray:
+    """
+    Largest float32 not above each value
+
+    Inputs are compared as float32, so x <= t holds exactly when x <= the
+    float32 floor of t and rounding split thresholds this way changes no decision.
+    """
+    rounded = np.asarray(values, dtype=np.float64).astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def _node_depths(children_left: np.ndarray, children_right: np.ndarray) -> np.ndarray:
+    """
+    Depth of every node in a tree, counting the root as depth 1
+    """
+    depths = np.zeros(len(children_left), dtype=np.float64)
+    depths[0] = 1.0
+    # sklearn stores nodes in depth-first order, so parents precede children
+    for node in range(len(children_left)):
+        if children_left[node] >= 0:
+            depths[children_left[node]] = depths[node] + 1.0
+            depths[children_right[node]] = depths[node] + 1.0
+    return depths
+
+
+class CompiledForest:
+    """
+    RandomForestClassifier and IsolationForest flattened into contiguous node arrays
+
+    All trees of both forests share one set of arrays and are traversed together,
+    so a single pass over the input yields the class probabilities, the predicted
+    label, the anomaly score and the anomaly flag.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, children: np.ndarray,
+                 is_leaf: np.ndarray, value: np.ndarray, path_length: np.ndarray,
+                 roots: np.ndarray, n_classifier_trees: int, classes: np.ndarray,
+                 anomaly_offset: float, anomaly_denominator: float):
+        """
+        Wrap already flattened node arrays
+
+        The arrays are used as given (they may be read-only memory maps), so no
+        per-process copies are made.
+
+        Args:
+            feature: Input column tested at each node
+            threshold: Split threshold at each node (go left when x <= threshold)
+            children: Child indices interleaved as (right, left) per node, so that
+                children[2 * node + go_left] is the next node; leaves point at themselves
+            is_leaf: Leaf flag of each node
+            value: Normalized class distribution of each classifier node
+            path_length: Isolation path length credited at each isolation tree leaf
+            roots: Root node of every tree, classifier trees first
+            n_classifier_trees: Number of leading trees that belong to the classifier
+            classes: Encoded class labels of the classifier
+            anomaly_offset: IsolationForest offset_ subtracted from the score
+            anomaly_denominator: Number of isolation trees times c(max_samples)
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.is_leaf = is_leaf
+        self.value = value
+        self.path_length = path_length
+        self.roots = roots
+        self.n_classifier_trees = int(n_classifier_trees)
+        self.classes = classes
+        self.anomaly_offset = float(anomaly_offset)
+        self.anomaly_denominator = float(anomaly_denominator)
+        self._parent: Optional[np.ndarray] = None
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_anomaly_trees(self) -> int:
+        return self.n_trees - self.n_classifier_trees
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory taken by the node arrays
+        """
+        return sum(array.nbytes for array in (self.feature, self.threshold, self.children, self.is_leaf,
+                                               self.value, self.path_length, self.roots))
+
+    @property
+    def bias(self) -> np.ndarray:
+        """
+        Class distribution before any split: the mean of the classifier root values
+        """
+        return self.value[self.roots[:self.n_classifier_trees]].mean(axis=0)
+
+    def _parents(self) -> np.ndarray:
+        """
+        Parent of every node (roots are their own parent), derived from the children array on first use
+        """
+        if self._parent is None:
+            nodes = np.arange(len(self.feature), dtype=np.intp)
+            parent = nodes.copy()
+            internal = nodes[~self.is_leaf]
+            parent[self.children[2 * internal]] = internal
+            parent[self.children[2 * internal + 1]] = internal
+            self._parent = parent
+        return self._parent
+
+    def tree_of_nodes(self) -> np.ndarray:
+        """
+        Index of the tree every node belongs to
+        """
+        return np.searchsorted(self.roots, np.arange(len(self.feature)), side='right') - 1
+
+    def node_depths(self) -> np.ndarray:
+        """
+        Depth of every node, counting roots as depth 0 like sklearn's max_depth
+        """
+        parent = self._parents()
+        is_root = parent == np.arange(len(parent))
+        depths = np.zeros(len(parent), dtype=np.intp)
+        # Each pass settles one more level; depths stop changing after the deepest one
+        while True:
+            updated = np.where(is_root, 0, depths[parent] + 1)
+            if np.array_equal(updated, depths):
+                return depths
+            depths = updated
+
+    def compact(self, max_depth: Optional[int] = None, n_classifier_trees: Optional[int] = None) -> 'CompiledForest':
+        """
+        Smaller copy of the forest for cache-resident serving
+
+        Thresholds are stored as float32, rounded down so every split decision
+        is unchanged, and node and feature indices use the narrowest integer
+        type that holds them. Class distributions and isolation path lengths
+        are stored as float32, which moves outputs by about 1e-7. Optionally the
+        classifier is also pruned: trees beyond the first n_classifier_trees
+        are dropped and nodes deeper than max_depth are cut, the node at the
+        cut becoming a leaf that predicts its training class distribution.
+        The isolation trees are never pruned.
+
+        Args:
+            max_depth: Deepest classifier node kept (roots are depth 0), or None to keep all
+            n_classifier_trees: Leading classifier trees kept, or None to keep all
+
+        Returns:
+            New CompiledForest; this one is left unchanged
+        """
+        if n_classifier_trees is None:
+            n_classifier_trees = self.n_classifier_trees
+        n_classifier_trees = max(1, min(n_classifier_trees, self.n_classifier_trees))
+
+        tree = self.tree_of_nodes()
+        is_classifier = tree < self.n_classifier_trees
+        keep = ~is_classifier | (tree < n_classifier_trees)
+        is_leaf = self.is_leaf.copy()
+        if max_depth is not None:
+            depths = self.node_depths()
+            keep &= ~is_classifier | (depths <= max_depth)
+            is_leaf |= is_classifier & (depths == max_depth)
+
+        # Renumber the kept nodes; a kept node's parent is always kept
+        old = np.flatnonzero(keep)
+        new_index = np.full(len(keep), -1, dtype=np.int64)
+        new_index[old] = np.arange(len(old))
+        is_leaf = is_leaf[old]
+        node_dtype = _index_dtype(2 * len(old) + 1)
+
+        nodes = np.arange(len(old))
+        children = new_index[np.asarray(self.children).reshape(-1, 2)[old]]
+        children[is_leaf] = nodes[is_leaf, np.newaxis]
+
+        kept_roots = np.concatenate([self.roots[:n_classifier_trees], self.roots[self.n_classifier_trees:]])
+
+        return CompiledForest(
+            feature=np.where(is_leaf, 0, self.feature[old]).astype(_index_dtype(int(self.feature.max(initial=0)))),
+            threshold=np.where(is_leaf, np.float32(0), _float32_floor(self.threshold[old])),
+            children=children.reshape(-1).astype(node_dtype),
+            is_leaf=is_leaf,
+            value=self.value[old].astype(np.float32),
+            path_length=self.path_length[old].astype(np.float32),
+            roots=new_index[kept_roots].astype(node_dtype),
+            n_classifier_trees=n_classifier_trees,
+            classes=self.classes,
+            anomaly_offset=self.anomaly_offset,
+            anomaly_denominator=self.anomaly_denominator
+        )
+
+    def subset(self, n_classifier_trees: int, n_anomaly_trees: int) -> 'CompiledForest':
+        """
+        Forest of the leading trees of each model, sharing this forest's node arrays
+
+        Traversal cost grows with the number of trees, so a subset is a cheap
+        estimate of the full forest's outputs; both forests average
+        independently grown trees, so the leading ones are a fair sample.
+
+        Args:
+            n_classifier_trees: Leading classifier trees used
+            n_anomaly_trees: Leading isolation trees used
+
+        Returns:
+            New CompiledForest over the same arrays, with isolation scores
+            normalized for its number of trees
+        """
+        n_classifier_trees = max(1, min(n_classifier_trees, self.n_classifier_trees))
+        n_anomaly_trees = max(1, min(n_anomaly_trees, self.n_anomaly_trees))
+        return self._select(range(n_classifier_trees), range(n_anomaly_trees))
+
+    def _select(self, classifier_trees: range, anomaly_trees: range) -> 'CompiledForest':
+        """
+        Forest of the given classifier and isolation trees, sharing this forest's node arrays
+        """
+        roots = np.concatenate([self.roots[:self.n_classifier_trees][classifier_trees.start:classifier_trees.stop],
+                                self.roots[self.n_classifier_trees:][anomaly_trees.start:anomaly_trees.stop]])
+
+        forest = CompiledForest(
+            feature=self.feature,
+            threshold=self.threshold,
+            children=self.children,
+            is_leaf=self.is_leaf,
+            value=self.value,
+            path_length=self.path_length,
+            roots=roots,
+            n_classifier_trees=len(classifier_trees),
+            classes=self.classes,
+            anomaly_offset=self.anomaly_offset,
+            anomaly_denominator=self.anomaly_denominator * len(anomaly_trees) / max(1, self.n_anomaly_trees)
+        )
+        # Parents depend only on the shared children array
+        forest._parent = self._parent
+        return forest
+
+    @classmethod
+    def from_models(cls, classification_model, anomaly_detector) -> 'CompiledForest':
+        """
+        Export fitted sklearn forests into flat node arrays
+
+        Args:
+            classification_model: Fitted RandomForestClassifier
+            anomaly_detector: Fitted IsolationForest
+
+        Returns:
+            CompiledForest evaluating both models
+        """
+        n_classes = len(classification_model.classes_)
+        n_features = anomaly_detector.n_features_in_
+        subsample_features = anomaly_detector._max_features != n_features
+
+        features, thresholds, children, leaves, values, path_lengths, roots = [], [], [], [], [], [], []
+        offset = 0
+
+        def add_tree(tree, feature_map: Optional[np.ndarray], value: np.ndarray, path_length: np.ndarray):
+            nonlocal offset
+            is_leaf = tree.children_left < 0
+            feature = np.where(is_leaf, 0, tree.feature)
+            if feature_map is not None:
+                feature = np.asarray(feature_map)[feature]
+            node_ids = np.arange(tree.node_count) + offset
+            tree_children = np.empty(2 * tree.node_count, dtype=np.int64)
+            tree_children[0::2] = np.where(is_leaf, node_ids, tree.children_right + offset)
+            tree_children[1::2] = np.where(is_leaf, node_ids, tree.children_left + offset)
+            features.append(feature)
+            thresholds.append(tree.threshold)
+            children.append(tree_children)
+            leaves.append(is_leaf)
+            values.append(value)
+            path_lengths.append(path_length)
+            roots.append(offset)
+            offset += tree.node_count
+
+        for estimator in classification_model.estimators_:
+            tree = estimator.tree_
+            value = tree.value[:, 0, :n_classes]
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            add_tree(tree, None, value / normalizer, np.zeros(tree.node_count))
+
+        for estimator, estimator_features in zip(anomaly_detector.estimators_, anomaly_detector.estimators_features_):
+            tree = estimator.tree_
+            path_length = (
+                _node_depths(tree.children_left, tree.children_right)
+                + _average_path_length(tree.n_node_samples)
+                - 1.0
+            )
+            feature_map = estimator_features if subsample_features else None
+            add_tree(tree, feature_map, np.zeros((tree.node_count, n_classes)), path_length)
+
+        anomaly_denominator = len(anomaly_detector.estimators_) * float(
+            _average_path_length(np.array([anomaly_detector._max_samples]))[0]
+        )
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=np.concatenate(children).astype(np.intp),
+            is_leaf=np.concatenate(leaves),
+            value=np.concatenate(values).astype(np.float64),
+            path_length=np.concatenate(path_lengths).astype(np.float64),
+            roots=np.array(roots, dtype=np.intp),
+            n_classifier_trees=len(classification_model.estimators_),
+            classes=np.asarray(classification_model.classes_),
+            anomaly_offset=anomaly_detector.offset_,
+            anomaly_denominator=anomaly_denominator
+        )
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], Dict]:
+        """
+        Split the compiled forest into plain arrays and scalar metadata for storage
+
+        Returns:
+            Tuple of (arrays, metadata) accepted by from_arrays()
+        """
+        arrays = {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "children": self.children,
+            "is_leaf": self.is_leaf,
+            "value": self.value,
+            "path_length": self.path_length,
+            "roots": self.roots,
+            "classes": self.classes
+        }
+        metadata = {
+            "n_classifier_trees": self.n_classifier_trees,
+            "anomaly_offset": self.anomaly_offset,
+            "anomaly_denominator": self.anomaly_denominator
+        }
+        return arrays, metadata
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], metadata: Dict) -> 'CompiledForest':
+        """
+        Rebuild a compiled forest from stored arrays without copying them
+
+        Args:
+            arrays: Arrays produced by to_arrays(), possibly memory-mapped
+            metadata: Scalar metadata produced by to_arrays()
+
+        Returns:
+            CompiledForest backed by the given arrays
+        """
+        return cls(
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            children=arrays["children"],
+            is_leaf=arrays["is_leaf"],
+            value=arrays["value"],
+            path_length=arrays["path_length"],
+            roots=arrays["roots"],
+            n_classifier_trees=metadata["n_classifier_trees"],
+            classes=arrays["classes"],
+            anomaly_offset=metadata["anomaly_offset"],
+            anomaly_denominator=metadata["anomaly_denominator"]
+        )
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """
+        Find the leaf reached in every tree for every row
+
+        Args:
+            X: Preprocessed feature matrix
+
+        Returns:
+            Global leaf indices of shape (n_samples, n_trees)
+        """
+        # sklearn trees compare float32 inputs against float64 thresholds; numpy
+        # compares mixed float32/float64 exactly, and compact forests store float32
+        X = np.asarray(X, dtype=np.float32)
+        n_samples, n_features = X.shape
+        n_trees = self.n_trees
+        X_flat = X.ravel()
+
+        # Tree-major layout: consecutive pairs walk the same tree, which keeps
+        # that tree's nodes hot in cache
+        nodes = np.repeat(self.roots.astype(np.intp), n_samples)
+        offsets = np.tile(np.arange(n_samples, dtype=np.intp) * n_features, n_trees)
+        position = np.arange(nodes.size)
+        current = nodes
+
+        feature, threshold, children, is_leaf = self.feature, self.threshold, self.children, self.is_leaf
+        step = 0
+        while current.size:
+            go_left = X_flat[offsets + feature[current]] <= threshold[current]
+            # Widen narrow (compact) child indices once, not at every gather
+            current = children[2 * current + go_left].astype(np.intp, copy=False)
+            step += 1
+
+            # Leaves point back at themselves, so finished pairs can keep riding
+            # along; compact only once a sizeable share of them has finished
+            if step % 4 == 0:
+                finished = is_leaf[current]
+                if np.count_nonzero(finished) * 4 >= current.size:
+                    nodes[position[finished]] = current[finished]
+                    remaining = ~finished
+                    current = current[remaining]
+                    position = position[remaining]
+                    offsets = offsets[remaining]
+
+        return nodes.reshape(n_trees, n_samples).T
+
+    def _path_contributions(self, leaves: np.ndarray, class_index: np.ndarray, n_features: int,
+                            chunk_size: int = 1024) -> np.ndarray:
+        """
+        Attribute each row's class probability to the features split on along its paths
+
+        Every node's value differs from its parent's by the effect of the parent's
+        split, so walking from the leaves back to the roots and crediting each
+        difference to the parent's feature decomposes the prediction exactly:
+        bias + contributions.sum(axis=1) equals the predicted probability.
+
+        Args:
+            leaves: Classifier leaf indices of shape (n_samples, n_classifier_trees)
+            class_index: Column of value explained for each row
+            n_features: Number of input columns
+            chunk_size: Maximum rows walked at once
+
+        Returns:
+            Contributions of shape (n_samples, n_features)
+        """
+        n_samples = leaves.shape[0]
+        class_index = np.asarray(class_index, dtype=np.intp)
+        contributions = np.empty((n_samples, n_features))
+        for start in range(0, n_samples, chunk_size):
+            stop = min(start + chunk_size, n_samples)
+            contributions[start:stop] = self._climb(leaves[start:stop], class_index[start:stop], n_features)
+        return contributions
+
+    def _climb(self, leaves: np.ndarray, class_index: np.ndarray, n_features: int) -> np.ndarray:
+        """
+        Path contributions of one chunk of rows (see _path_contributions())
+        """
+        n_samples = leaves.shape[0]
+        n_classes = self.value.shape[1]
+        n_cells = n_samples * n_features
+        parent = self._parents()
+        value = self.value.reshape(-1)
+        # Tree-major layout, as in apply(): consecutive pairs climb the same tree
+        rows = np.tile(np.arange(n_samples, dtype=np.intp), leaves.shape[1])
+        classes = class_index[rows]
+        cells = rows * n_features
+        current = leaves.T.ravel()
+        below = value[current * n_classes + classes]
+        contributions = np.zeros(n_cells)
+
+        # Every pair climbs one level per step; roots are their own parents, so
+        # pairs that arrived add zeros until the next compaction drops them.
+        # Each step is summed right away, which keeps memory at rows x features
+        # rather than rows x trees x depth
+        step = 0
+        while current.size:
+            above = parent[current]
+            upper = value[above * n_classes + classes]
+            contributions += np.bincount(cells + self.feature[above], weights=below - upper, minlength=n_cells)
+            step += 1
+
+            if step % 4 == 0:
+                climbing = above != current
+                current, below, cells, classes = above[climbing], upper[climbing], cells[climbing], classes[climbing]
+            else:
+                current, below = above, upper
+
+        return contributions.reshape(n_samples, n_features) / self.n_classifier_trees
+
+    def evaluate(self, X: np.ndarray, chunk_size: int = 8192, explain: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Score rows with both forests in a single traversal
+
+        Args:
+            X: Preprocessed feature matrix
+            chunk_size: Maximum rows traversed at once, bounding temporary memory
+            explain: Also decompose each row's predicted class probability into
+                per-feature path contributions, reusing the leaves of the traversal
+
+        Returns:
+            Dictionary with probabilities, encoded labels, anomaly scores and anomaly
+            flags; with explain, also contributions (n_samples x n_features) towards
+            the predicted class and that class's bias
+        """
+        X = np.asarray(X)
+        n_samples = X.shape[0]
+        n_classes = self.value.shape[1]
+        probabilities = np.zeros((n_samples, n_classes))
+        depths = np.zeros(n_samples)
+        contributions = np.zeros((n_samples, X.shape[1])) if explain else None
+
+        for start in range(0, n_samples, chunk_size):
+            stop = min(start + chunk_size, n_samples)
+            leaves = self.apply(X[start:stop])
+            self._accumulate(leaves, probabilities[start:stop], depths[start:stop])
+
+            if explain:
+                predicted = np.argmax(probabilities[start:stop], axis=1)
+                contributions[start:stop] = self._path_contributions(
+                    leaves[:, :self.n_classifier_trees], predicted, X.shape[1])
+
+        outputs = self._outputs(probabilities, depths)
+        if explain:
+            outputs["contributions"] = contributions
+            outputs["bias"] = self.bias[np.argmax(outputs["probabilities"], axis=1)]
+        return outputs
+
+    def _accumulate(self, leaves: np.ndarray, probabilities: np.ndarray, depths: np.ndarray) -> None:
+        """
+        Add every tree's leaf values to running sums, in place
+
+        Trees are added one by one in sklearn's order so the sums match exactly,
+        also when the running sums already hold an earlier subset of the trees.
+        """
+        for tree in range(self.n_classifier_trees):
+            probabilities += self.value[leaves[:, tree]]
+        for tree in range(self.n_classifier_trees, self.n_trees):
+            depths += self.path_length[leaves[:, tree]]
+
+    def _outputs(self, probabilities: np.ndarray, depths: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Turn summed class distributions and path lengths into evaluate()'s outputs (in place)
+        """
+        probabilities /= self.n_classifier_trees
+
+        if self.anomaly_denominator != 0:
+            scores = 2 ** (-depths / self.anomaly_denominator)
+        else:
+            scores = np.ones_like(depths)
+        anomaly_scores = -scores - self.anomaly_offset
+
+        return {
+            "probabilities": probabilities,
+            "labels": self.classes.take(np.argmax(probabilities, axis=1)),
+            "anomaly_scores": anomaly_scores,
+            "is_anomaly": anomaly_scores < 0
+        }
+
+    def contributions(self, X: np.ndarray, class_index: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+        """
+        Per-feature path contributions towards given classes, without scoring
+
+        Args:
+            X: Preprocessed feature matrix
+            class_index: Column of the class distribution explained for each row
+            chunk_size: Maximum rows traversed at once
+
+        Returns:
+            Contributions of shape (n_samples, n_features)
+        """
+        X = np.asarray(X)
+        class_index = np.asarray(class_index, dtype=np.intp)
+        contributions = np.zeros(X.shape)
+        for start in range(0, X.shape[0], chunk_size):
+            stop = min(start + chunk_size, X.shape[0])
+            leaves = self.apply(X[start:stop])[:, :self.n_classifier_trees]
+            contributions[start:stop] = self._path_contributions(leaves, class_index[start:stop], X.shape[1])
+        return contributions
+
+
+class CascadeForest:
+    """
+    Two-stage scoring: a few trees settle confidently normal rows, the full forest the rest
+
+    The first stage is a CompiledForest.subset() of the served forest. A row
+    exits after it when the stage predicts the normal class with probability
+    of at least min_confidence and its estimated anomaly score is at least
+    min_anomaly_score; it is reported with the stage's outputs. Every other
+    row only traverses the remaining trees, continuing the stage's running
+    sums, so its outputs are exactly the full forest's. train.py calibrates
+    the thresholds on held-out rows so early exits almost never change a
+    decision.
+    """
+
+    def __init__(self, forest: CompiledForest, n_classifier_trees: int, n_anomaly_trees: int, normal_index: int,
+                 min_confidence: float, min_anomaly_score: float):
+        """
+        Args:
+            forest: Full compiled forest
+            n_classifier_trees: Leading classifier trees in the first stage
+            n_anomaly_trees: Leading isolation trees in the first stage
+            normal_index: Column of the normal class in the class distributions
+            min_confidence: Smallest first-stage normal probability that exits early
+            min_anomaly_score: Smallest first-stage anomaly score that exits early
+                (scores below 0 are anomalies)
+        """
+        self.forest = forest
+        self.stage = forest.subset(n_classifier_trees, n_anomaly_trees)
+        self.remainder = forest._select(range(self.stage.n_classifier_trees, forest.n_classifier_trees),
+                                        range(self.stage.n_anomaly_trees, forest.n_anomaly_trees))
+        self.normal_index = int(normal_index)
+        self.min_confidence = float(min_confidence)
+        self.min_anomaly_score = float(min_anomaly_score)
+
+    @classmethod
+    def from_config(cls, forest: CompiledForest, config: Dict, label_classes: np.ndarray) -> 'CascadeForest':
+        """
+        Build the cascade described by a calibration report from train.py
+
+        Args:
+            forest: Full compiled forest the report was calibrated on
+            config: Report with classifier_trees, anomaly_trees, normal_class,
+                min_confidence and min_anomaly_score
+            label_classes: Class names in the order of the class distributions
+        """
+        normal_index = [str(name) for name in label_classes].index(config["normal_class"])
+        return cls(forest, config["classifier_trees"], config["anomaly_trees"], normal_index,
+                   config["min_confidence"], config["min_anomaly_score"])
+
+    def early_exits(self, stage_outputs: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Rows whose first-stage outputs are confident enough to skip the full forest
+        """
+        probabilities = stage_outputs["probabilities"]
+        return ((np.argmax(probabilities, axis=1) == self.normal_index)
+                & (probabilities[:, self.normal_index] >= self.min_confidence)
+                & (stage_outputs["anomaly_scores"] >= self.min_anomaly_score))
+
+    def evaluate(self, X: np.ndarray, chunk_size: int = 8192, explain: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Score rows like CompiledForest.evaluate(), exiting early where the first stage is confident
+
+        Returns:
+            The outputs of CompiledForest.evaluate() plus early_exit, the rows
+            answered by the first stage alone
+        """
+        X = np.asarray(X)
+        n_samples = X.shape[0]
+        n_classes = self.forest.value.shape[1]
+        stage, n_stage_trees = self.stage, self.stage.n_classifier_trees
+        outputs = {
+            "probabilities": np.zeros((n_samples, n_classes)),
+            "labels": np.empty(n_samples, dtype=self.forest.classes.dtype),
+            "anomaly_scores": np.zeros(n_samples),
+            "is_anomaly": np.zeros(n_samples, dtype=bool),
+            "early_exit": np.zeros(n_samples, dtype=bool)
+        }
+        if explain:
+            outputs["contributions"] = np.zeros(X.shape)
+            outputs["bias"] = np.zeros(n_samples)
+
+        for start in range(0, n_samples, chunk_size):
+            stop = min(start + chunk_size, n_samples)
+            stage_leaves = stage.apply(X[start:stop])
+            probabilities = np.zeros((stop - start, n_classes))
+            depths = np.zeros(stop - start)
+            stage._accumulate(stage_leaves, probabilities, depths)
+
+            # Keep the raw sums: rows that continue resume from them
+            stage_outputs = stage._outputs(probabilities.copy(), depths)
+            exits = self.early_exits(stage_outputs)
+            exit_rows = np.flatnonzero(exits)
+            rest = np.flatnonzero(~exits)
+
+            chunk = {name: stage_outputs[name][exit_rows] for name in stage_outputs}
+            if explain and exit_rows.size:
+                chunk["contributions"] = stage._path_contributions(
+                    stage_leaves[exit_rows, :n_stage_trees], np.full(exit_rows.size, self.normal_index), X.shape[1])
+                chunk["bias"] = np.full(exit_rows.size, stage.bias[self.normal_index])
+            for name, values in chunk.items():
+                outputs[name][start + exit_rows] = values
+            outputs["early_exit"][start:stop] = exits
+
+            if rest.size:
+                rest_leaves = self.remainder.apply(X[start + rest])
+                probabilities, depths = probabilities[rest], depths[rest]
+                self.remainder._accumulate(rest_leaves, probabilities, depths)
+                full = self.forest._outputs(probabilities, depths)
+                if explain:
+                    classifier_leaves = np.concatenate(
+                        [stage_leaves[rest, :n_stage_trees], rest_leaves[:, :self.remainder.n_classifier_trees]],
+                        axis=1)
+                    predicted = np.argmax(full["probabilities"], axis=1)
+                    full["contributions"] = self.forest._path_contributions(classifier_leaves, predicted, X.shape[1])
+                    full["bias"] = self.forest.bias[predicted]
+                for name, values in full.items():
+                    outputs[name][start + rest] = values
+
+        return outputs
+
+
+def check_parity(forest: CompiledForest, classification_model, anomaly_detector, X: np.ndarray) -> Dict[str, float]:
+    """
+    Compare compiled outputs against the sklearn models
+
+    Args:
+        forest: CompiledForest built from the two models
+        classification_model: Fitted RandomForestClassifier
+        anomaly_detector: Fitted IsolationForest
+        X: Preprocessed feature matrix
+
+    Returns:
+        Maximum absolute differences and mismatch counts for every output
+    """
+    compiled = forest.evaluate(X)
+    probabilities = classification_model.predict_proba(X)
+    anomaly_scores = anomaly_detector.decision_function(X)
+
+    return {
+        "max_probability_diff": float(np.abs(compiled["probabilities"] - probabilities).max(initial=0.0)),
+        "label_mismatches": int(np.sum(compiled["labels"] != classification_model.predict(X))),
+        "max_anomaly_score_diff": float(np.abs(compiled["anomaly_scores"] - anomaly_scores).max(initial=0.0)),
+        "anomaly_flag_mismatches": int(np.sum(compiled["is_anomaly"] != (anomaly_detector.predict(X) == -1)))
+    }
+
+
+def parity_inputs(forest: CompiledForest, n_samples: int, n_features: int, seed: int = 0) -> np.ndarray:
+    """
+    Random rows for check_parity()
+
+    Standard normal rows cover the scaled feature range; copying split thresholds
+    into random cells exercises inputs that land exactly on a split.
+
+    Args:
+        forest: CompiledForest whose thresholds are copied
+        n_samples: Number of rows
+        n_features: Number of features per row
+        seed: Random seed
+
+    Returns:
+        Feature matrix of shape (n_samples, n_features)
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((n_samples, n_features))
+    internal = np.flatnonzero(~forest.is_leaf)
+    picked = rng.choice(internal, size=n_samples)
+    X[rng.integers(0, n_samples, size=n_samples), forest.feature[picked]] = forest.threshold[picked]
+    return X
+
+
+# Parity check against the saved sklearn models
+if __name__ == "__main__":
+    import argparse
+    import os
+    import pickle
+
+    parser = argparse.ArgumentParser(description="Check compiled forest outputs against sklearn")
+    parser.add_argument('--models-dir', default='models', help="Directory containing the saved models")
+    parser.add_argument('--samples', type=int, default=2000, help="Number of random rows to score")
+    parser.add_argument('--tolerance', type=float, default=1e-9, help="Maximum allowed absolute difference")
+    args = parser.parse_args()
+
+    with open(os.path.join(args.models_dir, 'classification_model.pkl'), 'rb') as f:
+        clf = pickle.load(f)
+    with open(os.path.join(args.models_dir, 'anomaly_detector.pkl'), 'rb') as f:
+        iso = pickle.load(f)
+
+    forest = CompiledForest.from_models(clf, iso)
+    print(f"Compiled {forest.n_classifier_trees} classifier trees and {forest.n_anomaly_trees} "
+          f"isolation trees into {len(forest.feature)} nodes")
+
+    results = check_parity(forest, clf, iso, parity_inputs(forest, args.samples, clf.n_features_in_))
+    for name, diff in results.items():
+        print(f"  {name}: {diff}")
+
+    failed = (results["max_probability_diff"] > args.tolerance
+              or results["max_anomaly_score_diff"] > args.tolerance
+              or results["label_mismatches"]
+              or results["anomaly_flag_mismatches"])
+    print("Parity check failed" if failed else "Parity check passed")
+    raise SystemExit(1 if failed else 0)